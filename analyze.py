@@ -0,0 +1,282 @@
+"""
+Analysis of the telemetry logs, to choose the default settings of the game.
+
+The logs written with --telemetry are read in chunks of --chunk records,
+one after the other, so they can be larger than the RAM. Every statistic
+is computed with NumPy over a whole chunk, and only the totals are kept
+from one chunk to the next:
+
+- recall heatmaps: for each grid size, the rate at which the flashed
+  squares at each position were found: the hits on a square over the
+  FLASH records of that square. Squares that never flashed have no rate.
+- hit rates: for each delay and flash count, the share of the clicks that
+  hit a flashed square, and the share of the levels won
+- level distributions: for each allowed_mistakes and initial_lives, the
+  levels at which the games ended, lost or quit. Games still running at
+  the end of the logs are not counted.
+
+Example, with a directory of daily logs:
+
+    python analyze.py telemetry/ --max-heatmap 10
+"""
+import argparse
+import json
+import sys
+import time
+
+import numpy
+
+import telemetry
+from telemetry import CLICK, FLASH, LEVEL, QUIT
+
+CHUNK = 1 << 20     # Records read at a time, 40 MiB
+MAX_HEATMAP = 10    # Largest grid printed
+DENSE_KEYS = 1 << 22    # Keys counted with an array of this many counters at most
+
+
+def grouped(key, *weights):
+    """
+    Distinct values of key, a NumPy array of non-negative integers, and the
+    sum of each weights array per value (the count per value for a weights
+    of None). Small keys are counted with bincount(), others are sorted.
+    """
+    if len(key) and key.max() < DENSE_KEYS:
+        counts = numpy.bincount(key)
+        keys = numpy.flatnonzero(counts)
+        return keys, [counts[keys] if weight is None else
+                      numpy.bincount(key, weights=weight)[keys] for weight in weights]
+    keys, inverse = numpy.unique(key, return_inverse=True)
+    return keys, [numpy.bincount(inverse, weights=weight, minlength=len(keys))
+                  for weight in weights]
+
+
+def add_cells(totals, columns, selected):
+    """
+    Count the selected records per square in the dict totals, whose values
+    are the counts of a grid size, flat in x * grid_size + y order
+    """
+    grid_size = columns["grid_size"].astype(numpy.int64)
+    x = columns["x"]
+    y = columns["y"]
+    selected = selected & (x >= 0) & (x < grid_size) & (y >= 0) & (y < grid_size)
+    if not selected.any():
+        return
+    # All the grids in one bincount: the squares of grid size g come after
+    # the ones of the smaller grids
+    grid_size = grid_size[selected]
+    sizes = numpy.arange(grid_size.max() + 1)
+    offsets = numpy.cumsum(sizes ** 2) - sizes ** 2
+    cells = offsets[grid_size] + x[selected] * grid_size + y[selected]
+    counts = numpy.bincount(cells, minlength=offsets[-1] + sizes[-1] ** 2)
+    for size in numpy.unique(grid_size).tolist():
+        add_counts(totals, size, counts[offsets[size]:offsets[size] + size * size])
+
+
+def add_counts(totals, key, counts):
+    """
+    Add the counts array to the one of key in the dict totals, growing
+    either so that they have the same length
+    """
+    total = totals.get(key)
+    if total is None:
+        totals[key] = counts.astype(numpy.float64)
+        return
+    if len(total) < len(counts):
+        total = totals[key] = numpy.pad(total, (0, len(counts) - len(total)))
+    total[:len(counts)] += counts
+
+
+class Analysis:
+    """
+    Statistics of the records added so far
+    """
+
+    def __init__(self):
+        self.records = 0
+        self.hits = {}          # grid_size -> hits per square, flat in x * grid_size + y order
+        self.flashes = {}       # grid_size -> flashes per square, in the same order
+        self.rates = {}         # (delay, flash_count) -> [clicks, hits, levels, wins]
+        self.game_ends = {}     # (allowed_mistakes, initial_lives) -> games ended per level
+
+    def add(self, records):
+        """
+        Add a chunk of records, a NumPy array of telemetry.record_dtype()
+        """
+        self.records += len(records)
+        # Each column is read once, the strided fields of the records are
+        # copied to contiguous arrays
+        columns = {name: numpy.ascontiguousarray(records[name])
+                   for name in ("kind", "grid_size", "x", "y", "hit", "flash_count", "delay",
+                                "level", "lives", "allowed_mistakes",
+                                "initial_lives")}
+        kind = columns["kind"]
+        is_click = kind == CLICK
+        is_level = kind == LEVEL
+        is_quit = kind == QUIT
+        add_cells(self.hits, columns, is_click & (columns["hit"] == 1))
+        add_cells(self.flashes, columns, kind == FLASH)
+        self._add_rates(columns, is_click, is_level)
+        self._add_game_ends(columns, (is_level & (columns["hit"] == 0) & (columns["lives"] == 0))
+                            | is_quit)
+
+    def _add_rates(self, columns, is_click, is_level):
+        flash_count = columns["flash_count"].astype(numpy.int64)
+        width = int(flash_count.max(initial=0)) + 1
+        key = columns["delay"].astype(numpy.int64) * width + flash_count
+        for selected, column in ((is_click, 0), (is_level, 2)):
+            keys, (count, hits) = grouped(key[selected], None, columns["hit"][selected])
+            for key_, count, hits in zip(keys.tolist(), count.tolist(), hits.tolist()):
+                totals = self.rates.setdefault(divmod(key_, width), numpy.zeros(4))
+                totals[column] += count
+                totals[column + 1] += hits
+
+    def _add_game_ends(self, columns, ended):
+        level = columns["level"][ended].astype(numpy.int64)
+        width = int(level.max(initial=0)) + 1
+        config = (columns["allowed_mistakes"][ended].astype(numpy.int64) << 8
+                  | columns["initial_lives"][ended])
+        keys, (counts,) = grouped(config * width + level, None)
+        for key, count in zip(keys.tolist(), counts.tolist()):
+            config, level = divmod(key, width)
+            ends = numpy.zeros(level + 1)
+            ends[level] = count
+            add_counts(self.game_ends, (config >> 8, config & 0xFF), ends)
+
+    def heatmaps(self):
+        """
+        grid_size -> recall rate of the squares, a grid_size x grid_size
+        array indexed [x, y], NaN for the squares that never flashed
+        """
+        heatmaps = {}
+        for grid_size, flashes in sorted(self.flashes.items()):
+            flashes = numpy.pad(flashes, (0, grid_size ** 2 - len(flashes)))
+            hits = self.hits.get(grid_size, numpy.zeros(0))
+            hits = numpy.pad(hits, (0, grid_size ** 2 - len(hits)))
+            rates = numpy.full(grid_size ** 2, numpy.nan)
+            numpy.divide(hits, flashes, out=rates, where=flashes > 0)
+            heatmaps[grid_size] = rates.reshape(grid_size, grid_size)
+        return heatmaps
+
+    def hit_rates(self):
+        """
+        (delay, flash_count) -> clicks, click hit rate, levels and win rate
+        """
+        rates = {}
+        for key, (clicks, hits, levels, wins) in sorted(self.rates.items()):
+            rates[key] = {
+                "clicks": int(clicks),
+                "hit_rate": hits / clicks if clicks else None,
+                "levels": int(levels),
+                "win_rate": wins / levels if levels else None,
+            }
+        return rates
+
+    def level_distributions(self):
+        """
+        (allowed_mistakes, initial_lives) -> games, mean, percentiles and
+        distribution of the levels reached
+        """
+        distributions = {}
+        for key, counts in sorted(self.game_ends.items()):
+            games = counts.sum()
+            levels = numpy.arange(len(counts))
+            cumulative = numpy.cumsum(counts)
+            p25, p50, p75, p90 = (int(numpy.searchsorted(cumulative, games * q))
+                                  for q in (0.25, 0.5, 0.75, 0.9))
+            distributions[key] = {
+                "games": int(games),
+                "mean": float((levels * counts).sum() / games),
+                "p25": p25, "median": p50, "p75": p75, "p90": p90,
+                "max": int(levels[counts > 0][-1]),
+                "distribution": {int(level): int(counts[level])
+                                 for level in numpy.flatnonzero(counts)},
+            }
+        return distributions
+
+    def summary(self):
+        return {
+            "records": self.records,
+            "heatmaps": {str(grid_size): [[None if numpy.isnan(rate) else rate for rate in row]
+                                          for row in heatmap.round(4).tolist()]
+                         for grid_size, heatmap in self.heatmaps().items()},
+            "hit_rates": [dict(delay=delay, flash_count=flash_count, **rates)
+                          for (delay, flash_count), rates in self.hit_rates().items()],
+            "level_distributions": [dict(allowed_mistakes=mistakes, initial_lives=lives, **stats)
+                                    for (mistakes, lives), stats
+                                    in self.level_distributions().items()],
+        }
+
+
+def analyze(paths, chunk=CHUNK):
+    """
+    Analysis of the records of the log files of paths, read chunk records
+    at a time
+    """
+    analysis = Analysis()
+    for path in telemetry.log_files(paths):
+        for records in telemetry.read_chunks(path, chunk):
+            analysis.add(records)
+    return analysis
+
+
+def print_report(analysis, max_heatmap=MAX_HEATMAP):
+    print("%d records" % analysis.records)
+
+    print("\nrecall rate of the flashed squares, per position (row y, column x):")
+    for grid_size, heatmap in analysis.heatmaps().items():
+        if grid_size > max_heatmap:
+            print("  %dx%d: mean %.3f, min %.3f, max %.3f"
+                  % (grid_size, grid_size, numpy.nanmean(heatmap), numpy.nanmin(heatmap),
+                     numpy.nanmax(heatmap)))
+            continue
+        print("  %dx%d:" % (grid_size, grid_size))
+        for row in heatmap.T:
+            print("    " + " ".join("   -" if numpy.isnan(rate) else "%.2f" % rate
+                                    for rate in row))
+
+    print("\nhit rate per delay and flash count:")
+    print("  %6s %6s %10s %9s %8s %9s" % ("delay", "flash", "clicks", "hit rate", "levels",
+                                         "win rate"))
+    for (delay, flash_count), rates in analysis.hit_rates().items():
+        print("  %6d %6d %10d %9s %8d %9s"
+              % (delay, flash_count, rates["clicks"], format_rate(rates["hit_rate"]),
+                 rates["levels"], format_rate(rates["win_rate"])))
+
+    print("\nlevel reached per allowed_mistakes and initial_lives:")
+    for (mistakes, lives), stats in analysis.level_distributions().items():
+        print("  mistakes %d, lives %d: %d games, mean %.2f, median %d, p25-p75 %d-%d, "
+              "p90 %d, max %d" % (mistakes, lives, stats["games"], stats["mean"],
+                                  stats["median"], stats["p25"], stats["p75"], stats["p90"],
+                                  stats["max"]))
+
+
+def format_rate(rate):
+    return "-" if rate is None else "%.3f" % rate
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("paths", nargs="+", help="log files, directories of logs or globs")
+    parser.add_argument("--chunk", type=int, default=CHUNK, help="records read at a time")
+    parser.add_argument("--max-heatmap", type=int, default=MAX_HEATMAP,
+                        help="largest grid whose heatmap is printed in full")
+    parser.add_argument("--json", action="store_true", help="print the results as JSON")
+    args = parser.parse_args(argv)
+
+    start = time.perf_counter()
+    try:
+        analysis = analyze(args.paths, args.chunk)
+    except (OSError, ValueError) as error:
+        parser.error(str(error))
+    elapsed = time.perf_counter() - start
+
+    if args.json:
+        print(json.dumps(dict(analysis.summary(), seconds=elapsed), indent=1))
+    else:
+        print_report(analysis, args.max_heatmap)
+        print("\nanalyzed in %.2f s" % elapsed)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,106 @@
+"""
+Asset manager for the end screen images.
+
+Every image is decoded once, in a background thread started at launch, and
+kept converted to the display format and scaled to the current image size.
+The scaled copies are only rebuilt when that size changes.
+"""
+import bisect
+import math
+import os
+import threading
+
+import pygame
+
+IMAGE_DIR = os.path.join("src", "images")
+
+# (level threshold, image, caption): a tier applies to the levels strictly
+# below its threshold and above the threshold of the previous tier
+END_SCREEN_TIERS = (
+    (7, "joe.jpg", "c'mon man"),
+    (9, "lester.jpg", "smooth brain"),
+    (11, "white_claw.jpg", "drunk?"),
+    (13, "ben.png", "mediocre"),
+    (14, "phil.jpg", "average"),
+    (16, "monke.jpg", "monke"),
+    (18, "chad.jpeg", "High IQ"),
+    (20, "putin.jpeg", "Wide IQ"),
+    (math.inf, "image.png", "genius"),
+)
+_TIER_THRESHOLDS = [tier[0] for tier in END_SCREEN_TIERS]
+
+
+def end_screen_tier(level):
+    """
+    Return the (image, caption) shown on the end screen for a level
+    """
+    _, image, caption = END_SCREEN_TIERS[bisect.bisect_right(_TIER_THRESHOLDS, level)]
+    return image, caption
+
+
+class AssetManager:
+    """
+    Decode the end screen images once and cache them scaled to one size
+    """
+
+    def __init__(self, image_dir=IMAGE_DIR, names=None):
+        self.image_dir = image_dir
+        self.names = names or [tier[1] for tier in END_SCREEN_TIERS]
+        self._decoded = {}      # name -> surface as loaded from disk
+        self._scaled = {}       # name -> converted surface at self._size
+        self._size = None
+        self._loader = None
+
+    def preload(self, background=True):
+        """
+        Decode every image, in a daemon thread unless background is False.
+        Images that fail to load are skipped here and raise when requested.
+        """
+        if background:
+            self._loader = threading.Thread(target=self._decode_all,
+                                            name="asset-preload", daemon=True)
+            self._loader.start()
+        else:
+            self._decode_all()
+
+    def _decode_all(self):
+        for name in self.names:
+            if name not in self._decoded:
+                try:
+                    self._decoded[name] = self._decode(name)
+                except (pygame.error, OSError):
+                    pass
+
+    def _decode(self, name):
+        return pygame.image.load(os.path.join(self.image_dir, name))
+
+    def get(self, name, size):
+        """
+        Return the image converted to the display format and scaled to
+        (size, size)
+        """
+        if size != self._size:
+            self._scaled.clear()    # Resolution changed, rescale on demand
+            self._size = size
+
+        image = self._scaled.get(name)
+        if image is None:
+            decoded = self._decoded.get(name)
+            if decoded is None:
+                decoded = self._decoded[name] = self._decode(name)
+            image = pygame.transform.scale(self._convert(decoded), (size, size))
+            self._scaled[name] = image
+        return image
+
+    def prepare(self, size):
+        """
+        Scale every decoded image for size ahead of time
+        """
+        for name in list(self._decoded):
+            self.get(name, size)
+
+    @staticmethod
+    def _convert(image):
+        if image.get_flags() & pygame.SRCALPHA:
+            return image.convert_alpha()
+        return image.convert()
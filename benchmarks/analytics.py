@@ -0,0 +1,172 @@
+"""
+Benchmark of the telemetry analysis: analyze.py over a synthetic log of
+--records records, against the same statistics computed by a pure-Python
+loop over the records.
+
+The log is generated in a temporary directory, chunk by chunk, with
+random games whose levels follow get_difficulty(). The pure-Python loop
+only reads the first --python-records records, and its time is scaled to
+the whole log. The peak memory of the process is printed too: the
+analysis reads the log in chunks, so it stays far below the size of the
+log.
+
+Run from the repository root:
+
+    python -m benchmarks.analytics --records 10000000
+"""
+import argparse
+import collections
+import os
+import resource
+import sys
+import tempfile
+import time
+
+import numpy
+
+import analyze
+import telemetry
+from difficulty import get_difficulty
+
+MAX_LEVEL = 30
+GENERATE_CHUNK = 1 << 20
+
+
+def write_log(path, records, seed):
+    """
+    Write a log of records random flashed squares, clicks, level outcomes
+    and quits
+    """
+    rng = numpy.random.default_rng(seed)
+    dtype = telemetry.record_dtype()
+    grid_sizes = numpy.array([get_difficulty(level)[0] if level else 0
+                              for level in range(MAX_LEVEL + 1)])
+    with telemetry.open_for_append(path) as file:
+        for start in range(0, records, GENERATE_CHUNK):
+            count = min(GENERATE_CHUNK, records - start)
+            chunk = numpy.zeros(count, dtype=dtype)
+            level = rng.integers(1, MAX_LEVEL + 1, count)
+            grid_size = grid_sizes[level]
+            chunk["time"] = time.time() + numpy.arange(start, start + count)
+            chunk["game"] = rng.integers(0, 1 << 62, count)
+            chunk["since_flash_ms"] = rng.uniform(0, 5000, count)
+            chunk["level"] = level
+            chunk["starting_level"] = 1
+            chunk["grid_size"] = grid_size
+            chunk["flash_count"] = level + 2
+            chunk["delay"] = rng.choice([500, 800, 1000, 1500, 2000], count)
+            chunk["kind"] = rng.choice([telemetry.FLASH, telemetry.CLICK, telemetry.LEVEL,
+                                        telemetry.QUIT], count, p=[0.45, 0.45, 0.09, 0.01])
+            on_square = (chunk["kind"] == telemetry.CLICK) | (chunk["kind"] == telemetry.FLASH)
+            chunk["x"] = numpy.where(on_square, (rng.random(count) * grid_size).astype(int), -1)
+            chunk["y"] = numpy.where(on_square, (rng.random(count) * grid_size).astype(int), -1)
+            chunk["hit"] = rng.random(count) < 0.9 - level / 100
+            chunk["lives"] = rng.integers(0, 4, count)
+            chunk["allowed_mistakes"] = rng.integers(0, 4, count)
+            chunk["initial_lives"] = rng.integers(1, 5, count)
+            chunk["mistakes_left"] = chunk["allowed_mistakes"]
+            file.write(chunk.tobytes())
+
+
+def python_loop(path, records):
+    """
+    Same statistics as analyze.Analysis with a loop over the first records
+    records, for comparison. Return the seconds taken and the statistics.
+    """
+    start = time.perf_counter()
+    hits = collections.Counter()
+    flashes = collections.Counter()
+    rates = collections.defaultdict(lambda: [0, 0, 0, 0])
+    game_ends = collections.Counter()
+    names = [name for name, _ in telemetry.FIELDS]
+    with open(path, "rb") as file:
+        file.seek(telemetry.HEADER.size)
+        data = file.read(records * telemetry.RECORD_SIZE)
+    for values in telemetry.RECORD.iter_unpack(data):
+        record = dict(zip(names, values))
+        kind = record["kind"]
+        key = (record["delay"], record["flash_count"])
+        if kind == telemetry.CLICK:
+            rates[key][0] += 1
+            rates[key][1] += record["hit"]
+            if record["hit"]:
+                hits[record["grid_size"], record["x"], record["y"]] += 1
+        elif kind == telemetry.FLASH:
+            flashes[record["grid_size"], record["x"], record["y"]] += 1
+        if kind == telemetry.LEVEL:
+            rates[key][2] += 1
+            rates[key][3] += record["hit"]
+        if kind == telemetry.QUIT or (kind == telemetry.LEVEL and not record["hit"]
+                                      and not record["lives"]):
+            game_ends[record["allowed_mistakes"], record["initial_lives"], record["level"]] += 1
+    return time.perf_counter() - start, (hits, flashes, rates, game_ends)
+
+
+def same_statistics(analysis, statistics):
+    """
+    Whether analysis has the statistics computed by python_loop()
+    """
+    hits, flashes, rates, game_ends = statistics
+    numpy_ends = collections.Counter()
+    for (mistakes, lives), counts in analysis.game_ends.items():
+        for level in numpy.flatnonzero(counts).tolist():
+            numpy_ends[mistakes, lives, level] = int(counts[level])
+    return (square_counts(analysis.hits) == hits and square_counts(analysis.flashes) == flashes
+            and numpy_ends == game_ends
+            and {key: list(value) for key, value in analysis.rates.items()} == dict(rates))
+
+
+def square_counts(totals):
+    """
+    Counter of (grid_size, x, y) of the per square counts of analyze.Analysis
+    """
+    counter = collections.Counter()
+    for grid_size, counts in totals.items():
+        for cell in numpy.flatnonzero(counts).tolist():
+            counter[(grid_size,) + divmod(cell, grid_size)] = int(counts[cell])
+    return counter
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--records", type=int, default=10000000)
+    parser.add_argument("--python-records", type=int, default=200000,
+                        help="records read by the pure-Python loop")
+    parser.add_argument("--chunk", type=int, default=analyze.CHUNK)
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args(argv)
+
+    with tempfile.TemporaryDirectory() as directory:
+        path = os.path.join(directory, "synthetic" + telemetry.EXTENSION)
+        start = time.perf_counter()
+        write_log(path, args.records, args.seed)
+        size = os.path.getsize(path)
+        print("generated %d records (%.0f MB) in %.1f s"
+              % (args.records, size / 1e6, time.perf_counter() - start))
+
+        python_records = min(args.python_records, args.records)
+        python_time, statistics = python_loop(path, python_records)
+        python_time *= args.records / python_records
+        check = analyze.Analysis()
+        check.add(next(telemetry.read_chunks(path, python_records)))
+        same = same_statistics(check, statistics)
+
+        start = time.perf_counter()
+        analysis = analyze.analyze([path], args.chunk)
+        numpy_time = time.perf_counter() - start
+        peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024   # KiB on Linux
+
+    print("numpy, chunks of %d: %.2f s (%.1f M records/s)"
+          % (args.chunk, numpy_time, analysis.records / numpy_time / 1e6))
+    print("pure Python loop:     %.1f s, scaled from %d records (%.0fx slower)"
+          % (python_time, python_records, python_time / numpy_time))
+    print("peak memory of the process: %.0f MB for a %.0f MB log" % (peak, size / 1e6))
+    if not same:
+        print("FAIL: the statistics differ from the ones of the pure-Python loop")
+        return 1
+    print("same statistics as the pure-Python loop on its %d records" % python_records)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,72 @@
+"""
+Microbenchmark of the flashing squares generation: Board.flash(),
+as the game calls it on the board it keeps, against the previous
+retry-on-collision loop, for grids up to 100x100 and flash densities from
+10% to 100%.
+
+Run from the repository root:
+
+    python -m benchmarks.flash_squares --sizes 10 50 100 --repeat 3
+"""
+import argparse
+import random
+import sys
+import timeit
+
+from board import Board
+
+DENSITIES = (0.1, 0.25, 0.5, 0.75, 0.9, 1.0)
+BOARD = Board()
+
+
+def rejection_flash_cells(grid_size, num_flash_squares, rng=random):
+    """
+    The previous algorithm: draw random squares and retry on collisions
+    """
+    grid = [[0] * grid_size for _ in range(grid_size)]
+    cells = []
+    while len(cells) < num_flash_squares:
+        x = rng.randint(0, grid_size - 1)
+        y = rng.randint(0, grid_size - 1)
+        if grid[x][y] == 0:
+            grid[x][y] = 1
+            cells.append((x, y))
+    return cells
+
+
+def board_flash(grid_size, num_flash_squares, rng=random):
+    """
+    The game's algorithm: empty the board it keeps and flash the squares
+    on it with Board.flash()
+    """
+    BOARD.reset(grid_size)
+    BOARD.flash(num_flash_squares, rng)
+    return BOARD
+
+
+def best_time(func, grid_size, count, repeat, seed):
+    rng = random.Random(seed)
+    return min(timeit.repeat(lambda: func(grid_size, count, rng), number=1, repeat=repeat))
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--sizes", type=int, nargs="+", default=[10, 25, 50, 100])
+    parser.add_argument("--densities", type=float, nargs="+", default=list(DENSITIES))
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args(argv)
+
+    print(f"{'grid':>7} {'density':>8} {'squares':>8} {'sample':>12} {'rejection':>12} {'speedup':>8}")
+    for grid_size in args.sizes:
+        for density in args.densities:
+            count = max(1, round(grid_size * grid_size * density))
+            exact = best_time(board_flash, grid_size, count, args.repeat, args.seed)
+            retry = best_time(rejection_flash_cells, grid_size, count, args.repeat, args.seed)
+            print(f"{grid_size:>3}x{grid_size:<3} {density:>8.0%} {count:>8} "
+                  f"{exact * 1000:>9.3f} ms {retry * 1000:>9.3f} ms {retry / exact:>7.1f}x")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,77 @@
+"""
+Benchmark of the grid drawing: one pygame.draw.rect per square, as the game
+used to do, against the cached grid surface blitted in one call with the
+flashing squares added in a single batch.
+
+Run from the repository root (no window is opened):
+
+    python -m benchmarks.grid_drawing --width 1900 --sizes 3 10 20 50 100
+"""
+import argparse
+import os
+import random
+import sys
+import timeit
+
+os.environ.setdefault("SDL_VIDEODRIVER", "dummy")
+
+import pygame
+
+from layout import Layout
+from render import GridRenderer
+
+WHITE = 255, 255, 255
+LIGHT_BLUE = 0, 150, 255
+DARK_BLUE = 0, 120, 205
+
+
+def draw_squares(surface, geometry, flashed):
+    """
+    The previous drawing code: one rectangle per square
+    """
+    for x, y, rect in geometry.cells():
+        pygame.draw.rect(surface, WHITE if (x, y) in flashed else DARK_BLUE, rect)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--width", type=int, default=1900)
+    parser.add_argument("--sizes", type=int, nargs="+", default=[3, 5, 10, 20, 30, 50, 75, 100])
+    parser.add_argument("--number", type=int, default=20)
+    args = parser.parse_args(argv)
+
+    pygame.init()
+    screen = pygame.display.set_mode((args.width, int(args.width // 1.5)))
+    renderer = GridRenderer(LIGHT_BLUE, DARK_BLUE, WHITE)
+    rng = random.Random(0)
+    layout = Layout(args.width, int(args.width // 1.5))     # The grids of the game screen
+
+    print(f"{'grid':>7} {'per square':>12} {'cached':>12} {'speedup':>8}   (flash frame, {args.width} wide)")
+    for grid_size in args.sizes:
+        geometry = layout.grid(grid_size)
+        flashed = set(divmod(cell, grid_size)
+                      for cell in rng.sample(range(grid_size * grid_size), grid_size + 2))
+
+        # Both ways must produce the same pixels
+        screen.fill(LIGHT_BLUE)
+        draw_squares(screen, geometry, flashed)
+        expected = pygame.image.tobytes(screen, "RGB")
+        screen.fill(LIGHT_BLUE)
+        renderer.draw_flash(screen, geometry, flashed)
+        if pygame.image.tobytes(screen, "RGB") != expected:
+            print(f"{grid_size}x{grid_size}: cached grid differs from the per square drawing")
+            return 1
+
+        before = min(timeit.repeat(lambda: draw_squares(screen, geometry, flashed),
+                                   number=args.number, repeat=3)) / args.number
+        after = min(timeit.repeat(lambda: renderer.draw_flash(screen, geometry, flashed),
+                                  number=args.number, repeat=3)) / args.number
+        print(f"{grid_size:>3}x{grid_size:<3} {before * 1000:>9.3f} ms {after * 1000:>9.3f} ms "
+              f"{before / after:>7.1f}x")
+
+    pygame.quit()
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,117 @@
+"""
+Benchmark of the session server on the loopback interface: how many
+concurrent sessions one core can host, and the p99 latency of the clicks.
+
+The server runs in a subprocess listening on 127.0.0.1 only, and the load
+generator plays --sessions sessions against it from this process. While
+the load runs, the server counters are sampled to get the mean number of
+open sessions and the CPU time the server used. Sessions per core is that
+mean divided by the fraction of a core the server was busy: the number of
+sessions at the same pace a saturated core would host. The load generator
+competes with the server for the CPU on a machine with few cores, which
+makes the latencies pessimistic.
+
+Run from the repository root:
+
+    python -m benchmarks.session_server --sessions 2000 --levels 3
+"""
+import argparse
+import asyncio
+import json
+import os
+import subprocess
+import sys
+
+import loadgen
+
+HOST = "127.0.0.1"      # Loopback only
+SAMPLE_INTERVAL = 0.5   # Seconds between two samples of the server counters
+
+
+def start_server():
+    """
+    Start the server on a free port, and return the process and the port
+    """
+    root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    process = subprocess.Popen([sys.executable, "server.py", "--host", HOST, "--port", "0"],
+                               cwd=root, stdout=subprocess.PIPE, text=True)
+    line = process.stdout.readline()
+    if not line.startswith("listening on "):
+        process.kill()
+        raise RuntimeError("the server did not start: %r" % line)
+    return process, int(line.rsplit(":", 1)[1])
+
+
+async def measure(port, args):
+    before = await loadgen.fetch_stats(HOST, port)
+    samples = []
+
+    async def sample():
+        while True:
+            await asyncio.sleep(SAMPLE_INTERVAL)
+            samples.append(await loadgen.fetch_stats(HOST, port))
+
+    sampler = asyncio.ensure_future(sample())
+    try:
+        results = await loadgen.run_load(HOST, port, args.sessions, args.levels, args.think_ms,
+                                         args.error_rate, args.ramp, {"delay": args.delay},
+                                         args.seed)
+    finally:
+        sampler.cancel()
+    after = await loadgen.fetch_stats(HOST, port)
+    return before, samples, after, results
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--sessions", type=int, default=2000)
+    parser.add_argument("--levels", type=int, default=3)
+    parser.add_argument("--think-ms", type=float, default=300)
+    parser.add_argument("--error-rate", type=float, default=0.05)
+    parser.add_argument("--ramp", type=float, default=2.0)
+    parser.add_argument("--delay", type=int, default=1000)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--json", action="store_true", help="print the results as JSON")
+    args = parser.parse_args(argv)
+
+    process, port = start_server()
+    try:
+        before, samples, after, results = asyncio.run(measure(port, args))
+    finally:
+        process.terminate()
+        process.wait()
+
+    summary = loadgen.summarize(results)
+    cpu = after["cpu_s"] - before["cpu_s"]
+    busy = cpu / (after["uptime_s"] - before["uptime_s"])
+    open_sessions = [stats["sessions"] for stats in samples] or [0]
+    mean_sessions = sum(open_sessions) / len(open_sessions)
+    summary.update(
+        server_cpu_s=cpu,
+        server_busy=busy,
+        mean_open_sessions=mean_sessions,
+        max_open_sessions=max(open_sessions),
+        sessions_per_core=mean_sessions / busy if busy else None,
+        server_click_p99_ms=after.get("click_p99_ms"),
+        server_errors=after["errors"] - before["errors"],
+    )
+
+    if args.json:
+        print(json.dumps(summary, indent=1))
+    else:
+        print("%d sessions completed, %d failed, %d clicks in %.1f s"
+              % (summary["completed"], summary["failed"], summary["clicks"], summary["seconds"]))
+        print("open sessions: mean %.0f, max %d; server busy %.1f%% of a core"
+              % (mean_sessions, summary["max_open_sessions"], busy * 100))
+        if summary["sessions_per_core"]:
+            print("sessions per core: %.0f" % summary["sessions_per_core"])
+        if "p99_ms" in summary:
+            print("click round trip: p50 %.2f ms, p99 %.2f ms, max %.2f ms"
+                  % (summary["p50_ms"], summary["p99_ms"], summary["max_ms"]))
+        if summary["server_click_p99_ms"] is not None:
+            print("click validation in the server: p99 %.3f ms" % summary["server_click_p99_ms"])
+    return 1 if summary["failed"] or summary["server_errors"] else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,363 @@
+"""
+Benchmark suite of the game, with stored baselines and a regression gate.
+
+The suite times the hot paths of the game with the dummy video driver, at
+every supported resolution where the screen size matters:
+- grid/<size>/draw_grid|clear_grid/<n>: the flash and empty grids, n x n
+- flash/<n>/<density>: a board reset and its flashing squares drawn
+- difficulty: get_difficulty() of levels 1 to 1000, without its cache
+- text/<size>/<function>/cold|warm: the print_* functions, with the
+  rendered texts dropped before each call (fonts stay loaded) or cached
+- end_screen/<size>/load|warm: print_end_screen() decoding, converting and
+  scaling its image, or with the image ready
+- level/<size>: a whole level played in PlayScene with a virtual clock,
+  from its intro to the first frame of the next level, display updates
+  included
+
+The suite is run --rounds times, every benchmark timing a batch of calls
+per round, and the best round of each benchmark is kept: the noise of a
+busy machine comes in bursts, which spoil a round of a few benchmarks
+rather than all the timings of one. "run" writes
+the results to a JSON file, and "compare" checks results, or a new run,
+against such a baseline: it fails if a benchmark got slower than the
+baseline by more than --threshold, and by more than --min-delta-us, which
+keeps the benchmarks of a few microseconds from failing on noise. When
+compare runs the suite itself, the regressed benchmarks are run again up
+to --retries times, and only the ones slow every time fail the gate.
+Timings only compare on the same machine, so make the baseline where the
+gate runs.
+
+The end screen images are generated in a temporary directory, so the
+suite does not depend on the images of the game being installed.
+
+Run from the repository root (no window is opened):
+
+    python -m benchmarks.suite run --out benchmarks/baselines/default.json
+    python -m benchmarks.suite compare benchmarks/baselines/default.json --threshold 0.25
+
+benchmarks/grid_drawing.py and benchmarks/flash_squares.py compare the
+grid drawing and the flashing squares with the algorithms they replaced.
+"""
+import argparse
+import datetime
+import json
+import os
+import platform
+import random
+import re
+import statistics
+import sys
+import tempfile
+import time
+
+os.environ.setdefault("SDL_VIDEODRIVER", "dummy")
+
+import pygame
+
+import main as visual_memory
+import text_cache
+from assets import AssetManager, END_SCREEN_TIERS
+from board import Board
+from difficulty import get_difficulty
+
+BASELINE = os.path.join(os.path.dirname(os.path.abspath(__file__)), "baselines", "default.json")
+GRID_SIZES = (3, 5, 10, 20, 50, 100)
+FLASH_SIZES = (10, 50, 100)
+DENSITIES = (0.1, 0.5, 0.9)
+LEVELS = 1000           # Levels of the difficulty benchmark
+SIMULATED_LEVEL = 10    # Level played by the level benchmark
+IMAGE_SIZE = 600        # Side of the generated end screen images
+MIN_TIME = 0.02         # Seconds of a timed batch of calls
+ROUNDS = 7
+THRESHOLD = 0.25
+MIN_DELTA = 2e-6        # Seconds of a slowdown under which it is noise
+RETRIES = 2             # New runs of the regressed benchmarks before failing
+
+
+def calibrate(func, min_time=MIN_TIME):
+    """
+    Number of calls to func in a batch lasting at least min_time seconds
+    """
+    number = 1
+    while True:
+        if time_batch(func, number) * number >= min_time:
+            return number
+        number *= 2
+
+
+def time_batch(func, number):
+    """
+    Time of a call to func, in seconds, over number calls
+    """
+    start = time.perf_counter()
+    for _ in range(number):
+        func()
+    return (time.perf_counter() - start) / number
+
+
+def write_images(directory):
+    """
+    Write an image of noise for each end screen tier, in its file format
+    """
+    rng = random.Random(0)
+    image = pygame.Surface((IMAGE_SIZE, IMAGE_SIZE))
+    for y in range(0, IMAGE_SIZE, 20):
+        for x in range(0, IMAGE_SIZE, 20):
+            image.fill((rng.randrange(256), rng.randrange(256), rng.randrange(256)),
+                       (x, y, 20, 20))
+    for _, name, _ in END_SCREEN_TIERS:
+        pygame.image.save(image, os.path.join(directory, name))
+
+
+class VirtualClock:
+    """
+    Clock of the timed phases, moved forward by hand
+    """
+
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+def play_level(scene, clock):
+    """
+    Play a level of scene from its intro to the first frame of the next
+    one, clicking every flashed square, with a frame presented per step
+    """
+    loop = visual_memory.frame_loop
+    game = visual_memory.game
+    visual_memory.board_rng.seed(0)     # Same level on every call
+    scene.enter()
+    loop.present()
+
+    for _ in ("intro", "flash"):
+        clock.now = scene.phase.deadline
+        scene.update()
+        loop.present()
+
+    for x, y in game.board.flashed_cells():
+        pos = scene.geometry.cell_rect(x, y).center
+        scene.handle_event(pygame.event.Event(pygame.MOUSEBUTTONDOWN, button=1, pos=pos))
+        scene.update()
+        loop.present()
+
+    clock.now = scene.phase.deadline    # End of the pause on the last click
+    scene.update()
+    loop.present()
+    scene.exit()
+
+
+def benchmarks(widths, image_dir):
+    """
+    Yield (name, function to time) for every benchmark, with the end screen
+    images in image_dir. The functions of a resolution are yielded while the
+    screen has that resolution.
+    """
+    rng = random.Random(0)
+
+    for grid_size in FLASH_SIZES:
+        board = Board()
+        for density in DENSITIES:
+            count = max(1, round(grid_size * grid_size * density))
+
+            def flash(board=board, grid_size=grid_size, count=count):
+                board.reset(grid_size)
+                board.flash(count, rng)
+            yield "flash/%d/%g" % (grid_size, density), flash
+
+    def difficulty():
+        for level in range(1, LEVELS + 1):
+            get_difficulty.__wrapped__(level)
+    yield "difficulty", difficulty
+
+    game = visual_memory.game
+    clock = VirtualClock()
+    for width in widths:
+        visual_memory.set_resolution(width)
+        screen = pygame.display.set_mode(visual_memory.SIZE)
+        size = "%dx%d" % visual_memory.SIZE
+
+        for grid_size in GRID_SIZES:
+            game.grid_size = grid_size
+            game.board.reset(grid_size)
+            game.board.flash(max(1, grid_size * grid_size // 3), rng)
+            yield ("grid/%s/draw_grid/%d" % (size, grid_size),
+                   lambda: visual_memory.draw_grid(screen, game.board))
+            yield ("grid/%s/clear_grid/%d" % (size, grid_size),
+                   lambda: visual_memory.clear_grid(screen))
+
+        game.level = SIMULATED_LEVEL
+        for function in (visual_memory.print_menu, visual_memory.print_all_settings,
+                         visual_memory.print_top_text):
+            def cold(function=function):
+                text_cache.cache.clear()
+                function(screen)
+            yield "text/%s/%s/cold" % (size, function.__name__), cold
+            yield "text/%s/%s/warm" % (size, function.__name__), lambda function=function: function(screen)
+
+        def load_end_screen():
+            visual_memory.assets = AssetManager(image_dir)
+            visual_memory.print_end_screen(screen)
+        yield "end_screen/%s/load" % size, load_end_screen
+        yield "end_screen/%s/warm" % size, lambda: visual_memory.print_end_screen(screen)
+
+        scene = visual_memory.PlayScene(screen, clock)
+        yield "level/%s" % size, lambda: play_level(scene, clock)
+
+
+def run(widths, pattern=None, rounds=ROUNDS, out=sys.stdout):
+    """
+    Run the benchmarks whose name matches the regular expression pattern,
+    and return the results document
+    """
+    pygame.display.init()
+    visual_memory.frame_loop.fps = 0        # No frame cap
+    visual_memory.STARTING_LEVEL = SIMULATED_LEVEL
+
+    numbers = {}    # Name -> calls per batch, found in the first round
+    times = {}      # Name -> time per call of each round
+    with tempfile.TemporaryDirectory() as image_dir:
+        write_images(image_dir)
+        for _ in range(rounds):
+            for name, func in benchmarks(widths, image_dir):
+                if pattern is not None and not re.search(pattern, name):
+                    continue
+                if name not in numbers:
+                    numbers[name] = calibrate(func)
+                times.setdefault(name, []).append(time_batch(func, numbers[name]))
+                if pygame.display.get_surface() is not None:
+                    visual_memory.frame_loop.damage.present()     # Drop the damage of the calls
+
+    results = {}
+    for name, samples in times.items():
+        results[name] = {"seconds": min(samples), "median": statistics.median(samples),
+                         "number": numbers[name]}
+        print("%-45s %12.1f us" % (name, results[name]["seconds"] * 1e6), file=out)
+
+    return {
+        "meta": {
+            "created": datetime.datetime.now().isoformat(timespec="seconds"),
+            "python": platform.python_version(),
+            "pygame": pygame.version.ver,
+            "sdl": ".".join(map(str, pygame.get_sdl_version())),
+            "platform": platform.platform(),
+            "machine": platform.machine(),
+            "video_driver": os.environ.get("SDL_VIDEODRIVER"),
+        },
+        "results": results,
+    }
+
+
+def regressed(baseline, current, threshold=THRESHOLD, min_delta=MIN_DELTA):
+    """
+    Names of the benchmarks of current slower than in baseline by more than
+    threshold and more than min_delta seconds
+    """
+    names = []
+    for name, result in current["results"].items():
+        base = baseline["results"].get(name)
+        if (base is not None and result["seconds"] > base["seconds"] * (1 + threshold)
+                and result["seconds"] - base["seconds"] > min_delta):
+            names.append(name)
+    return names
+
+
+def rerun(baseline, current, widths, rounds, threshold=THRESHOLD, min_delta=MIN_DELTA,
+          retries=RETRIES):
+    """
+    Run the regressed benchmarks of current again, up to retries times,
+    keeping their best time, so a burst of noise does not fail the gate
+    """
+    for _ in range(retries):
+        names = regressed(baseline, current, threshold, min_delta)
+        if not names:
+            break
+        print("running again: %s" % ", ".join(names), file=sys.stderr)
+        pattern = "^(%s)$" % "|".join(map(re.escape, names))
+        again = run(widths, pattern, rounds, out=sys.stderr)
+        for name, result in again["results"].items():
+            if result["seconds"] < current["results"][name]["seconds"]:
+                current["results"][name] = result
+    return current
+
+
+def compare(baseline, current, threshold=THRESHOLD, min_delta=MIN_DELTA, out=sys.stdout):
+    """
+    Print the change of every benchmark against the baseline and return
+    the names of the ones slower by more than threshold and min_delta
+    seconds
+    """
+    regressions = regressed(baseline, current, threshold, min_delta)
+    print("%-45s %12s %12s %8s" % ("benchmark", "baseline", "current", "change"), file=out)
+    for name, result in current["results"].items():
+        base = baseline["results"].get(name)
+        if base is None:
+            print("%-45s %12s %9.1f us %8s" % (name, "-", result["seconds"] * 1e6, "new"), file=out)
+            continue
+        change = result["seconds"] / base["seconds"] - 1
+        status = "  REGRESSION" if name in regressions else ""
+        print("%-45s %9.1f us %9.1f us %+7.1f%%%s"
+              % (name, base["seconds"] * 1e6, result["seconds"] * 1e6, change * 100, status),
+              file=out)
+    for name in baseline["results"].keys() - current["results"].keys():
+        print("%-45s not run" % name, file=out)
+    return regressions
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    run_parser = commands.add_parser("run", help="run the benchmarks and save the results")
+    compare_parser = commands.add_parser("compare", help="compare results with a baseline")
+    compare_parser.add_argument("baseline", nargs="?", default=BASELINE)
+    compare_parser.add_argument("results", nargs="?",
+                                help="results of an earlier run (default: run now)")
+    compare_parser.add_argument("--threshold", type=float, default=THRESHOLD,
+                                help="slowdown that fails, as a fraction (default: %(default)s)")
+    compare_parser.add_argument("--min-delta-us", type=float, default=MIN_DELTA * 1e6,
+                                help="slowdown in microseconds under which it is noise "
+                                     "(default: %(default)s)")
+    compare_parser.add_argument("--retries", type=int, default=RETRIES,
+                                help="new runs of the regressed benchmarks (default: %(default)s)")
+    for command in (run_parser, compare_parser):
+        command.add_argument("--out", help="write the results of the run to this JSON file")
+        command.add_argument("--widths", type=int, nargs="+",
+                             default=list(visual_memory.SUPPORTED_WIDTHS))
+        command.add_argument("--filter", help="only run the benchmarks matching this regex")
+        command.add_argument("--rounds", type=int, default=ROUNDS)
+    args = parser.parse_args(argv)
+
+    if args.command == "compare":
+        with open(args.baseline, encoding="utf-8") as file:
+            baseline = json.load(file)
+        if args.results is not None:
+            with open(args.results, encoding="utf-8") as file:
+                current = json.load(file)
+        else:
+            current = run(args.widths, args.filter, args.rounds, out=sys.stderr)
+            current = rerun(baseline, current, args.widths, args.rounds, args.threshold,
+                            args.min_delta_us / 1e6, args.retries)
+    else:
+        current = run(args.widths, args.filter, args.rounds)
+    pygame.quit()
+
+    if args.out:
+        os.makedirs(os.path.dirname(os.path.abspath(args.out)), exist_ok=True)
+        with open(args.out, "w", encoding="utf-8") as file:
+            json.dump(current, file, indent=1)
+
+    if args.command == "compare":
+        regressions = compare(baseline, current, args.threshold, args.min_delta_us / 1e6)
+        if regressions:
+            print("%d benchmarks regressed by more than %.0f%%"
+                  % (len(regressions), args.threshold * 100))
+            return 1
+        print("no regression over %.0f%%" % (args.threshold * 100))
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,113 @@
+"""
+Game boards and their generation.
+
+A board stores one byte per square in a flat bytearray, in column order
+(square (x, y) is at index x * size + y). When NumPy is installed, a
+zero-copy NumPy view of the same bytes is used for the whole-board
+operations. A board is meant to be reset and reused from one level to the
+next instead of being reallocated.
+"""
+import random
+
+try:
+    import numpy
+except ImportError:
+    numpy = None
+
+# Square states
+EMPTY = 0       # Square that did not flash
+TARGET = 1      # Square that flashed and was not clicked yet
+FOUND = 2       # Flashed square clicked by the player
+MISSED = 3      # Square that did not flash, clicked by the player
+
+
+class Board:
+    """
+    Square grid of cell states backed by a flat bytearray
+    """
+
+    __slots__ = ("size", "cells", "array", "_zeros")
+
+    def __init__(self, size=0, use_numpy=True):
+        self.size = 0
+        self.cells = bytearray()
+        self.array = None   # NumPy view of the cells in use, if NumPy is used
+        self._zeros = b""
+        if use_numpy and numpy is not None:
+            self.array = numpy.zeros(0, dtype=numpy.uint8)
+        self.reset(size)
+
+    def reset(self, size):
+        """
+        Empty the board in place, resizing it to size x size. The buffer is
+        only reallocated when the board becomes bigger than it ever was.
+        """
+        length = size * size
+        if length > len(self.cells):
+            self.cells = bytearray(length)
+            self._zeros = bytes(length)
+        else:
+            self.cells[:length] = memoryview(self._zeros)[:length]
+        self.size = size
+
+        if self.array is not None:
+            self.array = numpy.frombuffer(self.cells, dtype=numpy.uint8, count=length)
+
+    def copy_from(self, other):
+        """
+        Make the board a copy of other, in place
+        """
+        self.reset(other.size)
+        length = other.size * other.size
+        self.cells[:length] = memoryview(other.cells)[:length]
+
+    def get(self, x, y):
+        return self.cells[x*self.size + y]
+
+    def set(self, x, y, state):
+        self.cells[x*self.size + y] = state
+
+    def flash(self, num_flash_squares, rng=random):
+        """
+        Turn num_flash_squares random empty squares into targets. The
+        squares are sampled without replacement from their flat indices, so
+        the cost does not depend on how full the grid gets.
+        """
+        cells = self.cells
+        for cell in rng.sample(range(self.size * self.size), num_flash_squares):
+            cells[cell] = TARGET
+
+    def count(self, state):
+        """
+        Number of squares in state
+        """
+        if self.array is not None:
+            return int(numpy.count_nonzero(self.array == state))
+        return self.cells.count(state, 0, self.size * self.size)
+
+    def remaining_targets(self):
+        return self.count(TARGET)
+
+    def flashed_mask(self):
+        """
+        Mask of the squares that flashed, clicked or not, indexed
+        mask[x][y]: a size x size boolean NumPy array, or a list of size
+        bytearray columns of 0/1 when NumPy is not used
+        """
+        size = self.size
+        if self.array is not None:
+            return ((self.array == TARGET) | (self.array == FOUND)).reshape(size, size)
+        cells = self.cells
+        return [bytearray(cells[cell] in (TARGET, FOUND) for cell in range(x*size, (x+1)*size))
+                for x in range(size)]
+
+    def flashed_cells(self):
+        """
+        List of the (x, y) squares that flashed
+        """
+        size = self.size
+        if self.array is not None:
+            indices = numpy.flatnonzero((self.array == TARGET) | (self.array == FOUND))
+            return [divmod(int(cell), size) for cell in indices]
+        return [divmod(cell, size) for cell in range(size * size)
+                if self.cells[cell] in (TARGET, FOUND)]
@@ -0,0 +1,150 @@
+"""
+Game settings taken from the command line, a JSON config file and the
+environment.
+
+Each setting starts from the default given by the game, then is overridden
+by the config file, then by the environment variable VISUAL_MEMORY_<NAME>,
+then by the command line option --<name>. The config file is the one given
+by --config or VISUAL_MEMORY_CONFIG, or visual_memory.json in the current
+directory if it exists, and holds a JSON object such as:
+
+    {"width": 1300, "delay": 800, "allowed_mistakes": 1}
+
+The game settings must be in the range of the settings screen, given by
+game_core.SETTINGS. A value of the wrong type or out of range is an error,
+reported with the place it comes from.
+
+Nothing here touches pygame or stdin, so loading the settings never blocks.
+"""
+import argparse
+import json
+import os
+
+import game_core
+
+CONFIG_FILE = "visual_memory.json"
+ENV_PREFIX = "VISUAL_MEMORY_"
+
+# Setting name -> (type, help)
+OPTIONS = {
+    "width": (int, "screen width in pixels, from 900 to 1900 (the height is width / 1.5)"),
+    "starting_level": (int, "level of the first round of a game"),
+    "delay": (int, "time the squares flash, in milliseconds"),
+    "initial_lives": (int, "lives at the start of a game"),
+    "allowed_mistakes": (int, "wrong squares allowed per level"),
+    "max_fps": (int, "frame rate cap"),
+    "board_seed": (int, "seed of the flashing squares, to get the same boards again"),
+    "player": (str, "name under which the scores are saved"),
+    "store": (str, "JSON file where the settings and scores are saved"),
+    "headless": (bool, "render every screen at every resolution without a window, then exit"),
+    "frames": (str, "in headless mode, save the rendered screens as PNG files in this directory"),
+    "telemetry": (str, "append every flashed square, click and level outcome to binary log "
+                       "files, named with this strftime() pattern such as "
+                       "telemetry/%%Y-%%m-%%d.vmlog"),
+    "record": (str, "record the seed, settings and input of the session to this file"),
+    "replay": (str, "replay a recorded session instead of reading the input"),
+    "fast_replay": (bool, "replay as fast as possible instead of at the recorded speed"),
+    "profile": (bool, "time the frames and hot paths, F3 shows them on screen"),
+    "profile_out": (str, "file where the profile is saved at exit, .json or .csv"),
+    "profile_startup": (bool, "print the time spent in each startup step until the first menu frame"),
+}
+
+_FALSE = ("", "0", "false", "no", "off")
+
+
+def build_parser():
+    parser = argparse.ArgumentParser(prog="main.py", description="Visual Memory")
+    parser.add_argument("--config", metavar="PATH",
+                        help="JSON config file (default: %s if it exists)" % CONFIG_FILE)
+    for name, (type_, help) in OPTIONS.items():
+        flag = "--" + name.replace("_", "-")
+        if type_ is bool:
+            parser.add_argument(flag, action=argparse.BooleanOptionalAction, default=None, help=help)
+        else:
+            parser.add_argument(flag, type=type_, default=None, metavar=name.upper(), help=help)
+    return parser
+
+
+def load(argv=None, defaults=None, environ=None):
+    """
+    Return the settings as an argparse.Namespace with one attribute per
+    name of OPTIONS, None for the settings with no default and no value
+    """
+    environ = os.environ if environ is None else environ
+    parser = build_parser()
+    args = parser.parse_args(argv)
+
+    settings = dict.fromkeys(OPTIONS)
+    settings.update(defaults or {})
+
+    path = args.config or environ.get(ENV_PREFIX + "CONFIG")
+    if path is None and os.path.exists(CONFIG_FILE):
+        path = CONFIG_FILE
+    if path is not None:
+        settings.update(read_file(path, parser))
+
+    for name, (type_, _) in OPTIONS.items():
+        value = environ.get(ENV_PREFIX + name.upper())
+        if value is not None:
+            try:
+                settings[name] = parse_value(type_, value)
+            except ValueError:
+                parser.error("%s%s: invalid %s value: %r"
+                             % (ENV_PREFIX, name.upper(), type_.__name__, value))
+            problem = check_value(name, settings[name])
+            if problem is not None:
+                parser.error("%s%s: %s" % (ENV_PREFIX, name.upper(), problem))
+
+    for name in OPTIONS:
+        value = getattr(args, name)
+        if value is not None:
+            problem = check_value(name, value)
+            if problem is not None:
+                parser.error("argument --%s: %s" % (name.replace("_", "-"), problem))
+            settings[name] = value
+
+    return argparse.Namespace(**settings)
+
+
+def check_value(name, value):
+    """
+    Why value cannot be used for setting name, or None if it can
+    """
+    type_ = OPTIONS[name][0]
+    if not isinstance(value, type_) or (type_ is int and isinstance(value, bool)):
+        return "%s must be a %s" % (name, type_.__name__)
+    limits = game_core.SETTINGS.get(name)
+    if limits is not None and not limits[1] <= value <= limits[2]:
+        return "%s must be from %d to %d, not %d" % (name, limits[1], limits[2], value)
+    return None
+
+
+def parse_value(type_, text):
+    """
+    Convert the text of an environment variable to a setting of type_
+    """
+    if type_ is bool:
+        return text.strip().lower() not in _FALSE
+    return type_(text)
+
+
+def read_file(path, parser):
+    """
+    Read the settings of a JSON config file, exiting with an error message
+    if it cannot be used
+    """
+    try:
+        with open(path, encoding="utf-8") as file:
+            values = json.load(file)
+    except (OSError, ValueError) as error:
+        parser.error("cannot read config file %s: %s" % (path, error))
+
+    if not isinstance(values, dict):
+        parser.error("config file %s must hold a JSON object" % path)
+    for name, value in values.items():
+        if name not in OPTIONS:
+            parser.error("config file %s: unknown setting %r" % (path, name))
+        problem = None if value is None else check_value(name, value)
+        if problem is not None:
+            parser.error("config file %s: %s" % (path, problem))
+    return values
@@ -0,0 +1,21 @@
+"""
+Difficulty of each level.
+
+A level shows level + 2 flashing squares. The grid grows by one each time
+3 * squares + 1 or 3 * squares + 3 is a perfect square, which happens for
+squares = (side**2 - 1) // 3. The grid side for a number of squares is
+therefore the largest side with (side**2 - 1) // 3 <= squares, which is
+math.isqrt(3 * squares + 3).
+"""
+import functools
+import math
+
+
+@functools.lru_cache(maxsize=1024)
+def get_difficulty(level):
+    """
+    Return the grid size and the number of flashing squares of a level
+    """
+    num_flash_squares = level + 2
+    grid_size = math.isqrt(3*num_flash_squares + 3)
+    return grid_size, num_flash_squares
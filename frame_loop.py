@@ -0,0 +1,131 @@
+"""
+Frame paced driver for the event loops of the game screens.
+
+Instead of spinning on pygame.event.get(), a screen asks the driver for the
+events of the next frame and then presents it. The driver blocks in
+pygame.event.wait() while there is nothing to do, caps the frame rate with a
+pygame.time.Clock when events keep coming, and only pushes to the display
+the areas that were drawn since the last frame.
+"""
+import math
+import time
+
+import pygame
+
+from render import DirtyRects
+
+MAX_FPS = 60
+WAIT_MARGIN = 2     # Milliseconds of a timeout slept instead of waited for events
+SPIN = 0.3          # Milliseconds of a timeout spent polling the clock
+
+
+class FrameLoop:
+    """
+    Pace a screen's event loop and keep track of the time spent per frame
+    """
+
+    def __init__(self, fps=MAX_FPS):
+        self.fps = fps
+        self.clock = pygame.time.Clock()
+        self.damage = DirtyRects()
+
+        # Time spent processing the last frame, waiting excluded
+        self.frame_ms = 0.0     # Wall clock time
+        self.cpu_ms = 0.0       # CPU time of the process
+        self.present_ms = 0.0   # Time spent pushing the frame to the display
+        self.frames = 0
+
+        # Functions called with the loop and the events of each frame, with
+        # the loop just before each frame is presented (to draw on top of
+        # it), and with the loop after each frame is presented
+        self.on_events = []
+        self.on_draw = []
+        self.on_present = []
+
+        # Object returning the events in place of the pygame event queue,
+        # with an events_for(loop, timeout) method (e.g. a replay.Replayer)
+        self.source = None
+
+        self._frame_start = time.perf_counter()
+        self._cpu_start = time.process_time()
+
+    @property
+    def dirty(self):
+        return bool(self.damage)
+
+    @property
+    def pixels_pushed(self):
+        return self.damage.pixels_pushed
+
+    def mark_dirty(self, rect=None):
+        """
+        Ask for rect, or the whole screen if rect is None, to be pushed to
+        the display at the end of the frame
+        """
+        if rect is None:
+            self.damage.add_all()
+        else:
+            self.damage.add(rect)
+
+    def events(self, timeout=None):
+        """
+        Return the events of the next frame. When no event is queued and
+        nothing is waiting to be shown, block until an event arrives, or for
+        at most timeout milliseconds.
+        """
+        if self.source is not None:
+            events = self.source.events_for(self, timeout)
+        elif self.dirty or pygame.event.peek():
+            events = pygame.event.get()
+        elif timeout is None:
+            events = [pygame.event.wait()]
+            events.extend(pygame.event.get())
+        else:
+            # pygame.event.wait() only takes whole milliseconds, and SDL polls
+            # for its timeout in steps of a millisecond, so it can return
+            # before or after it: wait for events until WAIT_MARGIN ms before
+            # the deadline, then sleep what remains but the last SPIN ms,
+            # spent polling the clock, which time.sleep() would overshoot
+            deadline = time.perf_counter() + timeout / 1000
+            events = []
+            while True:
+                remaining = (deadline - time.perf_counter()) * 1000
+                if remaining < WAIT_MARGIN + 1:
+                    if remaining > SPIN:
+                        time.sleep((remaining - SPIN) / 1000)
+                    while time.perf_counter() < deadline:
+                        pass
+                    break
+                event = pygame.event.wait(math.floor(remaining) - WAIT_MARGIN)
+                if event.type != pygame.NOEVENT:
+                    events.append(event)
+                    break
+            events.extend(pygame.event.get())
+
+        for callback in tuple(self.on_events):
+            callback(self, events)
+
+        self._frame_start = time.perf_counter()
+        self._cpu_start = time.process_time()
+        return events
+
+    def present(self):
+        """
+        Push the dirty areas of the frame, then wait for the frame cap
+        """
+        for callback in tuple(self.on_draw):
+            callback(self)
+
+        start = time.perf_counter()
+        self.damage.present()
+        self.present_ms = (time.perf_counter() - start) * 1000
+
+        self.frame_ms = (time.perf_counter() - self._frame_start) * 1000
+        self.cpu_ms = (time.process_time() - self._cpu_start) * 1000
+        self.frames += 1
+        for callback in tuple(self.on_present):
+            callback(self)
+
+        self.clock.tick(self.fps)
+        self._frame_start = time.perf_counter()
+        self._cpu_start = time.process_time()
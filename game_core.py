@@ -0,0 +1,176 @@
+"""
+Rules of the game, independent of pygame.
+
+A Game holds the state of one player's game: level, lives, mistakes and the
+board of the current level. The pygame front end only draws what the Game
+says and forwards the clicks to it, and the same rules can run headless for
+simulations and tests, with no display, fonts or pauses.
+
+The board of a level can also be drawn ahead of time with prepare_level(),
+from a saved state of the random generator of the game: start_level() then
+uses it instead of drawing the same board again.
+"""
+import random
+
+from board import Board, EMPTY, FOUND, MISSED, TARGET
+from difficulty import get_difficulty
+
+STARTING_LEVEL = 1
+INITIAL_LIVES = 3
+ALLOWED_MISTAKES = 2
+DELAY = 1000                # Time the squares flash, in milliseconds
+LEVEL_INTRO_DELAY = 1500    # Time the empty grid is shown before flashing, in milliseconds
+LEVEL_END_DELAY = 250       # Pause after the end of a level, in milliseconds
+
+# Setting name -> (default, lowest, highest), the range of the settings screen
+SETTINGS = {
+    "starting_level": (STARTING_LEVEL, 1, 100),
+    "delay": (DELAY, 50, 10000),
+    "initial_lives": (INITIAL_LIVES, 1, 4),
+    "allowed_mistakes": (ALLOWED_MISTAKES, 0, 3),
+}
+
+
+class PreparedLevel:
+    """
+    Board of a level drawn ahead of time by prepare_level()
+    """
+
+    __slots__ = ("level", "board", "rng_state", "next_rng_state")
+
+    def __init__(self, level, board, rng_state, next_rng_state):
+        self.level = level
+        self.board = board
+        self.rng_state = rng_state              # State of the generator it was drawn from
+        self.next_rng_state = next_rng_state    # State of the generator once it is drawn
+
+    def matches(self, game):
+        """
+        Whether this is the board the next start_level() of game would draw
+        """
+        return self.level == game.level and self.rng_state == game.rng.getstate()
+
+
+def prepare_level(level, rng_state, board=None):
+    """
+    Draw the board of level as Game.start_level() does, from a copy of a
+    random generator in rng_state. The game itself is not used, so this can
+    run in another thread.
+    """
+    rng = random.Random()
+    rng.setstate(rng_state)
+    grid_size, num_flash_squares = get_difficulty(level)
+    board = board if board is not None else Board()
+    board.reset(grid_size)
+    board.flash(num_flash_squares, rng)
+    return PreparedLevel(level, board, rng_state, rng.getstate())
+
+
+class Game:
+    """
+    State and rules of a game
+    """
+
+    def __init__(self, starting_level=STARTING_LEVEL, initial_lives=INITIAL_LIVES,
+                 allowed_mistakes=ALLOWED_MISTAKES, rng=None, board=None):
+        self.rng = rng if rng is not None else random.Random()
+        self.board = board if board is not None else Board()
+        self.new_game(starting_level, initial_lives, allowed_mistakes)
+
+    def new_game(self, starting_level=None, initial_lives=None, allowed_mistakes=None):
+        """
+        Start a new game, optionally with new settings
+        """
+        if starting_level is not None:
+            self.starting_level = starting_level
+        if initial_lives is not None:
+            self.initial_lives = initial_lives
+        if allowed_mistakes is not None:
+            self.allowed_mistakes = allowed_mistakes
+
+        self.level = self.starting_level
+        self.lives = self.initial_lives
+        self.mistakes = 0
+        self.grid_size = 0
+        self.num_flash_squares = 0
+        self.targets_left = 0   # Flashed squares not clicked yet
+        self.result = None      # True once the level is won, False once it is lost
+        self.over = False       # True once the player has no lives left or quit
+
+    def start_level(self, prepared=None):
+        """
+        Set up the board of the current level with its flashing squares.
+        The board of prepared, a PreparedLevel, is copied instead if it is
+        the one that would be drawn.
+        """
+        self.grid_size, self.num_flash_squares = get_difficulty(self.level)
+        if prepared is not None and prepared.matches(self):
+            self.board.copy_from(prepared.board)
+            self.rng.setstate(prepared.next_rng_state)     # As if it was drawn now
+        else:
+            self.board.reset(self.grid_size)
+            self.board.flash(self.num_flash_squares, self.rng)
+        self.targets_left = self.num_flash_squares
+        self.result = None
+        return self.board
+
+    def next_levels(self):
+        """
+        (level, lives) of the levels that can follow the current one: the
+        next level if it is won, and the same level with a life less if it
+        is lost and the player has lives left
+        """
+        levels = [(self.level + 1, self.lives)]
+        if self.lives > 1:
+            levels.append((self.level, self.lives - 1))
+        return levels
+
+    def click(self, x, y):
+        """
+        The player clicked square (x, y). Return its new state, FOUND or
+        MISSED, or None if the click does not count (square already clicked
+        or level already decided).
+        """
+        if self.result is not None:
+            return None
+
+        board = self.board
+        state = board.get(x, y)
+        if state == TARGET:
+            board.set(x, y, FOUND)
+            self.targets_left -= 1
+            if not self.targets_left:
+                self.result = True      # Player clicked all the flashed squares
+            return FOUND
+
+        elif state == EMPTY:
+            board.set(x, y, MISSED)
+            self.mistakes += 1
+            if self.mistakes > self.allowed_mistakes:
+                self.result = False     # Player failed
+            return MISSED
+
+        return None
+
+    def end_level(self):
+        """
+        - If the player clicked all the squares, level up
+        - If not, the player loses a life
+        - When no lives are left, the game is over
+        Return whether the level was won.
+        """
+        won = self.result
+        if won:
+            self.level += 1     # Increase the difficulty if the grid is successfully completed
+        else:
+            self.lives -= 1     # Decrease the lives of the player in case of failure
+        self.mistakes = 0       # Reset the mistake counter
+        self.over = self.lives < 1
+        return won
+
+    def quit(self):
+        """
+        The player gave up the game
+        """
+        self.mistakes = 0
+        self.over = True
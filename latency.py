@@ -0,0 +1,96 @@
+"""
+Click-to-photon latency of the clicks on the grid.
+
+Each mouse click is timestamped when the event loop receives it. When the
+game draws the clicked square, the click is timestamped again after the
+drawing, and a last time once the frame holding it was pushed to the
+display. The latencies go to the profiler sections, for the overlay and
+the percentiles, and to a histogram exported with the profile.
+
+The last timestamp is taken when pygame.display.update()/flip() returns:
+the time the compositor and the screen take after that is not included.
+"""
+import collections
+import time
+
+import pygame
+
+from profiler import PERCENTILES, percentile
+
+# Upper bounds of the histogram buckets, in milliseconds (16.7 ms is one
+# frame at 60 fps), the last bucket holds everything above
+BUCKETS_MS = (1, 2, 4, 8, 16.7, 33.3, 50, 100)
+WINDOW = 10000      # Latencies kept for the percentiles
+
+# Profiler sections
+DRAW = "click to draw"
+PHOTON = "click to photon"
+
+
+class ClickLatency:
+    """
+    Measure the latency of the clicks drawn by the game
+    """
+
+    def __init__(self, profiler=None):
+        self.profiler = profiler
+        self.histogram = [0] * (len(BUCKETS_MS) + 1)
+        self.latencies = collections.deque(maxlen=WINDOW)    # Click to photon, in ms
+        self._received = {}     # id(event) -> receipt time, for the clicks of this frame
+        self._drawn = []        # (receipt, draw) times of the clicks drawn in this frame
+
+    def attach(self, loop):
+        loop.on_events.append(self.receive)
+        loop.on_present.append(self.presented)
+
+    def receive(self, loop, events):
+        """
+        FrameLoop.on_events hook: timestamp the clicks of the frame
+        """
+        now = time.perf_counter()
+        self._received = {id(event): now for event in events
+                          if event.type == pygame.MOUSEBUTTONDOWN}
+
+    def drawn(self, event):
+        """
+        The square clicked by event was just drawn
+        """
+        received = self._received.pop(id(event), None)
+        if received is not None:
+            self._drawn.append((received, time.perf_counter()))
+
+    def presented(self, loop):
+        """
+        FrameLoop.on_present hook: the clicks drawn in the frame are on screen
+        """
+        now = time.perf_counter()
+        for received, drawn in self._drawn:
+            latency = (now - received) * 1000
+            self.latencies.append(latency)
+            self.histogram[self._bucket(latency)] += 1
+            if self.profiler is not None:
+                self.profiler.add(DRAW, (drawn - received) * 1000)
+                self.profiler.add(PHOTON, latency)
+        self._drawn.clear()
+        self._received.clear()
+
+    @staticmethod
+    def _bucket(latency):
+        for i, bound in enumerate(BUCKETS_MS):
+            if latency < bound:
+                return i
+        return len(BUCKETS_MS)
+
+    def stats(self):
+        """
+        Histogram and percentiles of the click-to-photon latency
+        """
+        labels = ["< %g ms" % bound for bound in BUCKETS_MS] + [">= %g ms" % BUCKETS_MS[-1]]
+        stats = {"count": sum(self.histogram),
+                 "histogram": dict(zip(labels, self.histogram))}
+        if self.latencies:
+            ordered = sorted(self.latencies)
+            for p in PERCENTILES:
+                stats["p%d_ms" % p] = percentile(ordered, p)
+            stats["max_ms"] = ordered[-1]
+        return stats
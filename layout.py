@@ -0,0 +1,158 @@
+"""
+Screen geometry of the game: the grid and the layout of every screen.
+"""
+import pygame
+
+
+class GridGeometry:
+    """
+    Position of the squares of the grid on the screen. The grid is uniform,
+    so the square under a point is found arithmetically instead of testing
+    every square.
+    """
+
+    def __init__(self, grid_size, block_size, margin, left, top):
+        self.grid_size = grid_size
+        self.block_size = block_size
+        self.margin = margin
+        self.left = left
+        self.top = top
+        self.step = block_size + margin     # Distance between two squares
+        self.key = (grid_size, block_size, margin, left, top)
+
+    def cell_rect(self, x, y):
+        """
+        Rectangle of the square in column x and row y
+        """
+        return pygame.Rect(x*self.block_size + x*self.margin + self.left,
+                           y*self.block_size + y*self.margin + self.top,
+                           self.block_size, self.block_size)
+
+    def cells(self):
+        """
+        Iterate over (x, y, rect) for every square, column by column
+        """
+        for x in range(self.grid_size):
+            for y in range(self.grid_size):
+                yield x, y, self.cell_rect(x, y)
+
+    def cell_at(self, pos):
+        """
+        Return the (x, y) square under pos, or None if pos is in a margin
+        or outside of the grid
+        """
+        px, py = pos
+        x = int((px - self.left) // self.step)
+        y = int((py - self.top) // self.step)
+
+        # Rect coordinates are truncated to whole pixels, so the point can
+        # also be in the next square when it is right on a border
+        for cx in (x, x + 1):
+            for cy in (y, y + 1):
+                if (0 <= cx < self.grid_size and 0 <= cy < self.grid_size
+                        and self.cell_rect(cx, cy).collidepoint(px, py)):
+                    return cx, cy
+        return None
+
+    def bounds(self):
+        """
+        Rectangle enclosing all the squares
+        """
+        last = self.grid_size - 1
+        return self.cell_rect(0, 0).union(self.cell_rect(last, last))
+
+
+class Layout:
+    """
+    Positions of everything drawn on the screens at one resolution. They are
+    computed when the layout is created, and the rectangles of the texts and
+    the geometry of each grid size the first time they are needed, so a new
+    layout is only made when the screen is resized.
+    """
+
+    def __init__(self, width, height):
+        self.width = width
+        self.height = height
+        self.size = (width, height)
+
+        # Grid of the game screen, centered horizontally below the top text
+        self.grid_length = min(height * 0.85, width)
+        self.height_space = height - self.grid_length
+        self.width_space = width - self.grid_length
+
+        # Part of the game screen that changes from one level to the next:
+        # the column of the top text, the lives and the grid
+        left = int(self.width_space // 2)
+        self.level_area = pygame.Rect(left, 0, width - 2*left, height)
+
+        # Where each text is placed: name -> (rectangle attribute, position)
+        center_x = width // 2
+        settings_x = width // 10
+        self.anchors = {
+            # Menu
+            "title": ("center", (center_x, height // 4)),
+            "play": ("center", (center_x, height // 2)),
+            "settings": ("center", (center_x, (height // 2) + 65)),
+            "quit": ("center", (center_x, (height // 2) + 130)),
+
+            # Settings
+            "settings_title": ("midleft", (settings_x, height // 8)),
+            "settings_info": ("midleft", (settings_x, (height // 8) + 65)),
+            "level_setting": ("midleft", (settings_x, (height // 2) - 65)),
+            "delay_setting": ("midleft", (settings_x, height // 2)),
+            "lives_setting": ("midleft", (settings_x, (height // 2) + 65)),
+            "mistakes_setting": ("midleft", (settings_x, (height // 2) + 130)),
+            "resolution_setting": ("midleft", (settings_x, (height // 2) + 195)),
+            "back_to_menu": ("midright", (round(width * 0.9), round(height * 0.9))),
+
+            # Game
+            "top_text": ("center", (center_x, int(self.height_space // 2))),
+
+            # End screen
+            "end_level": ("center", (center_x, height // 3)),
+            "end_best": ("center", (center_x, (height // 3) + 60)),
+            "play_again": ("center", (center_x, height // 2)),
+            "end_menu": ("center", (center_x, (height // 2) + 65)),
+        }
+
+        # Lives of the game screen, drawn from right to left
+        self.life_radius = 18
+        self.life_spacing = 42
+        self.first_life = (int(width // 2) + int(self.grid_length // 2) - 18,
+                           int(self.height_space // 2))
+
+        # Image of the end screen, in the top right corner, and its caption
+        self.end_image_size = int((min(width, height) * 0.4) - 90)
+        self.end_image_pos = (width - self.end_image_size - 33, 33)
+        self.anchors["end_caption"] = ("midtop", (width - (self.end_image_size // 2) - 33,
+                                                  self.end_image_size + 33))
+
+        self._rects = {}    # (name, text size) -> rectangle
+        self._grids = {}    # grid size -> GridGeometry
+
+    def place(self, name, size):
+        """
+        Rectangle of the text name once rendered with size (width, height).
+        The rectangle is shared and must not be modified.
+        """
+        key = (name, size)
+        rect = self._rects.get(key)
+        if rect is None:
+            attribute, position = self.anchors[name]
+            rect = pygame.Rect((0, 0), size)
+            setattr(rect, attribute, position)
+            self._rects[key] = rect
+        return rect
+
+    def grid(self, grid_size):
+        """
+        Geometry of a grid_size x grid_size grid
+        """
+        geometry = self._grids.get(grid_size)
+        if geometry is None:
+            margin = int(self.grid_length // (40 + (7*grid_size)))
+            block_size = (self.grid_length - (grid_size - 1)*margin) / grid_size
+            geometry = GridGeometry(grid_size, block_size, margin,
+                                    self.width_space // 2, self.height_space * 0.9)
+            self._grids[grid_size] = geometry
+        return geometry
@@ -0,0 +1,157 @@
+"""
+Load generator for the session server: many WebSocket sessions playing like
+kiosk clients, and the time the server takes to answer their clicks.
+
+Each simulated player starts a game, waits for the flashing squares to be
+hidden as a client drawing them would, then clicks the flashed squares
+--think-ms apart, misclicking with probability --error-rate. A session ends
+after --levels levels or when its game is over. The sessions are opened
+over --ramp seconds, so the server sees a steady arrival of connections.
+
+The click latency is measured by the client, from sending a click to
+receiving its answer, so it includes the network. Against a server on
+the same machine:
+
+    python loadgen.py --sessions 2000 --levels 3 --port 8765
+"""
+import argparse
+import asyncio
+import json
+import random
+import statistics
+import sys
+import time
+
+import websocket
+from server import HOST, PORT
+
+
+async def play_session(host, port, settings, levels, think_ms, error_rate, rng, results):
+    """
+    Play one session, appending the click latencies in ms to results["latencies"]
+    """
+    ws = await websocket.connect(host, port)
+    try:
+        ws.send(json.dumps({"type": "start", "settings": settings}))
+        await ws.drain()
+        message = json.loads(await ws.recv())
+        played = 0
+        while message["type"] == "level" and played < levels:
+            # Wait like a client showing the grid then the flashing squares
+            await asyncio.sleep((message["show_ms"] + message["flash_ms"]) / 1000)
+
+            grid_size = message["grid_size"]
+            targets = [tuple(cell) for cell in message["flash"]]
+            flashed = set(targets)
+            while True:
+                await asyncio.sleep(think_ms / 1000 * rng.uniform(0.5, 1.5))
+                if targets and rng.random() >= error_rate:
+                    x, y = targets.pop()
+                else:
+                    x, y = rng.randrange(grid_size), rng.randrange(grid_size)
+                    if (x, y) in flashed:
+                        continue    # A lucky misclick is not a mistake
+
+                sent = time.perf_counter()
+                ws.send(json.dumps({"type": "click", "x": x, "y": y}))
+                await ws.drain()
+                reply = json.loads(await ws.recv())
+                results["latencies"].append((time.perf_counter() - sent) * 1000)
+                if reply["type"] != "click":
+                    raise RuntimeError("unexpected answer to a click: %r" % reply)
+                results["clicks"] += 1
+                if reply["result"] is not None:
+                    break
+            message = json.loads(await ws.recv())     # Next level, or game over
+            played += 1
+        results["completed"] += 1
+    finally:
+        await ws.close()
+
+
+async def run_load(host=HOST, port=PORT, sessions=1000, levels=3, think_ms=300,
+                   error_rate=0.05, ramp=2.0, settings=None, seed=0):
+    """
+    Run sessions concurrently and return the results
+    """
+    results = {"latencies": [], "clicks": 0, "completed": 0, "failed": 0}
+    rng = random.Random(seed)
+    settings = settings or {}
+
+    async def player(i, player_rng):
+        await asyncio.sleep(ramp * i / sessions)
+        try:
+            await play_session(host, port, settings, levels, think_ms, error_rate,
+                               player_rng, results)
+        except (OSError, websocket.ConnectionClosed, websocket.ProtocolError,
+                RuntimeError, KeyError, ValueError) as error:
+            results["failed"] += 1
+            if results["failed"] == 1:
+                print("first failed session: %r" % error, file=sys.stderr)
+
+    start = time.perf_counter()
+    await asyncio.gather(*(player(i, random.Random(rng.random())) for i in range(sessions)))
+    results["seconds"] = time.perf_counter() - start
+    return results
+
+
+async def fetch_stats(host=HOST, port=PORT):
+    """
+    Counters of the server, from GET /stats
+    """
+    reader, writer = await asyncio.open_connection(host, port)
+    try:
+        writer.write(b"GET /stats HTTP/1.1\r\nHost: %s\r\n\r\n" % host.encode())
+        _, headers = await websocket.read_head(reader)
+        body = await reader.readexactly(int(headers["content-length"]))
+    finally:
+        writer.close()
+    return json.loads(body)
+
+
+def summarize(results):
+    """
+    Percentiles of the click latencies
+    """
+    latencies = sorted(results["latencies"])
+    summary = {name: results[name] for name in ("completed", "failed", "clicks", "seconds")}
+    if len(latencies) > 1:
+        quantiles = statistics.quantiles(latencies, n=100, method="inclusive")
+        summary.update(p50_ms=quantiles[49], p95_ms=quantiles[94], p99_ms=quantiles[98],
+                       max_ms=latencies[-1])
+    return summary
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--host", default=HOST)
+    parser.add_argument("--port", type=int, default=PORT)
+    parser.add_argument("--sessions", type=int, default=1000)
+    parser.add_argument("--levels", type=int, default=3, help="levels played per session")
+    parser.add_argument("--think-ms", type=float, default=300, help="mean time between clicks")
+    parser.add_argument("--error-rate", type=float, default=0.05)
+    parser.add_argument("--ramp", type=float, default=2.0,
+                        help="seconds over which the sessions are opened")
+    parser.add_argument("--delay", type=int, default=None, help="flash delay of the games")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--json", action="store_true", help="print the results as JSON")
+    args = parser.parse_args(argv)
+
+    settings = {} if args.delay is None else {"delay": args.delay}
+    results = asyncio.run(run_load(args.host, args.port, args.sessions, args.levels,
+                                   args.think_ms, args.error_rate, args.ramp, settings,
+                                   args.seed))
+    summary = summarize(results)
+    if args.json:
+        print(json.dumps(summary, indent=1))
+    else:
+        print("%d sessions completed, %d failed, %d clicks in %.1f s"
+              % (summary["completed"], summary["failed"], summary["clicks"], summary["seconds"]))
+        if "p99_ms" in summary:
+            print("click latency: p50 %.2f ms, p95 %.2f ms, p99 %.2f ms, max %.2f ms"
+                  % (summary["p50_ms"], summary["p95_ms"], summary["p99_ms"], summary["max_ms"]))
+    return 1 if summary["failed"] else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
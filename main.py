@@ -1,24 +1,67 @@
+import time
+START_TIME = time.perf_counter()    # Reference of the startup profile
+
+import datetime
+import os
 import pygame
 import sys
-import time
 import random
-import math
+
+import config
+import text_cache
+from assets import AssetManager, end_screen_tier
+from board import FOUND, MISSED
+import game_core
+from game_core import Game, LEVEL_END_DELAY, LEVEL_INTRO_DELAY
+from frame_loop import FrameLoop
+from latency import ClickLatency
+from layout import Layout
+from prefetch import LevelPrefetcher
+from profiler import Profiler
+from render import GridRenderer
+from replay import Recorder, Replayer
+from scenes import Scene, SceneMachine
+from storage import STORE_FILE, Store
+from telemetry import TelemetryLog
+from timing import PhaseTimer
+from text_cache import render_text
 # Dimensions constants
-SIZE = WIDTH, HEIGHT = 800, 600
+MIN_WIDTH = 900
+MAX_WIDTH = 1900
+SUPPORTED_WIDTHS = tuple(range(MIN_WIDTH, MAX_WIDTH + 1, 200))   # Rendered in headless mode
+
+MIN_HEIGHT = int(MIN_WIDTH // 1.5)
+MAX_HEIGHT = int(MAX_WIDTH // 1.5)
+
+layout = None   # Positions of everything drawn at the current resolution
 
-# Prompt user for screen resolution
-WIDTH = int(input("res: "))
-if WIDTH < 900:
-    WIDTH = 900
-elif WIDTH > 1900:
-    WIDTH = 1900
-HEIGHT = int(WIDTH // 1.5)
+def set_resolution(width, height=None):
+    """
+    Set the screen resolution, kept within the supported range, and make
+    the layout of the screens if it changed. The height defaults to
+    width / 1.5.
+    """
+    global WIDTH, HEIGHT, SIZE, layout
+    WIDTH = min(max(width, MIN_WIDTH), MAX_WIDTH)
+    if height is None:
+        HEIGHT = int(WIDTH // 1.5)
+    else:
+        HEIGHT = min(max(height, MIN_HEIGHT), MAX_HEIGHT)
+    SIZE = (WIDTH, HEIGHT)
 
-SIZE = (WIDTH, HEIGHT)
+    if layout is None or layout.size != SIZE:
+        layout = Layout(WIDTH, HEIGHT)
 
-GRID_LENGTH = min(HEIGHT * 0.85 , WIDTH)
-HEIGHT_SPACE = HEIGHT - GRID_LENGTH
-WIDTH_SPACE = WIDTH - GRID_LENGTH
+set_resolution(MIN_WIDTH)     # Until run() applies the settings
+
+def resize_screen(width, height=None):
+    """
+    Change the resolution and resize the window to it
+    """
+    level_prefetcher.cancel()   # Its frames are for the old size
+    set_resolution(width, height)
+    pygame.display.set_mode(SIZE, pygame.RESIZABLE)
+    frame_loop.mark_dirty()
 
 # Color constants
 WHITE = 255,255,255
@@ -28,272 +71,622 @@ DARK_BLUE = 0,120,205
 PURPLE = 48,25,52
 LIGHT_PURPLE = 96,50,104
 
-# Game settings constants
-STARTING_LEVEL = 1
-INITIAL_LIVES = 3
-DELAY = 1000
-ALLOWED_MISTAKES = 2
-
-# Global variables
-level = STARTING_LEVEL
-lives = INITIAL_LIVES
-mistakes = 0
-grid_size = 0
-lost = False
-
-def main():
-    pygame.init()   # Initialize pygame
-    screen = pygame.display.set_mode(SIZE)         # Create the screen
+# Game settings, changed by the command line and the settings screen
+STARTING_LEVEL = game_core.STARTING_LEVEL
+INITIAL_LIVES = game_core.INITIAL_LIVES
+DELAY = game_core.DELAY
+ALLOWED_MISTAKES = game_core.ALLOWED_MISTAKES
+MAX_FPS = 60        # Frame rate cap of the event loops
+BOARD_SEED = None   # Seed of the flashing squares generator, set it to get the same boards again
+PLAYER = "player"   # Name under which the scores are saved
+PERSISTED_SETTINGS = ("width", "starting_level", "delay", "initial_lives", "allowed_mistakes")
+RECORDED_SETTINGS = PERSISTED_SETTINGS + ("max_fps",)   # In the header of a recording
+
+assets = AssetManager()     # End screen images, decoded once
+frame_loop = FrameLoop(MAX_FPS)     # Paces the event loops of every screen
+board_rng = random.Random(BOARD_SEED)   # Picks the flashing squares
+grid_renderer = GridRenderer(LIGHT_BLUE, DARK_BLUE, WHITE)   # Pre-rendered empty grids
+game = Game(STARTING_LEVEL, INITIAL_LIVES, ALLOWED_MISTAKES, rng=board_rng)  # Rules and state of the game
+startup_marks = []      # (step, time) of the startup steps, see mark_startup()
+profiler = Profiler()   # Times the hot paths when enabled with --profile
+click_latency = ClickLatency(profiler)  # Click-to-photon latency, measured with the profile
+level_prefetcher = LevelPrefetcher()    # Prepares the next level during the clicks
+store = None    # Saved settings and scores, opened by run() unless headless
+telemetry = None    # Log of the clicks and level outcomes, opened by run() with --telemetry
+
+def run(argv=None):
+    """
+    Start the game with the settings of the command line, the config file
+    and the environment
+    """
+    global STARTING_LEVEL, DELAY, INITIAL_LIVES, ALLOWED_MISTAKES, MAX_FPS, BOARD_SEED
+    global PLAYER, store, telemetry
+    mark_startup("imports")
+
+    defaults = {
+        "width": WIDTH,
+        "starting_level": STARTING_LEVEL,
+        "delay": DELAY,
+        "initial_lives": INITIAL_LIVES,
+        "allowed_mistakes": ALLOWED_MISTAKES,
+        "max_fps": MAX_FPS,
+        "board_seed": BOARD_SEED,
+        "player": PLAYER,
+        "store": STORE_FILE,
+        "profile_out": "profile.json",
+    }
+    settings = config.load(argv, defaults)
+    replayer = None
+    if settings.replay:
+        # Play back with the seed and settings of the recording, and leave
+        # the saved settings and scores alone
+        replayer = Replayer(settings.replay, settings.fast_replay)
+        recorded = dict(replayer.settings, board_seed=replayer.seed)
+        for name, value in recorded.items():
+            if name not in RECORDED_SETTINGS + ("board_seed",):
+                problem = "unknown setting %r" % name
+            else:
+                problem = config.check_value(name, value)
+            if problem is not None:
+                config.build_parser().error("recording %s: %s" % (settings.replay, problem))
+        vars(settings).update(recorded)
+    elif not settings.headless:
+        # The settings saved by the settings screen replace the defaults, the
+        # config file, environment and command line still override them
+        store = Store(settings.store)
+        saved = store.settings()
+        for name in PERSISTED_SETTINGS:
+            if name in saved:
+                problem = config.check_value(name, saved[name])
+                if problem is None:
+                    defaults[name] = saved[name]
+                else:
+                    print("ignoring the saved setting of %s: %s" % (settings.store, problem),
+                          file=sys.stderr)
+        settings = config.load(argv, defaults)
+        if settings.telemetry:
+            telemetry = TelemetryLog(settings.telemetry)
+
+    set_resolution(settings.width)
+    STARTING_LEVEL = settings.starting_level
+    DELAY = settings.delay
+    INITIAL_LIVES = settings.initial_lives
+    ALLOWED_MISTAKES = settings.allowed_mistakes
+    MAX_FPS = frame_loop.fps = settings.max_fps
+    BOARD_SEED = settings.board_seed
+    if settings.record and BOARD_SEED is None:
+        BOARD_SEED = random.randrange(2**32)    # Recorded to get the same boards again
+    board_rng.seed(BOARD_SEED)
+    PLAYER = settings.player
+    mark_startup("settings")
+
+    profiler.enabled = settings.profile
+    if profiler.enabled:
+        profiler.attach(frame_loop)
+        click_latency.attach(frame_loop)
+
+    try:
+        if settings.headless:
+            # Render off-screen with SDL's dummy video driver, e.g. on a CI box
+            # without a display
+            os.environ["SDL_VIDEODRIVER"] = "dummy"
+            for name, size, elapsed, pixels in render_screens(frame_dir=settings.frames):
+                print("%-12s %4dx%-4d %7.2f ms %9d px" % (name, size[0], size[1], elapsed, pixels))
+        else:
+            recorder = None
+            if settings.record:
+                recorder = Recorder(settings.record, BOARD_SEED, {
+                    name: getattr(settings, name) for name in RECORDED_SETTINGS})
+                frame_loop.on_events.append(recorder.record)
+            if replayer is not None:
+                frame_loop.source = replayer
+                if replayer.fast:
+                    frame_loop.fps = 0      # No frame cap
+            try:
+                start = time.perf_counter()
+                main(settings.profile_startup, replayer.clock if replayer else time.monotonic)
+                if replayer is not None:
+                    elapsed = time.perf_counter() - start
+                    print("replayed %d events in %.2f s, %d frames"
+                          % (replayer.position, elapsed, frame_loop.frames))
+            finally:
+                if recorder is not None:
+                    recorder.close()
+                if store is not None:
+                    store.close()   # Write the last changes
+                if telemetry is not None:
+                    telemetry.close()
+    finally:
+        if profiler.enabled:
+            profiler.extra["click_latency"] = click_latency.stats()
+            profiler.extra["text_cache"] = text_cache.stats()
+            profiler.export(settings.profile_out)
+    pygame.quit()
+    return 0
+
+def main(profile_startup=False, clock=time.monotonic):
+    # Only the display is initialized here, fonts are initialized on first
+    # use and the other subsystems (audio, joysticks) are never needed
+    pygame.display.init()
+    mark_startup("display init")
+    screen = pygame.display.set_mode(SIZE, pygame.RESIZABLE)   # Create the screen
     pygame.display.set_caption("Visual Memory")     # Set the window title
+    mark_startup("window")
 
     pygame.key.set_repeat(250, 125)      # Allow keys to be held
 
-    while True:
-        menu(screen)
+    assets.preload()        # Decode the end screen images in the background
+
+    if profile_startup:
+        frame_loop.on_present.append(print_startup_profile)
+
+    # Every screen is a scene, the machine switches between them without recursion
+    machine = SceneMachine(frame_loop)
+    machine.add("menu", MenuScene(screen))
+    machine.add("settings", SettingsScene(screen))
+    machine.add("play", PlayScene(screen, clock))
+    machine.add("end", EndScene(screen))
+
+    def resize_window(loop, events):
+        # The window was resized by the player: lay out and draw the current
+        # screen again at the new size
+        for event in events:
+            if event.type == pygame.VIDEORESIZE and (event.w, event.h) != SIZE:
+                resize_screen(event.w, event.h)
+                machine.current.redraw()
+    frame_loop.on_events.append(resize_window)
+
+    machine.run("menu")
 
-def menu(surface):
+def mark_startup(step):
     """
-    Main menu function, where the player can play the game, modify the
-    settings, or quit the program.
+    Record the end of a startup step
     """
-    play_rect, settings_rect, quit_rect = print_menu(surface)
+    startup_marks.append((step, time.perf_counter()))
 
-    while True:
-        for event in pygame.event.get():
-            if event.type == pygame.MOUSEBUTTONDOWN and event.button == 1:
-                if play_rect.collidepoint(pygame.mouse.get_pos()):
-                    play_game(surface)
-                if settings_rect.collidepoint(pygame.mouse.get_pos()):
-                    settings(surface)
-                if quit_rect.collidepoint(pygame.mouse.get_pos()):
-                    pygame.quit()
-                    sys.exit()
+def print_startup_profile(loop):
+    """
+    Print the time spent in each startup step once the first frame is shown
+    """
+    loop.on_present.remove(print_startup_profile)
+    mark_startup("first frame")
 
-            if event.type == pygame.QUIT:
-                pygame.quit()
-                sys.exit()
+    previous = START_TIME
+    steps = []
+    for step, when in startup_marks:
+        steps.append("%s %.1f ms" % (step, (when - previous) * 1000))
+        previous = when
+    print("startup: %s, total %.1f ms" % (", ".join(steps), (previous - START_TIME) * 1000))
 
-def print_menu(surface):
+def render_screens(widths=SUPPORTED_WIDTHS, frame_dir=None):
     """
-    This function prints the menu text and buttons
+    Render every screen at each resolution width, with the same scenes and
+    drawing code as the game, and save them as PNG files in frame_dir if
+    given. Return the (screen name, size, milliseconds, pixels pushed to the
+    display) of every frame.
     """
+    pygame.display.init()
+    assets.preload(background=False)
+    if frame_dir:
+        os.makedirs(frame_dir, exist_ok=True)
 
-    surface.fill(LIGHT_BLUE)     # Fill the screen background
+    frames = []
+    for width in widths:
+        set_resolution(width)
+        screen = pygame.display.set_mode(SIZE)
+        steps = headless_screens(screen)
+        while True:
+            start = time.perf_counter()
+            name = next(steps, None)
+            if name is None:
+                break
+            pixels = frame_loop.damage.present()
+            frames.append((name, SIZE, (time.perf_counter() - start) * 1000, pixels))
 
-    # Print the title
-    font = pygame.font.Font("freesansbold.ttf", 80)
-    title_text = font.render("Visual Memory", True, WHITE, LIGHT_BLUE)
-    title_rect = title_text.get_rect()
-    title_rect.center = (WIDTH // 2, HEIGHT // 4)
-    surface.blit(title_text, title_rect)
+            if frame_dir:
+                path = os.path.join(frame_dir, "%s_%dx%d.png" % (name, WIDTH, HEIGHT))
+                pygame.image.save(screen, path)
+    return frames
 
-    # Print the "play" button
-    font = pygame.font.Font("freesansbold.ttf", 40)
-    play_text = font.render("Play", True, DARK_BLUE, WHITE)
-    play_rect = play_text.get_rect()
-    play_rect.center = (WIDTH // 2, HEIGHT // 2)
-    surface.blit(play_text, play_rect)
+def headless_screens(screen):
+    """
+    Draw the screens of the game one after the other, yielding the name of
+    each screen once it is drawn
+    """
+    MenuScene(screen).enter()
+    yield "menu"
 
-    # Print the "settings" button
-    font = pygame.font.Font("freesansbold.ttf", 40)
-    settings_text = font.render("Settings", True, DARK_BLUE, WHITE)
-    settings_rect = settings_text.get_rect()
-    settings_rect.center = (WIDTH // 2, (HEIGHT // 2) + 65)
-    surface.blit(settings_text, settings_rect)
+    SettingsScene(screen).enter()
+    yield "settings"
 
-    # Print the "quit" button
-    font = pygame.font.Font("freesansbold.ttf", 40)
-    quit_text = font.render("Quit", True, DARK_BLUE, WHITE)
-    quit_rect = quit_text.get_rect()
-    quit_rect.center = (WIDTH // 2, (HEIGHT // 2) + 130)
-    surface.blit(quit_text, quit_rect)
+    board_rng.seed(0)       # Same boards on every run
+    play = PlayScene(screen)
+    play.enter()
+    yield "play_intro"
 
-    pygame.display.flip()
+    draw_grid(screen, game.board)
+    yield "play_flash"
 
-    return play_rect, settings_rect, quit_rect
+    # Click a square that flashed and one that did not
+    clear_grid(screen)
+    flashed = game.board.flashed_cells()
+    missed = next((x, y) for x, y, _ in play.geometry.cells() if (x, y) not in flashed)
+    for cell in (flashed[0], missed):
+        pos = play.geometry.cell_rect(*cell).center
+        play.click_squares(pygame.event.Event(pygame.MOUSEBUTTONDOWN, button=1, pos=pos))
+    yield "play_recall"
 
-def play_game(screen):
-    """
-    Main game loop that is run when the player starts a new game,
-    either from the main menu or the end screen
+    EndScene(screen).enter()
+    yield "end"
+
+class MenuScene(Scene):
+    """
+    Main menu, where the player can play the game, modify the
+    settings, or quit the program.
     """
-    global grid_size
-    global lost
 
-    grid_size = 0       # Set grid_size back to zero so that get_difficulty()
-                        # can calculate it back from the initial level
-    lost = False        # New game is started, so reset the lost variable
+    def __init__(self, surface):
+        self.surface = surface
 
-    while True:
-        screen.fill(LIGHT_BLUE)     # Fill the screen background
-        print_top_text(screen)      # Show "level" in the top of the screen
-        show_lives(screen)          # Show remaining lives in the top of the screen
+    def enter(self):
+        self.play_rect, self.settings_rect, self.quit_rect = print_menu(self.surface)
 
-        # Determine grid size and number of flashing squares according to the level
-        num_flash_squares = get_difficulty()
-        grid = [[0 for x in range(grid_size)] for y in range(grid_size)] # Generate grid from grid size
+    def handle_event(self, event):
+        if event.type == pygame.MOUSEBUTTONDOWN and event.button == 1:
+            if self.play_rect.collidepoint(event.pos):
+                self.machine.switch("play")
+            if self.settings_rect.collidepoint(event.pos):
+                self.machine.switch("settings")
+            if self.quit_rect.collidepoint(event.pos):
+                self.machine.stop()
 
-        # Initialize the empty grid
-        clear_grid(screen)
-        time.sleep(1.5)
-
-        # Randomly determine which squares will flash on the grid
-        generate_flash_squares(grid, num_flash_squares)
-
-        # Draw the grid with the flashing squares
-        rectangles = draw_grid(screen, grid)
-        time.sleep(DELAY / 1000)  # DELAY / 1000 to convert milliseconds in seconds
+@profiler.timed("print_menu")
+def print_menu(surface):
+    """
+    This function prints the menu text and buttons
+    """
 
-        # Go back to showing an empty grid on the screen
-        clear_grid(screen)
+    surface.fill(LIGHT_BLUE)     # Fill the screen background
 
-        # Let the player attempt to click the squares
-        end_of_level(rectangles, screen, grid, num_flash_squares)
+    # Print the title
+    title_text = render_text("Visual Memory", 80, WHITE, LIGHT_BLUE)
+    surface.blit(title_text, layout.place("title", title_text.get_size()))
 
-def settings(surface):
+    # Print the "play" button
+    play_text = render_text("Play", 40, DARK_BLUE, WHITE)
+    play_rect = layout.place("play", play_text.get_size())
+    surface.blit(play_text, play_rect)
 
-    # Constants
-    global STARTING_LEVEL
-    global DELAY
-    global INITIAL_LIVES
-    global ALLOWED_MISTAKES
-    global WIDTH, HEIGHT
+    # Print the "settings" button
+    settings_text = render_text("Settings", 40, DARK_BLUE, WHITE)
+    settings_rect = layout.place("settings", settings_text.get_size())
+    surface.blit(settings_text, settings_rect)
 
-    # Variables
-    global level
-    global lives
-    global mistakes
+    # Print the "quit" button
+    quit_text = render_text("Quit", 40, DARK_BLUE, WHITE)
+    quit_rect = layout.place("quit", quit_text.get_size())
+    surface.blit(quit_text, quit_rect)
 
-    level_setting_active = False
-    delay_setting_active = False
-    lives_setting_active = False
-    mistakes_setting_active = False
-    resolution_setting_active = False
+    frame_loop.mark_dirty()
 
-    level_rect, delay_rect, lives_rect, mistakes_rect, resolution_rect, menu_rect = print_all_settings(surface)
+    return play_rect, settings_rect, quit_rect
 
-    while True:
-        for event in pygame.event.get():
-            if event.type == pygame.MOUSEBUTTONDOWN and event.button == 1:
-                if level_rect.collidepoint(pygame.mouse.get_pos()):
-                    level_setting_active = True
-                    print_level_settings(surface, DARK_BLUE, WHITE)
-                else:
-                    level_setting_active = False
-                    print_level_settings(surface, WHITE, LIGHT_PURPLE)
-                if delay_rect.collidepoint(pygame.mouse.get_pos()):
-                    delay_setting_active = True
-                    print_delay_settings(surface, DARK_BLUE, WHITE)
-                else:
-                    delay_setting_active = False
-                    print_delay_settings(surface, WHITE, LIGHT_PURPLE)
-                if lives_rect.collidepoint(pygame.mouse.get_pos()):
-                    lives_setting_active = True
-                    print_lives_settings(surface, DARK_BLUE, WHITE)
-                else:
-                    lives_setting_active = False
-                    print_lives_settings(surface, WHITE, LIGHT_PURPLE)
-                if mistakes_rect.collidepoint(pygame.mouse.get_pos()):
-                    mistakes_setting_active = True
-                    print_mistakes_settings(surface, DARK_BLUE, WHITE)
-                else:
-                    mistakes_setting_active = False
-                    print_mistakes_settings(surface, WHITE, LIGHT_PURPLE)
-                if resolution_rect.collidepoint(pygame.mouse.get_pos()):
-                    resolution_setting_active = True
-                    print_resolution_settings(surface, DARK_BLUE, WHITE)
+class PlayScene(Scene):
+    """
+    Game screen that is entered when the player starts a new game,
+    either from the main menu or the end screen. The rules are applied by
+    the Game, this scene only draws it and forwards the clicks.
+
+    Each level goes through timed phases instead of sleeping, so that
+    events keep being processed:
+    - "intro": the empty grid is shown for LEVEL_INTRO_DELAY
+    - "flash": the squares to remember are shown for DELAY
+    - "recall": the player clicks the squares, until the level is won or lost
+    - "pause": the last click stays on screen for LEVEL_END_DELAY
+    """
+
+    def __init__(self, surface, clock=time.monotonic):
+        self.surface = surface
+        self.phase = PhaseTimer(clock)
+
+    def enter(self):
+        assets.prepare(layout.end_image_size)    # Scale the end screen images before they are needed
+
+        game.new_game(STARTING_LEVEL, INITIAL_LIVES, ALLOWED_MISTAKES)
+        if telemetry is not None:
+            telemetry.new_game(DELAY)
+        self.start_level()
+
+    def start_level(self):
+        """
+        Show the empty grid of the next level
+        """
+        # Determine the grid size and the flashing squares according to the
+        # level, or take the ones prepared during the last level
+        next_level = level_prefetcher.take(game)
+        game.start_level(next_level and next_level.prepared)
+        profiler.level = game.level     # Profile the level separately
+
+        self.phase.start("intro", LEVEL_INTRO_DELAY)
+        if next_level is None:
+            self.redraw()
+        else:
+            self.geometry = get_grid_geometry()     # Used to find the clicked squares
+            self.flash = next_level.flash
+
+            # The rest of the screen is the same from one level to the next
+            area = layout.level_area
+            self.surface.blit(next_level.frame, area, area)
+            frame_loop.mark_dirty(area)
+
+    def redraw(self):
+        """
+        Draw the level as it is now, with the grid of the current phase
+        """
+        screen = self.surface
+        self.geometry = get_grid_geometry()     # Used to find the clicked squares
+        self.flash = None                       # The grid is drawn from the board
+
+        draw_level_screen(screen, game.level, game.lives, game.grid_size)
+        frame_loop.mark_dirty()     # The whole screen was redrawn
+
+        if self.phase.name == "flash":
+            draw_grid(screen, game.board)
+        else:
+            # Squares already clicked on the empty grid
+            board = game.board
+            for x, y, rect in self.geometry.cells():
+                state = board.get(x, y)
+                if state == FOUND or state == MISSED:
+                    change_color(screen, rect, state)
+
+            if self.phase.name == "recall":
+                level_prefetcher.start(game, render_level)  # Again, at the new size
+
+    def since_flash_ms(self):
+        """
+        Time since the flashing squares were hidden, 0 before
+        """
+        return self.phase.elapsed_ms() if self.phase.name == "recall" else 0.0
+
+    def exit(self):
+        level_prefetcher.cancel()
+        profiler.level = None
+
+    def timeout(self):
+        return self.phase.remaining_ms()    # Wake up for the end of the phase
+
+    def handle_event(self, event):
+        if event.type == pygame.KEYDOWN and event.key == pygame.K_ESCAPE:  # If player quits game (ESC)
+            if not game.over:   # Else it was lost and recorded by end_of_level(), during the pause
+                game.quit()
+                if telemetry is not None:
+                    telemetry.quit(game, self.since_flash_ms())
+                record_score()
+            self.machine.switch("end")  # Show end screen
+
+        elif self.phase.name == "recall":
+            self.click_squares(event)
+
+    def update(self):
+        if self.phase.name == "recall":
+            if game.result is not None:
+                self.end_of_level()
+
+        elif self.phase.expired():
+            if self.phase.name == "intro":
+                # Draw the grid with the flashing squares
+                draw_grid(self.surface, game.board, self.flash)
+                if telemetry is not None:
+                    telemetry.flash(game)
+                self.phase.start("flash", DELAY)
+
+            elif self.phase.name == "flash":
+                # Go back to showing an empty grid on the screen, and let
+                # the player attempt to click the squares
+                clear_grid(self.surface)
+                self.phase.start("recall")
+
+                # Prepare the levels that can come next while the player clicks
+                level_prefetcher.start(game, render_level)
+
+            elif self.phase.name == "pause":
+                if game.over:
+                    self.machine.switch("end")
                 else:
-                    resolution_setting_active = False
-                    print_resolution_settings(surface, WHITE, LIGHT_PURPLE)
-                if menu_rect.collidepoint(pygame.mouse.get_pos()):
-                    menu(surface)
-
-            if event.type == pygame.KEYDOWN:
-                if event.key == pygame.K_UP or event.key == pygame.K_RIGHT:
-                    if level_setting_active:
+                    self.start_level()
+
+    @profiler.timed("click_squares")
+    def click_squares(self, event):
+        """
+        The user must now click the squares that previously flashed
+        """
+        if event.type == pygame.MOUSEBUTTONDOWN and event.button == 1:
+            cell = self.geometry.cell_at(event.pos)
+            if cell is not None:
+                x, y = cell
+                state = game.click(x, y)
+                if state is not None:
+                    change_color(self.surface, self.geometry.cell_rect(x, y), state)
+                    click_latency.drawn(event)
+                    if telemetry is not None:
+                        telemetry.click(game, x, y, state, self.phase.elapsed_ms())
+
+    def end_of_level(self):
+        """
+        Level up or lose a life, then keep the last clicked square on
+        screen before the next level
+        """
+        if telemetry is not None:
+            telemetry.level_end(game, self.phase.elapsed_ms())
+        game.end_level()
+        if game.over:
+            record_score()
+        self.phase.start("pause", LEVEL_END_DELAY)
+
+class SettingsScene(Scene):
+    """
+    Settings screen, where the game settings are modified with the arrow keys
+    """
+
+    def __init__(self, surface):
+        self.surface = surface
+
+    def enter(self):
+        self.level_setting_active = False
+        self.delay_setting_active = False
+        self.lives_setting_active = False
+        self.mistakes_setting_active = False
+        self.resolution_setting_active = False
+        self.redraw()
+
+    def redraw(self):
+        """
+        Draw all the settings, with the active one highlighted
+        """
+        (self.level_rect, self.delay_rect, self.lives_rect, self.mistakes_rect,
+         self.resolution_rect, self.menu_rect) = print_all_settings(self.surface)
+
+        for active, print_setting in ((self.level_setting_active, print_level_settings),
+                                      (self.delay_setting_active, print_delay_settings),
+                                      (self.lives_setting_active, print_lives_settings),
+                                      (self.mistakes_setting_active, print_mistakes_settings),
+                                      (self.resolution_setting_active, print_resolution_settings)):
+            if active:
+                print_setting(self.surface, DARK_BLUE, WHITE)
+
+    def handle_event(self, event):
+        # Constants
+        global STARTING_LEVEL
+        global DELAY
+        global INITIAL_LIVES
+        global ALLOWED_MISTAKES
+
+        if event.type == pygame.MOUSEBUTTONDOWN and event.button == 1:
+            if self.level_rect.collidepoint(event.pos):
+                self.level_setting_active = True
+                print_level_settings(self.surface, DARK_BLUE, WHITE)
+            else:
+                self.level_setting_active = False
+                print_level_settings(self.surface, WHITE, LIGHT_PURPLE)
+            if self.delay_rect.collidepoint(event.pos):
+                self.delay_setting_active = True
+                print_delay_settings(self.surface, DARK_BLUE, WHITE)
+            else:
+                self.delay_setting_active = False
+                print_delay_settings(self.surface, WHITE, LIGHT_PURPLE)
+            if self.lives_rect.collidepoint(event.pos):
+                self.lives_setting_active = True
+                print_lives_settings(self.surface, DARK_BLUE, WHITE)
+            else:
+                self.lives_setting_active = False
+                print_lives_settings(self.surface, WHITE, LIGHT_PURPLE)
+            if self.mistakes_rect.collidepoint(event.pos):
+                self.mistakes_setting_active = True
+                print_mistakes_settings(self.surface, DARK_BLUE, WHITE)
+            else:
+                self.mistakes_setting_active = False
+                print_mistakes_settings(self.surface, WHITE, LIGHT_PURPLE)
+            if self.resolution_rect.collidepoint(event.pos):
+                self.resolution_setting_active = True
+                print_resolution_settings(self.surface, DARK_BLUE, WHITE)
+            else:
+                self.resolution_setting_active = False
+                print_resolution_settings(self.surface, WHITE, LIGHT_PURPLE)
+            if self.menu_rect.collidepoint(event.pos):
+                self.machine.switch("menu")
+
+        if event.type == pygame.KEYDOWN:
+            if event.key == pygame.K_UP or event.key == pygame.K_RIGHT:
+                if self.level_setting_active:
+                    if STARTING_LEVEL < game_core.SETTINGS["starting_level"][2]:
                         STARTING_LEVEL += 1
-                        print_all_settings(surface)
-                        print_level_settings(surface, DARK_BLUE, WHITE)
-                        level = STARTING_LEVEL
-                    if delay_setting_active:
+                    self.level_rect = redraw_setting(self.surface, print_level_settings, self.level_rect)
+                if self.delay_setting_active:
+                    if DELAY + 50 <= game_core.SETTINGS["delay"][2]:
                         DELAY += 50
-                        print_all_settings(surface)
-                        print_delay_settings(surface, DARK_BLUE, WHITE)
-                    if lives_setting_active:
-                        if INITIAL_LIVES < 4:
-                            INITIAL_LIVES += 1
-                        print_all_settings(surface)
-                        print_lives_settings(surface, DARK_BLUE, WHITE)
-                        lives = INITIAL_LIVES
-                    if mistakes_setting_active:
-                        if ALLOWED_MISTAKES < 3:
-                            ALLOWED_MISTAKES += 1
-                        print_all_settings(surface)
-                        print_mistakes_settings(surface, DARK_BLUE, WHITE)
-                    if resolution_setting_active:
-                        if WIDTH < 1700:
-                            WIDTH += 200
-                            HEIGHT = int(WIDTH // 1.5)
-                        print_all_settings(surface)
-                        print_resolution_settings(surface, DARK_BLUE, WHITE)
-
-
-                if event.key == pygame.K_DOWN or event.key == pygame.K_LEFT:
-                    if level_setting_active:
-                        if STARTING_LEVEL > 1:
-                            STARTING_LEVEL -= 1
-                        print_all_settings(surface)
-                        print_level_settings(surface, DARK_BLUE, WHITE)
-                        level = STARTING_LEVEL
-                    if delay_setting_active:
-                        if DELAY > 50:
-                            DELAY -= 50
-                        print_all_settings(surface)
-                        print_delay_settings(surface, DARK_BLUE, WHITE)
-                    if lives_setting_active:
-                        if INITIAL_LIVES > 1:
-                            INITIAL_LIVES -= 1
-                        print_all_settings(surface)
-                        print_lives_settings(surface, DARK_BLUE, WHITE)
-                        lives = INITIAL_LIVES
-                    if mistakes_setting_active:
-                        if ALLOWED_MISTAKES > 0:
-                            ALLOWED_MISTAKES -= 1
-                        print_all_settings(surface)
-                        print_mistakes_settings(surface, DARK_BLUE, WHITE)
-
-                if event.key == pygame.K_ESCAPE:
-                    print_menu(surface)
-                    return
-
-            if event.type == pygame.QUIT:
-                pygame.quit()
-                sys.exit()
-
-    pygame.display.flip()
-
+                    self.delay_rect = redraw_setting(self.surface, print_delay_settings, self.delay_rect)
+                if self.lives_setting_active:
+                    if INITIAL_LIVES < game_core.SETTINGS["initial_lives"][2]:
+                        INITIAL_LIVES += 1
+                    self.lives_rect = redraw_setting(self.surface, print_lives_settings, self.lives_rect)
+                if self.mistakes_setting_active:
+                    if ALLOWED_MISTAKES < game_core.SETTINGS["allowed_mistakes"][2]:
+                        ALLOWED_MISTAKES += 1
+                    self.mistakes_rect = redraw_setting(self.surface, print_mistakes_settings, self.mistakes_rect)
+                if self.resolution_setting_active:
+                    if WIDTH < 1700:
+                        resize_screen(WIDTH + 200)  # Takes effect right away
+                    self.redraw()
+
+
+            if event.key == pygame.K_DOWN or event.key == pygame.K_LEFT:
+                if self.level_setting_active:
+                    if STARTING_LEVEL > game_core.SETTINGS["starting_level"][1]:
+                        STARTING_LEVEL -= 1
+                    self.level_rect = redraw_setting(self.surface, print_level_settings, self.level_rect)
+                if self.delay_setting_active:
+                    if DELAY - 50 >= game_core.SETTINGS["delay"][1]:
+                        DELAY -= 50
+                    self.delay_rect = redraw_setting(self.surface, print_delay_settings, self.delay_rect)
+                if self.lives_setting_active:
+                    if INITIAL_LIVES > game_core.SETTINGS["initial_lives"][1]:
+                        INITIAL_LIVES -= 1
+                    self.lives_rect = redraw_setting(self.surface, print_lives_settings, self.lives_rect)
+                if self.mistakes_setting_active:
+                    if ALLOWED_MISTAKES > game_core.SETTINGS["allowed_mistakes"][1]:
+                        ALLOWED_MISTAKES -= 1
+                    self.mistakes_rect = redraw_setting(self.surface, print_mistakes_settings, self.mistakes_rect)
+
+            if event.key == pygame.K_ESCAPE:
+                self.machine.switch("menu")
+
+            save_settings()     # Written once the keys are released
+
+def save_settings():
+    """
+    Save the current settings, the store coalesces the repeated changes
+    """
+    if store is not None:
+        store.update_settings({
+            "width": WIDTH,
+            "starting_level": STARTING_LEVEL,
+            "delay": DELAY,
+            "initial_lives": INITIAL_LIVES,
+            "allowed_mistakes": ALLOWED_MISTAKES,
+        })
+
+def record_score():
+    """
+    Add the level reached in the game that just ended to the player's scores
+    """
+    if store is not None:
+        store.add_score(PLAYER, {
+            "level": game.level,
+            "date": datetime.datetime.now().isoformat(timespec="seconds"),
+            "starting_level": game.starting_level,
+            "delay": DELAY,
+            "initial_lives": game.initial_lives,
+            "allowed_mistakes": game.allowed_mistakes,
+        })
+
+@profiler.timed("print_all_settings")
 def print_all_settings(surface):
     """
     Print the text and buttons of the settings menu
     """
 
     surface.fill(PURPLE)     # Fill the screen background
+    frame_loop.mark_dirty()
 
     # Print "Settings" title
-    font = pygame.font.Font("freesansbold.ttf", 70)
-    settings_text = font.render("Settings", True, WHITE, PURPLE)
-    settings_rect = settings_text.get_rect()
-    settings_rect.left = WIDTH // 10
-    settings_rect.centery = HEIGHT // 8
-    surface.blit(settings_text, settings_rect)
+    settings_text = render_text("Settings", 70, WHITE, PURPLE)
+    surface.blit(settings_text, layout.place("settings_title", settings_text.get_size()))
 
     # Print guidance on how to modify the settings
-    font = pygame.font.SysFont("freesansitalic.ttf", 48, italic=True)
-    info_text = font.render("use the arrow keys to modify values", True, WHITE, PURPLE)
-    info_rect = info_text.get_rect()
-    info_rect.left = WIDTH // 10
-    info_rect.centery = (HEIGHT // 8) + 65
-    surface.blit(info_text, info_rect)
+    info_text = render_text("use the arrow keys to modify values", 48, WHITE, PURPLE,
+                            face="freesansitalic.ttf", style=text_cache.ITALIC)
+    surface.blit(info_text, layout.place("settings_info", info_text.get_size()))
 
     # Print each setting
     level_rect = print_level_settings(surface, WHITE, LIGHT_PURPLE)
@@ -305,237 +698,161 @@ def print_all_settings(surface):
 
     return level_rect, delay_rect, lives_rect, mistakes_rect, resolution_rect, menu_rect
 
+def redraw_setting(surface, print_setting, old_rect):
+    """
+    Redraw a single active setting after its value changed, erasing the
+    previous text, and return its new rectangle
+    """
+    surface.fill(PURPLE, old_rect)
+    frame_loop.mark_dirty(old_rect)
+    return print_setting(surface, DARK_BLUE, WHITE)
+
+@profiler.timed("print_level_settings")
 def print_level_settings(surface, fg_color, bg_color):
     # Print the "Initial level" button
-    font = pygame.font.Font("freesansbold.ttf", 40)
-    level_text = font.render("Initial level: " + str(STARTING_LEVEL), True, fg_color, bg_color)
-    level_rect = level_text.get_rect()
-    level_rect.left = WIDTH // 10
-    level_rect.centery = (HEIGHT // 2) - 65
+    level_text = render_text("Initial level: " + str(STARTING_LEVEL), 40, fg_color, bg_color)
+    level_rect = layout.place("level_setting", level_text.get_size())
     surface.blit(level_text, level_rect)
 
-    pygame.display.flip()
+    frame_loop.mark_dirty(level_rect)
     return level_rect
 
+@profiler.timed("print_delay_settings")
 def print_delay_settings(surface, fg_color, bg_color):
     # Print the "Flashing Delay" button
-    font = pygame.font.Font("freesansbold.ttf", 40)
-    delay_text = font.render("Flashing delay: " + str(DELAY), True, fg_color, bg_color)
-    delay_rect = delay_text.get_rect()
-    delay_rect.left = WIDTH // 10
-    delay_rect.centery= HEIGHT // 2
+    delay_text = render_text("Flashing delay: " + str(DELAY), 40, fg_color, bg_color)
+    delay_rect = layout.place("delay_setting", delay_text.get_size())
     surface.blit(delay_text, delay_rect)
 
-    pygame.display.flip()
+    frame_loop.mark_dirty(delay_rect)
     return delay_rect
 
+@profiler.timed("print_lives_settings")
 def print_lives_settings(surface, fg_color, bg_color):
     # Print the "Initial lives" button
-    font = pygame.font.Font("freesansbold.ttf", 40)
-    lives_text = font.render("Initial lives: " + str(INITIAL_LIVES), True, fg_color, bg_color)
-    lives_rect = lives_text.get_rect()
-    lives_rect.left = WIDTH // 10
-    lives_rect.centery= (HEIGHT // 2) + 65
+    lives_text = render_text("Initial lives: " + str(INITIAL_LIVES), 40, fg_color, bg_color)
+    lives_rect = layout.place("lives_setting", lives_text.get_size())
     surface.blit(lives_text, lives_rect)
 
-    pygame.display.flip()
+    frame_loop.mark_dirty(lives_rect)
     return lives_rect
 
+@profiler.timed("print_mistakes_settings")
 def print_mistakes_settings(surface, fg_color, bg_color):
     # Print the "Allowed mistakes" button
-    font = pygame.font.Font("freesansbold.ttf", 40)
-    mistakes_text = font.render("Allowed mistakes: " + str(ALLOWED_MISTAKES),
-                            True, fg_color, bg_color)
-    mistakes_rect = mistakes_text.get_rect()
-    mistakes_rect.left = WIDTH // 10
-    mistakes_rect.centery= (HEIGHT // 2) + 130
+    mistakes_text = render_text("Allowed mistakes: " + str(ALLOWED_MISTAKES),
+                                40, fg_color, bg_color)
+    mistakes_rect = layout.place("mistakes_setting", mistakes_text.get_size())
     surface.blit(mistakes_text, mistakes_rect)
 
-    pygame.display.flip()
+    frame_loop.mark_dirty(mistakes_rect)
     return mistakes_rect
 
+@profiler.timed("print_resolution_settings")
 def print_resolution_settings(surface, fg_color, bg_color):
     # Print the "Allowed mistakes" button
-    font = pygame.font.Font("freesansbold.ttf", 40)
-    resolution_text = font.render("Resolution " + str(WIDTH) + "x" + str(HEIGHT),
-                                True, fg_color, bg_color)
-    resolution_rect = resolution_text.get_rect()
-    resolution_rect.left = WIDTH // 10
-    resolution_rect.centery= (HEIGHT // 2) + 195
+    resolution_text = render_text("Resolution " + str(WIDTH) + "x" + str(HEIGHT),
+                                  40, fg_color, bg_color)
+    resolution_rect = layout.place("resolution_setting", resolution_text.get_size())
     surface.blit(resolution_text, resolution_rect)
 
-    pygame.display.flip()
+    frame_loop.mark_dirty(resolution_rect)
     return resolution_rect
 
+@profiler.timed("print_back_to_menu")
 def print_back_to_menu(surface, fg_color, bg_color):
     # Print the "Back to menu" button
-    font = pygame.font.Font("freesansbold.ttf", 40)
-    menu_text = font.render("Back to menu", True, fg_color, bg_color)
-    menu_rect = menu_text.get_rect()
-    menu_rect.right = WIDTH * 0.9
-    menu_rect.centery= HEIGHT * 0.9
+    menu_text = render_text("Back to menu", 40, fg_color, bg_color)
+    menu_rect = layout.place("back_to_menu", menu_text.get_size())
     surface.blit(menu_text, menu_rect)
 
-    pygame.display.flip()
+    frame_loop.mark_dirty(menu_rect)
     return menu_rect
 
-def draw_grid(surface, grid):
+@profiler.timed("draw_grid")
+def draw_grid(surface, board, flash=None):
     """
-    Draw the initial grid on the screen, with the flashing squares
+    Draw the initial grid on the screen, with the flashing squares, or
+    blit flash if the grid was already rendered with them
     """
-    rectangles = []
-    block_size, margin = get_block_dimensions()
-    for x in range(grid_size):
-        for y in range(grid_size):
-            rect = pygame.Rect(x*block_size + x*margin + WIDTH_SPACE // 2,
-                            y*block_size + y*margin + HEIGHT_SPACE * 0.9,
-                            block_size, block_size)
-            rectangles.append([rect, [x,y]])
-
-            if grid[x][y] == 0:
-                color = DARK_BLUE
-            elif grid[x][y] == 1:
-                color = WHITE
-            pygame.draw.rect(surface, color, rect)
-
-    pygame.display.flip()
-    return rectangles
+    geometry = get_grid_geometry()
+    if flash is None:
+        rect = grid_renderer.draw_flash(surface, geometry, board.flashed_cells())
+    else:
+        rect = surface.blit(flash, geometry.bounds())
+    frame_loop.mark_dirty(rect)
 
+@profiler.timed("clear_grid")
 def clear_grid(surface):
     """
     Clear the white squares on the grid, so that the grid becomes composed of only
     blue squares
     """
-    block_size, margin = get_block_dimensions()
-    for x in range(grid_size):
-        for y in range(grid_size):
-            rect = pygame.Rect(x*block_size + x*margin + WIDTH_SPACE // 2,
-                            y*block_size + y*margin + HEIGHT_SPACE*0.9,
-                            block_size, block_size)
-            pygame.draw.rect(surface, DARK_BLUE, rect)
-    pygame.display.flip()
-
-def end_of_level(rectangles, surface, grid, num_flash_squares):
-    """
-    - If the player clicks all the square, level up
-    - If not, the player loses a life
-    - When no lives are left, the game restarts
-    """
-    global level
-    global lives
-    global mistakes
-    global lost
-
-    if click_squares(rectangles, surface, grid, num_flash_squares):
-        lost = False
-        level += 1      # Increase the difficulty if the grid is successfully completed
-        mistakes = 0    # Reset the mistake counter
-    else:
-        lost = True
-        lives -= 1      # Decrease the lives of the player in case of failure
-        mistakes = 0    # Reset the mistake counter
-    time.sleep(.25)
-
-    if lives < 1:
-        end_screen(surface)
+    rect = grid_renderer.draw_empty(surface, get_grid_geometry())
+    frame_loop.mark_dirty(rect)
 
-def click_squares(rectangles, surface, grid, num_flash_squares):
+def change_color(surface, rect, state):
     """
-    The user must now click the squares that previously flashed
+    Change the color of a square that was clicked to show its new state
     """
-    global mistakes
-
-    i = 0
-    while i < num_flash_squares:
-        for event in pygame.event.get():
-            if event.type == pygame.MOUSEBUTTONDOWN and event.button == 1:
-                for rect in rectangles:
-                    if rect[0].collidepoint(pygame.mouse.get_pos()):
-                        state = change_color(surface, grid, rect[0], rect[1][0], rect[1][1])
-                        if state == 1:   # If player clicked on a correct square
-                            i += 1
-                        elif state == 0:     # If player clicked on the wrong square
-                            mistakes += 1
-                            if mistakes > ALLOWED_MISTAKES:
-                                pygame.display.flip()
-                                return False    # Return False if player failed
-
-            if event.type == pygame.KEYDOWN:
-                    if event.key == pygame.K_ESCAPE:    # If player quits game (ESC)
-                        mistakes = 0        # Reset mistakes counter
-                        end_screen(surface) # Show end screem
-
-            if event.type == pygame.QUIT:
-                    pygame.quit()
-                    sys.exit()
-
-        pygame.display.flip()
+    if state == MISSED:
+        pygame.draw.rect(surface, BLACK, rect)  # The player clicked the wrong square
+    elif state == FOUND:
+        pygame.draw.rect(surface, WHITE, rect)  # The player clicked the right square
+    frame_loop.mark_dirty(rect)
 
-
-    return True     # Return True if player clicks all the flashed squares
-
-def change_color(surface, grid, rect, x, y):
+def draw_level_screen(surface, level, lives, grid_size):
     """
-    Change the color of a square that was clicked
+    Draw the screen of a level with an empty grid
     """
-    if grid[x][y] == 0:
-        pygame.draw.rect(surface, BLACK, rect)
-        grid[x][y] = 2
-        return 0    # Return 0 if player clicks the wrong square
-
-    elif grid[x][y] == 1:
-        pygame.draw.rect(surface, WHITE, rect)
-        grid[x][y] = 2
-        return 1     # Return 1 if the player clicks the right square
+    surface.fill(LIGHT_BLUE)        # Fill the screen background
+    print_top_text(surface, level)  # Show "level" in the top of the screen
+    show_lives(surface, lives)      # Show remaining lives in the top of the screen
+    grid_renderer.draw_empty(surface, get_grid_geometry(grid_size))
 
-
-def generate_flash_squares(grid, num_flash_squares):
+def render_level(prepared, lives, frame=None):
     """
-    Generate random x and y values where the squares on the grid will
-    flash and disappear
+    Render the first frame of a prepared level, on frame if it has the size
+    of the screen, and its grid with the flashing squares. Runs in the
+    thread of the LevelPrefetcher, timed as a whole as the "prefetch" section.
     """
-    i = 0
-    while i < num_flash_squares:
-        x = random.randint(0, grid_size - 1)
-        y = random.randint(0, grid_size - 1)
-        if grid[x][y] == 0:
-            grid[x][y] = 1
-            i += 1
+    with profiler.background("prefetch"):
+        screen = pygame.display.get_surface()
+        if frame is None or frame.get_size() != screen.get_size():
+            frame = pygame.Surface(screen.get_size(), 0, screen)
+        draw_level_screen(frame, prepared.level, lives, prepared.board.size)
+        flash = grid_renderer.render_flash(get_grid_geometry(prepared.board.size),
+                                           prepared.board.flashed_cells())
+    return frame, flash
 
-def get_block_dimensions():
+def get_grid_geometry(grid_size=None):
     """
-    Determine the dimensions of the blocks that constitute the grid
+    Position of the squares of the grid for the current grid size, or for
+    grid_size if given
     """
-    margin = int(GRID_LENGTH // (40 + (7*grid_size)))
-    block_size = (GRID_LENGTH - (grid_size - 1)*margin) / grid_size
-    return block_size, margin
+    return layout.grid(grid_size or game.grid_size)
 
-def end_screen(surface):
+class EndScene(Scene):
     """
     End screen when the player has no lives left
     """
 
-    global lives
-    global level
-
-    # Print the end screen text and return the button rectangles variables
-    play_again_rect, menu_rect = print_end_screen(surface)
-
-    level = STARTING_LEVEL      # Reset the starting level
-    lives = INITIAL_LIVES       # Reset the lives
+    def __init__(self, surface):
+        self.surface = surface
 
-    while True:
-        for event in pygame.event.get():
-            if event.type == pygame.MOUSEBUTTONDOWN and event.button == 1:
-                if play_again_rect.collidepoint(pygame.mouse.get_pos()):
-                    play_game(surface)
-                if menu_rect.collidepoint(pygame.mouse.get_pos()):
-                    menu(surface)
+    def enter(self):
+        # Print the end screen text and keep the button rectangles.
+        # The next game starts back from the settings.
+        self.play_again_rect, self.menu_rect = print_end_screen(self.surface)
 
-            if event.type == pygame.QUIT:
-                    pygame.quit()
-                    sys.exit()
+    def handle_event(self, event):
+        if event.type == pygame.MOUSEBUTTONDOWN and event.button == 1:
+            if self.play_again_rect.collidepoint(event.pos):
+                self.machine.switch("play")
+            if self.menu_rect.collidepoint(event.pos):
+                self.machine.switch("menu")
 
+@profiler.timed("print_end_screen")
 def print_end_screen(surface):
     """
     This function prints the end screen text and buttons
@@ -544,219 +861,51 @@ def print_end_screen(surface):
     surface.fill(LIGHT_BLUE)     # Fill the screen background
 
     # Print the level achieved during the game
-    font = pygame.font.Font("freesansbold.ttf", 81)
-    level_text = font.render("Level " + str(level), True, WHITE, LIGHT_BLUE)
-    level_rect = level_text.get_rect()
-    level_rect.center = (WIDTH // 2, HEIGHT // 3)
-    surface.blit(level_text, level_rect)
+    level_text = render_text("Level " + str(game.level), 81, WHITE, LIGHT_BLUE)
+    surface.blit(level_text, layout.place("end_level", level_text.get_size()))
+
+    # Print the best level of the player
+    best = store.best_level(PLAYER) if store is not None else None
+    if best is not None:
+        best_text = render_text("Best: " + str(best), 30, WHITE, LIGHT_BLUE)
+        surface.blit(best_text, layout.place("end_best", best_text.get_size()))
+
+    image, caption = end_screen_tier(game.level)
 
-    img_size = int((min(WIDTH, HEIGHT) * 0.4) - 90)
-
-    if level < 7:
-        # Show image
-        img = pygame.image.load('src/images/joe.jpg')
-        img = pygame.transform.scale(img, (img_size, img_size))
-        surface.blit(img, ((WIDTH - img_size - 33), 33))
-
-        # Print text
-        font = pygame.font.Font("freesansbold.ttf", 30)
-        img_text = font.render("c'mon man", True, WHITE, LIGHT_BLUE)
-        img_rect = img_text.get_rect()
-        img_rect.top = img_size + 33
-        img_rect.centerx = WIDTH - (img_size // 2) - 33
-        surface.blit(img_text, img_rect)
-
-    elif level < 9:
-        # Show image
-        img = pygame.image.load('src/images/lester.jpg')
-        img = pygame.transform.scale(img, (img_size, img_size))
-        surface.blit(img, ((WIDTH - img_size - 33), 33))
-
-        # Print text
-        font = pygame.font.Font("freesansbold.ttf", 30)
-        img_text = font.render("smooth brain", True, WHITE, LIGHT_BLUE)
-        img_rect = img_text.get_rect()
-        img_rect.top = img_size + 33
-        img_rect.centerx = WIDTH - (img_size // 2) - 33
-        surface.blit(img_text, img_rect)
-
-    elif level < 11:
-        # Show image
-        img = pygame.image.load('src/images/white_claw.jpg')
-        img = pygame.transform.scale(img, (img_size, img_size))
-        surface.blit(img, ((WIDTH - img_size - 33), 33))
-
-        # Print text
-        font = pygame.font.Font("freesansbold.ttf", 30)
-        img_text = font.render("drunk?", True, WHITE, LIGHT_BLUE)
-        img_rect = img_text.get_rect()
-        img_rect.top = img_size + 33
-        img_rect.centerx = WIDTH - (img_size // 2) - 33
-        surface.blit(img_text, img_rect)
-
-    elif level < 13:
-        # Show image
-        ben = pygame.image.load('src/images/ben.png')
-        ben = pygame.transform.scale(ben, (img_size, img_size))
-        surface.blit(ben, ((WIDTH - img_size - 33), 33))
-
-        # Print text
-        font = pygame.font.Font("freesansbold.ttf", 30)
-        ben_text = font.render("mediocre", True, WHITE, LIGHT_BLUE)
-        ben_rect = ben_text.get_rect()
-        ben_rect.top = img_size + 33
-        ben_rect.centerx = WIDTH - (img_size // 2) - 33
-        surface.blit(ben_text, ben_rect)
-
-    elif level == 13:
-        # Show image
-        phil = pygame.image.load('src/images/phil.jpg')
-        phil = pygame.transform.scale(phil, (img_size, img_size))
-        surface.blit(phil, ((WIDTH - img_size - 33), 33))
-
-        # Print text
-        font = pygame.font.Font("freesansbold.ttf", 30)
-        phil_text = font.render("average", True, WHITE, LIGHT_BLUE)
-        phil_rect = phil_text.get_rect()
-        phil_rect.top = img_size + 33
-        phil_rect.centerx = WIDTH - (img_size // 2) - 33
-        surface.blit(phil_text, phil_rect)
-
-    elif level < 16:
-        # Show image
-        monke = pygame.image.load('src/images/monke.jpg')
-        monke = pygame.transform.scale(monke, (img_size, img_size))
-        surface.blit(monke, ((WIDTH - img_size - 33), 33))
-
-        # Print text
-        font = pygame.font.Font("freesansbold.ttf", 30)
-        monke_text = font.render("monke", True, WHITE, LIGHT_BLUE)
-        monke_rect = monke_text.get_rect()
-        monke_rect.top = img_size + 33
-        monke_rect.centerx = WIDTH - (img_size // 2) - 33
-        surface.blit(monke_text, monke_rect)
-
-    elif level < 18:
-        # Show image
-        chad = pygame.image.load('src/images/chad.jpeg')
-        chad = pygame.transform.scale(chad, (img_size, img_size))
-        surface.blit(chad, ((WIDTH - img_size - 33), 33))
-
-        # Print text
-        font = pygame.font.Font("freesansbold.ttf", 30)
-        chad_text = font.render("High IQ", True, WHITE, LIGHT_BLUE)
-        chad_rect = chad_text.get_rect()
-        chad_rect.top = img_size + 33
-        chad_rect.centerx = WIDTH - (img_size // 2) - 33
-        surface.blit(chad_text, chad_rect)
-
-    elif level < 20:
-        # Show image
-        putin = pygame.image.load('src/images/putin.jpeg')
-        putin = pygame.transform.scale(putin, (img_size, img_size))
-        surface.blit(putin, ((WIDTH - img_size - 33), 33))
-
-        # Print text
-        font = pygame.font.Font("freesansbold.ttf", 30)
-        putin_text = font.render("Wide IQ", True, WHITE, LIGHT_BLUE)
-        putin_rect = putin_text.get_rect()
-        putin_rect.top = img_size + 33
-        putin_rect.centerx = WIDTH - (img_size // 2) - 33
-        surface.blit(putin_text, putin_rect)
-
-    elif level > 19:
-        # Show image
-        poire = pygame.image.load('src/images/image.png')
-        poire = pygame.transform.scale(poire, (img_size, img_size))
-        surface.blit(poire, ((WIDTH - img_size - 33), 33))
-
-        # Print text
-        font = pygame.font.Font("freesansbold.ttf", 30)
-        poire_text = font.render("genius", True, WHITE, LIGHT_BLUE)
-        poire_rect = poire_text.get_rect()
-        poire_rect.top = img_size + 33
-        poire_rect.centerx = WIDTH - (img_size // 2) - 33
-        surface.blit(poire_text, poire_rect)
+    # Show image
+    img = assets.get(image, layout.end_image_size)
+    surface.blit(img, layout.end_image_pos)
+
+    # Print text
+    img_text = render_text(caption, 30, WHITE, LIGHT_BLUE)
+    surface.blit(img_text, layout.place("end_caption", img_text.get_size()))
 
     # Print the "play again" button
-    font = pygame.font.Font("freesansbold.ttf", 40)
-    play_again_text = font.render("Play again", True, DARK_BLUE, WHITE)
-    play_again_rect = play_again_text.get_rect()
-    play_again_rect.center = (WIDTH // 2, HEIGHT // 2)
+    play_again_text = render_text("Play again", 40, DARK_BLUE, WHITE)
+    play_again_rect = layout.place("play_again", play_again_text.get_size())
     surface.blit(play_again_text, play_again_rect)
 
     # Print the "back to main menu" button
-    font = pygame.font.Font("freesansbold.ttf", 40)
-    menu_text = font.render("Back to main menu", True, DARK_BLUE, WHITE)
-    menu_rect = menu_text.get_rect()
-    menu_rect.center = (WIDTH // 2, (HEIGHT // 2) + 65)
+    menu_text = render_text("Back to main menu", 40, DARK_BLUE, WHITE)
+    menu_rect = layout.place("end_menu", menu_text.get_size())
     surface.blit(menu_text, menu_rect)
 
-    pygame.display.flip()
+    frame_loop.mark_dirty()
 
     return play_again_rect, menu_rect
 
-def print_top_text(surface):
-    font = pygame.font.Font("freesansbold.ttf", 40)
-    top_text = font.render("Level " + str(level), True, WHITE, LIGHT_BLUE)
-    top_rect = top_text.get_rect()
-    top_rect.center = (WIDTH // 2, HEIGHT_SPACE // 2)
-    surface.blit(top_text, top_rect)
+@profiler.timed("print_top_text")
+def print_top_text(surface, level=None):
+    top_text = render_text("Level " + str(level or game.level), 40, WHITE, LIGHT_BLUE)
+    surface.blit(top_text, layout.place("top_text", top_text.get_size()))
 
-def show_lives(surface):
+def show_lives(surface, lives=None):
     """
     Draw the circles that represent the player remaining lives
     """
-    for i in range(lives):
-        pygame.draw.circle(surface, DARK_BLUE, (int(WIDTH // 2) +
-                        int(GRID_LENGTH // 2) - 18 - i * 42,
-                        int(HEIGHT_SPACE // 2)), 18)
-
-def get_difficulty():
-    """
-    Return the grid size nd th number of flashing square depending on
-    the level achieved by the player
-    """
-    global grid_size
-
-    num_flash_squares = level + 2
-
-    if not lost:
-        if grid_size:
-            # If the current grid size is known, verify if
-            # the grid size must be increased for the next level
-            if isqrt((num_flash_squares)*3 + 1) or isqrt((num_flash_squares)*3 + 3):
-                grid_size += 1
-
-        else:
-            # If there is no current grid size, find the grid size from
-            # the number of flashing squares
-            i = num_flash_squares
-            while i > 0:
-                if isqrt((i*3) + 1):
-                    grid_size = int(math.sqrt((i * 3) + 1))
-                    return num_flash_squares
-                elif isqrt((i*3) + 3):
-                    grid_size = int(math.sqrt((i * 3) + 3))
-                    return num_flash_squares
-                i -= 1
-
-    return num_flash_squares
-
-
-def isqrt(n):
-    """
-    return True if n is a perfect square
-    return False if n is not a perfect square
-    """
-    x = n
-    y = (x + 1) // 2
-    while y < x:
-        x = y
-        y = (x + n // x) // 2
-
-    return x**2 == n
+    x, y = layout.first_life
+    for i in range(game.lives if lives is None else lives):
+        pygame.draw.circle(surface, DARK_BLUE, (x - i * layout.life_spacing, y), layout.life_radius)
 
-main()
-pygame.quit()
-sys.exit()
+if __name__ == "__main__":
+    sys.exit(run())
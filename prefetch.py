@@ -0,0 +1,95 @@
+"""
+Preparation of the next level while the current one is being played.
+
+While the player clicks the squares of a level, its outcome is not known
+yet, but there are only two: a win goes up a level, a loss plays the same
+level again with a life less. A background thread prepares both: it draws
+their boards from a copy of the random generator of the game, so they are
+the boards the game would draw itself, and renders their first frame and
+their grid with the flashing squares. Starting the next level is then a
+copy of its board and a single blit per frame.
+
+The frames are rendered with the drawing functions of the game, on
+surfaces of their own, but those functions share caches (texts, grids,
+layout): the scene waits for the thread, with take() or cancel(), before
+drawing anything else than the clicked squares or changing the resolution.
+"""
+import threading
+
+from board import Board
+from game_core import prepare_level
+
+
+class NextLevel:
+    """
+    A level that can follow the current one, prepared ahead of time
+    """
+
+    __slots__ = ("prepared", "lives", "frame", "flash")
+
+    def __init__(self, prepared, lives, frame, flash):
+        self.prepared = prepared    # PreparedLevel, with the board
+        self.lives = lives
+        self.frame = frame          # First frame of the level, the size of the screen
+        self.flash = flash          # Grid with the flashing squares
+
+
+class LevelPrefetcher:
+    """
+    Prepare the levels that can follow the current level of a game in a
+    background thread
+    """
+
+    def __init__(self):
+        self.prepared = 0   # Levels prepared
+        self.used = 0       # Prepared levels taken by the game
+        self._boards = [Board(), Board()]   # Reused, one per outcome
+        self._frames = [None, None]         # Same
+        self._levels = []
+        self._thread = None
+
+    def start(self, game, render):
+        """
+        Start preparing the next levels of game, from its current state.
+        render(prepared, lives, frame) is called in the background thread
+        and returns the (frame, flash) surfaces of a level, drawing the
+        frame on the one given if it can be reused.
+        """
+        self.cancel()
+        self._thread = threading.Thread(target=self._prepare,
+                                        args=(game.next_levels(), game.rng.getstate(), render),
+                                        name="level-prefetch", daemon=True)
+        self._thread.start()
+
+    def _prepare(self, outcomes, rng_state, render):
+        for i, (level, lives) in enumerate(outcomes):
+            prepared = prepare_level(level, rng_state, self._boards[i])
+            frame, flash = render(prepared, lives, self._frames[i])
+            self._frames[i] = frame
+            self._levels.append(NextLevel(prepared, lives, frame, flash))
+            self.prepared += 1
+
+    def take(self, game):
+        """
+        Wait for the preparation, and return the NextLevel that game is
+        about to start, or None if it was not prepared
+        """
+        self._wait()
+        levels, self._levels = self._levels, []
+        for next_level in levels:
+            if next_level.lives == game.lives and next_level.prepared.matches(game):
+                self.used += 1
+                return next_level
+        return None
+
+    def cancel(self):
+        """
+        Wait for the preparation and drop the prepared levels
+        """
+        self._wait()
+        self._levels = []
+
+    def _wait(self):
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
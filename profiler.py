@@ -0,0 +1,300 @@
+"""
+Frame time and hot path profiling.
+
+The drawing and event handling functions of the game are wrapped with
+Profiler.timed(). While the profiler is enabled, each call is timed and
+kept in a rolling window per section, from which p50/p95/p99 are computed,
+and summed per level. The FrameLoop adds the frame, CPU and display update
+times of every frame, and the pixels it pushed to the display.
+
+The overlay shows the percentiles in the corner of the screen and is
+toggled with OVERLAY_KEY. It is drawn on top of the frame just before it
+is presented, and the pixels below it are put back right after, so the
+screens never draw over it.
+
+Work done by another thread than the frames, such as the preparation of
+the next level, is timed as a whole with background(): the timed()
+functions it calls are not counted in their sections, nor in the levels.
+
+export() writes the statistics to a JSON file, or a CSV file if the path
+ends with .csv: a table of the sections, overall and per level, followed
+by the other statistics (display, click latency histogram...) as
+statistic,value rows.
+"""
+import collections
+import contextlib
+import csv
+import functools
+import json
+import threading
+import time
+
+import pygame
+
+import text_cache
+
+WINDOW = 1000       # Samples kept per section for the percentiles
+OVERLAY_KEY = pygame.K_F3
+OVERLAY_REFRESH = 0.25      # Seconds between two renderings of the overlay
+OVERLAY_FONT_SIZE = 16
+OVERLAY_COLOR = (255, 255, 255)
+OVERLAY_BACKGROUND = (0, 0, 0)
+PERCENTILES = (50, 95, 99)
+
+# Sections measured by the FrameLoop
+FRAME = "frame"
+CPU = "frame cpu"
+DISPLAY = "display update"
+
+
+def percentile(ordered, p):
+    """
+    Nearest-rank percentile p of a sorted non-empty sequence
+    """
+    rank = max(1, -(-len(ordered) * p // 100))     # ceil(len * p / 100)
+    return ordered[rank - 1]
+
+
+def flatten(name, value):
+    """
+    (dotted name, value) rows of the leaves of a JSON value
+    """
+    if isinstance(value, dict):
+        return [row for key, item in value.items() for row in flatten("%s.%s" % (name, key), item)]
+    if isinstance(value, (list, tuple)):
+        return [row for i, item in enumerate(value) for row in flatten("%s.%d" % (name, i), item)]
+    return [(name, value)]
+
+
+class Section:
+    """
+    Rolling window of the durations of a section, plus all-time totals
+    """
+
+    __slots__ = ("samples", "count", "total", "max")
+
+    def __init__(self):
+        self.samples = collections.deque(maxlen=WINDOW)
+        self.count = 0
+        self.total = 0.0
+        self.max = 0.0
+
+    def add(self, ms):
+        self.samples.append(ms)
+        self.count += 1
+        self.total += ms
+        if ms > self.max:
+            self.max = ms
+
+    def stats(self):
+        ordered = sorted(self.samples)
+        stats = {"count": self.count, "mean_ms": self.total / self.count, "max_ms": self.max}
+        for p in PERCENTILES:
+            stats["p%d_ms" % p] = percentile(ordered, p)
+        return stats
+
+
+class Profiler:
+    """
+    Time named sections of code per frame and per level
+    """
+
+    def __init__(self, enabled=False):
+        self.enabled = enabled
+        self.sections = {}      # name -> Section
+        self.levels = {}        # level -> name -> [count, total ms, max ms]
+        self.level = None       # Level being played, None outside of a game
+        self.extra = {}         # Other statistics to export, name -> JSON value
+        self.frames = 0         # Frames presented while enabled
+        self.updates = 0        # Frames that pushed pixels to the display
+        self.pixels_pushed = 0  # Pixels pushed to the display by those frames
+        self._lock = threading.Lock()       # add() is called from several threads
+        self._local = threading.local()     # .background is set in background()
+
+        self.overlay_visible = False
+        self._overlay = None            # Rendered overlay surface
+        self._overlay_time = 0.0
+        self._saved = None              # (pixels below the overlay, their rect)
+        self._overlay_rect = None       # Area of the screen last covered by the overlay
+
+    def timed(self, name):
+        """
+        Decorator timing each call of a function as section name
+        """
+        def decorator(func):
+            @functools.wraps(func)
+            def wrapper(*args, **kwargs):
+                if not self.enabled or getattr(self._local, "background", False):
+                    return func(*args, **kwargs)
+                start = time.perf_counter()
+                try:
+                    return func(*args, **kwargs)
+                finally:
+                    self.add(name, (time.perf_counter() - start) * 1000)
+            return wrapper
+        return decorator
+
+    @contextlib.contextmanager
+    def background(self, name):
+        """
+        Time the block as section name, outside of the levels, without
+        timing the timed() functions it calls. For the work of a background
+        thread, which would skew the sections of the frames.
+        """
+        self._local.background = True
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self._local.background = False
+            if self.enabled:
+                self.add(name, (time.perf_counter() - start) * 1000, per_level=False)
+
+    def add(self, name, ms, per_level=True):
+        """
+        Record a duration of section name, in milliseconds, also for the
+        level being played if per_level
+        """
+        with self._lock:
+            section = self.sections.get(name)
+            if section is None:
+                section = self.sections[name] = Section()
+            section.add(ms)
+
+            level = self.level
+            if per_level and level is not None:
+                totals = self.levels.setdefault(level, {}).get(name)
+                if totals is None:
+                    self.levels[level][name] = [1, ms, ms]
+                else:
+                    totals[0] += 1
+                    totals[1] += ms
+                    if ms > totals[2]:
+                        totals[2] = ms
+
+    def attach(self, loop):
+        """
+        Measure the frames of a FrameLoop and handle the overlay
+        """
+        loop.on_events.append(self._handle_events)
+        loop.on_draw.append(self._draw_overlay)
+        loop.on_present.append(self._frame_presented)
+
+    def _handle_events(self, loop, events):
+        for event in events:
+            if event.type == pygame.KEYDOWN and event.key == OVERLAY_KEY:
+                self.overlay_visible = not self.overlay_visible
+                self._overlay = None
+                if not self.overlay_visible and self._overlay_rect is not None:
+                    loop.mark_dirty(self._overlay_rect)     # Push the pixels below it again
+
+    def _frame_presented(self, loop):
+        if self.enabled:
+            self.add(FRAME, loop.frame_ms)
+            self.add(CPU, loop.cpu_ms)
+            self.add(DISPLAY, loop.present_ms)
+            self.frames += 1
+            if loop.pixels_pushed:
+                self.updates += 1
+                self.pixels_pushed += loop.pixels_pushed
+
+        # Put back what the screens drew below the overlay
+        if self._saved is not None:
+            pixels, rect = self._saved
+            pygame.display.get_surface().blit(pixels, rect)
+            self._saved = None
+
+    def _draw_overlay(self, loop):
+        if not (self.enabled and self.overlay_visible):
+            return
+        now = time.monotonic()
+        if self._overlay is None or now - self._overlay_time >= OVERLAY_REFRESH:
+            self._overlay = self.render_overlay()
+            self._overlay_time = now
+
+        screen = pygame.display.get_surface()
+        rect = self._overlay.get_rect().clip(screen.get_rect())
+        self._saved = (screen.subsurface(rect).copy(), rect)
+        self._overlay_rect = rect
+        screen.blit(self._overlay, rect)
+        loop.mark_dirty(rect)
+
+    def render_overlay(self):
+        """
+        Render the table of the percentiles of every section
+        """
+        font = text_cache.fonts.get(text_cache.DEFAULT_FACE, OVERLAY_FONT_SIZE)
+        header = ["ms"] + ["p%d" % p for p in PERCENTILES]
+        rows = [header]
+        with self._lock:
+            sections = [(name, section.stats()) for name, section in sorted(self.sections.items())]
+        for name, stats in sections:
+            rows.append([name] + ["%.2f" % stats["p%d_ms" % p] for p in PERCENTILES])
+
+        # Texts are not cached, the numbers change on every rendering
+        cells = [[font.render(text, True, OVERLAY_COLOR, OVERLAY_BACKGROUND) for text in row]
+                 for row in rows]
+        padding = 6
+        widths = [max(row[i].get_width() for row in cells) for i in range(len(header))]
+        line_height = font.get_linesize()
+        surface = pygame.Surface((sum(widths) + padding * (len(widths) + 1),
+                                  line_height * len(cells) + 2 * padding))
+        surface.fill(OVERLAY_BACKGROUND)
+        for y, row in enumerate(cells):
+            x = padding
+            for i, cell in enumerate(row):
+                # Names are left-aligned, numbers right-aligned
+                left = x if i == 0 else x + widths[i] - cell.get_width()
+                surface.blit(cell, (left, padding + y * line_height))
+                x += widths[i] + padding
+        return surface
+
+    def stats(self):
+        """
+        Statistics of every section, overall and per level, and of the
+        pixels pushed to the display
+        """
+        with self._lock:
+            levels = {}
+            for level, sections in sorted(self.levels.items()):
+                levels[level] = {name: {"count": count, "mean_ms": total / count, "max_ms": max_ms}
+                                 for name, (count, total, max_ms) in sorted(sections.items())}
+            stats = {
+                "sections": {name: section.stats()
+                             for name, section in sorted(self.sections.items())},
+                "levels": levels,
+            }
+        stats["display"] = {
+            "frames": self.frames,
+            "updates": self.updates,
+            "pixels_pushed": self.pixels_pushed,
+            "pixels_per_frame": self.pixels_pushed / self.frames if self.frames else 0.0,
+        }
+        stats.update(self.extra)
+        return stats
+
+    def export(self, path):
+        """
+        Write the statistics to path, as CSV if it ends with .csv, else JSON
+        """
+        stats = self.stats()
+        if not path.lower().endswith(".csv"):
+            with open(path, "w", encoding="utf-8") as file:
+                json.dump(stats, file, indent=1)
+            return
+
+        columns = ["count", "mean_ms", "max_ms"] + ["p%d_ms" % p for p in PERCENTILES]
+        with open(path, "w", newline="", encoding="utf-8") as file:
+            writer = csv.writer(file)
+            writer.writerow(["level", "section"] + columns)
+            for name, section in stats["sections"].items():
+                writer.writerow(["all", name] + [section[column] for column in columns])
+            for level, sections in stats["levels"].items():
+                for name, section in sections.items():
+                    writer.writerow([level, name] + [section.get(column, "") for column in columns])
+
+            writer.writerow([])
+            writer.writerow(["statistic", "value"])
+            for name, value in stats.items():
+                if name not in ("sections", "levels"):
+                    writer.writerows(flatten(name, value))
@@ -0,0 +1,160 @@
+"""
+Rendering helpers: dirty rectangle tracking and the cached grid surfaces.
+
+Drawing code reports the areas of the screen it changed, and at the end of
+the frame only those areas are pushed with pygame.display.update(rects).
+A full flip is only done when the whole screen was redrawn.
+"""
+import collections
+
+import pygame
+
+
+class DirtyRects:
+    """
+    Collect the damaged areas of the display and push them once per frame
+    """
+
+    def __init__(self):
+        self.rects = []
+        self.full = False
+
+        # Pixels sent to the display by the last present() and in total
+        self.pixels_pushed = 0
+        self.total_pixels_pushed = 0
+        self.updates = 0
+
+    def __bool__(self):
+        return self.full or bool(self.rects)
+
+    def add(self, rect):
+        """
+        Mark an area of the screen as changed
+        """
+        if not self.full:
+            self.rects.append(pygame.Rect(rect))
+
+    def add_all(self):
+        """
+        Mark the whole screen as changed
+        """
+        self.full = True
+        self.rects.clear()
+
+    def present(self):
+        """
+        Push the damaged areas to the display
+        """
+        screen = pygame.display.get_surface()
+        screen_rect = screen.get_rect()
+
+        if self.full:
+            pygame.display.flip()
+            pixels = screen_rect.width * screen_rect.height
+        elif self.rects:
+            rects = merge_rects([rect.clip(screen_rect) for rect in self.rects])
+            pygame.display.update(rects)
+            pixels = sum(rect.width * rect.height for rect in rects)
+        else:
+            pixels = 0
+
+        if pixels:
+            self.updates += 1
+        self.pixels_pushed = pixels
+        self.total_pixels_pushed += pixels
+        self.rects.clear()
+        self.full = False
+        return pixels
+
+
+def merge_rects(rects):
+    """
+    Merge the overlapping rectangles so that no pixel is pushed twice
+    """
+    merged = []
+    for rect in rects:
+        if not rect.width or not rect.height:
+            continue
+        i = rect.collidelist(merged)
+        while i != -1:
+            rect = rect.union(merged.pop(i))
+            i = rect.collidelist(merged)
+        merged.append(rect)
+    return merged
+
+
+class GridRenderer:
+    """
+    Draw the grid from a pre-rendered surface of the empty grid, cached per
+    grid geometry, instead of drawing every square one by one
+    """
+
+    def __init__(self, background, square_color, flash_color, maxsize=4):
+        self.background = background
+        self.square_color = square_color
+        self.flash_color = flash_color
+        self.maxsize = maxsize
+        self._grids = collections.OrderedDict()     # geometry key -> (surface, bounds, square)
+
+    def _get(self, geometry):
+        cached = self._grids.get(geometry.key)
+        if cached is not None:
+            self._grids.move_to_end(geometry.key)
+            return cached
+
+        bounds = geometry.bounds()
+        grid = pygame.Surface(bounds.size)
+        grid.fill(self.background)
+        for x, y, rect in geometry.cells():
+            pygame.draw.rect(grid, self.square_color, rect.move(-bounds.x, -bounds.y))
+        grid = grid.convert()
+
+        square = pygame.Surface(geometry.cell_rect(0, 0).size)
+        square.fill(self.flash_color)
+        square = square.convert()
+
+        cached = self._grids[geometry.key] = (grid, bounds, square)
+        if len(self._grids) > self.maxsize:
+            self._grids.popitem(last=False)
+        return cached
+
+    def draw_empty(self, surface, geometry):
+        """
+        Draw the grid with only empty squares, and return the area drawn
+        """
+        grid, bounds, _ = self._get(geometry)
+        return surface.blit(grid, bounds)
+
+    def draw_flash(self, surface, geometry, cells):
+        """
+        Draw the grid with the (x, y) squares of cells flashing, and return
+        the area drawn
+        """
+        grid, bounds, square = self._get(geometry)
+        surface.blit(grid, bounds)
+        blit_batch(surface, [(square, geometry.cell_rect(x, y)) for x, y in cells])
+        return bounds
+
+    def render_flash(self, geometry, cells):
+        """
+        Return a new surface of the grid with the (x, y) squares of cells
+        flashing, to blit at geometry.bounds()
+        """
+        grid, bounds, square = self._get(geometry)
+        surface = grid.copy()
+        blit_batch(surface, [(square, geometry.cell_rect(x, y).move(-bounds.x, -bounds.y))
+                             for x, y in cells])
+        return surface
+
+    def clear(self):
+        self._grids.clear()
+
+
+def blit_batch(surface, blits):
+    """
+    Blit a sequence of (source, destination) pairs in a single call
+    """
+    if hasattr(surface, "fblits"):      # pygame-ce
+        surface.fblits(blits)
+    else:
+        surface.blits(blits, False)
@@ -0,0 +1,145 @@
+"""
+Recording and replay of the input of a session, to get repeatable runs.
+
+A recording is a line-delimited JSON file. The first line is a header with
+the seed of the flashing squares and the settings of the session, then each
+line is an input event with its time in milliseconds since the start:
+
+    {"version": 1, "seed": 1234, "settings": {"width": 900, "delay": 1000, ...}}
+    {"t": 1840.113, "type": "MOUSEBUTTONDOWN", "pos": [450, 365], "button": 1}
+    {"t": 2512.9, "type": "KEYDOWN", "key": 1073741906, "mod": 0}
+
+The Replayer feeds the events back through the FrameLoop in place of the
+pygame event queue, at the recorded speed or as fast as possible. Its clock
+follows the recording, so the timed phases of the game (flash delay,
+pauses) expire at the same point of the input as when it was recorded.
+"""
+import json
+import time
+
+import pygame
+
+VERSION = 1
+TIMEOUT_SLACK = 0.001   # Milliseconds added to the timeouts in fast mode, see events_for()
+
+# Event types recorded, with the attributes the scenes use
+RECORDED = {
+    pygame.MOUSEBUTTONDOWN: ("pos", "button"),
+    pygame.KEYDOWN: ("key", "mod"),
+    pygame.VIDEORESIZE: ("w", "h"),
+    pygame.QUIT: (),
+}
+
+
+class Recorder:
+    """
+    Write the input events of a session to a file, as they are processed
+    """
+
+    def __init__(self, path, seed, settings, clock=time.monotonic):
+        self.clock = clock
+        self.start = clock()
+        self.events = 0
+        self.file = open(path, "w", encoding="utf-8")
+        self._write({"version": VERSION, "seed": seed, "settings": settings})
+
+    def record(self, loop, events):
+        """
+        FrameLoop.on_events hook
+        """
+        t = round((self.clock() - self.start) * 1000, 3)
+        for event in events:
+            attributes = RECORDED.get(event.type)
+            if attributes is not None:
+                line = {"t": t, "type": pygame.event.event_name(event.type).upper()}
+                for name in attributes:
+                    line[name] = getattr(event, name)
+                self._write(line)
+                self.events += 1
+
+    def _write(self, line):
+        self.file.write(json.dumps(line, separators=(",", ":")) + "\n")
+
+    def close(self):
+        self.file.close()
+
+
+class Replayer:
+    """
+    Event source of a FrameLoop that returns the events of a recording at
+    their recorded time. The game must time its phases with clock().
+    """
+
+    def __init__(self, path, fast=False):
+        self.fast = fast
+        with open(path, encoding="utf-8") as file:
+            header = json.loads(file.readline())
+            if header.get("version") != VERSION:
+                raise ValueError("%s: unsupported recording version %r"
+                                 % (path, header.get("version")))
+            self.seed = header["seed"]
+            self.settings = header["settings"]
+            self.events = [self._event(json.loads(line)) for line in file if line.strip()]
+        self.position = 0
+
+        self._now = 0.0     # Virtual time in fast mode, in milliseconds
+        self._start = time.monotonic()
+
+    @staticmethod
+    def _event(line):
+        attributes = {name: value for name, value in line.items() if name not in ("t", "type")}
+        if "pos" in attributes:
+            attributes["pos"] = tuple(attributes["pos"])
+        return line["t"], pygame.event.Event(getattr(pygame, line["type"]), attributes)
+
+    def now(self):
+        """
+        Milliseconds since the start of the replay
+        """
+        if self.fast:
+            return self._now
+        return (time.monotonic() - self._start) * 1000
+
+    def clock(self):
+        """
+        Time of the replay in seconds, to use in place of time.monotonic
+        """
+        return self.now() / 1000
+
+    @property
+    def done(self):
+        return self.position >= len(self.events)
+
+    def events_for(self, loop, timeout):
+        """
+        Return the recorded events due now, waiting like FrameLoop.events()
+        """
+        # Keep the window responsive and closable, other real input is ignored
+        closed = pygame.event.get(pygame.QUIT)
+        pygame.event.clear()
+        if closed:
+            return closed
+        if self.done:
+            return [pygame.event.Event(pygame.QUIT)]    # The recording ended without quitting
+
+        next_t = self.events[self.position][0]
+        if not loop.dirty:
+            # Nothing to show, wait for the next event or the timeout
+            wake_t = next_t if timeout is None else min(next_t, self.now() + timeout)
+            if self.fast:
+                # Go a little past the timeout, so that a deadline computed
+                # with rounding errors has really expired
+                if wake_t < next_t:
+                    wake_t = min(next_t, wake_t + TIMEOUT_SLACK)
+                self._now = max(self._now, wake_t)
+            else:
+                delay = wake_t - self.now()
+                if delay > 0:
+                    time.sleep(delay / 1000)
+
+        events = []
+        now = self.now()
+        while not self.done and self.events[self.position][0] <= now:
+            events.append(self.events[self.position][1])
+            self.position += 1
+        return events
@@ -0,0 +1,122 @@
+"""
+Flat scene driver for the game screens.
+
+Each screen (menu, settings, game, end screen) is a Scene. Screens never call
+each other: they ask the SceneMachine to switch to another scene, and the
+switch happens once the current frame is done. Going from one screen to the
+next therefore never adds stack frames, however long the session lasts.
+"""
+import pygame
+
+
+class Scene:
+    """
+    A screen of the game. enter() is called each time the scene becomes the
+    current one, then every frame handle_event() is called for each event,
+    followed by update() and render().
+    """
+
+    machine = None      # Set by SceneMachine.add()
+
+    def enter(self):
+        pass
+
+    def exit(self):
+        pass
+
+    def handle_event(self, event):
+        pass
+
+    def update(self):
+        pass
+
+    def render(self):
+        pass
+
+    def redraw(self):
+        """
+        Draw the whole scene again, e.g. after the screen was resized. The
+        scene is entered again unless it overrides this.
+        """
+        self.enter()
+
+    def timeout(self):
+        """
+        Milliseconds until the scene needs update() to be called even if no
+        event arrives, or None to wait for the next event
+        """
+        return None
+
+
+class SceneMachine:
+    """
+    Run one scene at a time and switch between scenes without recursion
+    """
+
+    def __init__(self, loop):
+        self.loop = loop
+        self.scenes = {}
+        self.current = None
+        self.current_name = None
+        self.running = False
+        self.transitions = 0
+        self._next = None
+
+    def add(self, name, scene):
+        scene.machine = self
+        self.scenes[name] = scene
+
+    def switch(self, name):
+        """
+        Make name the current scene at the end of the frame
+        """
+        if name not in self.scenes:
+            raise KeyError("unknown scene: " + name)
+        self._next = name
+
+    def stop(self):
+        self.running = False
+
+    def step(self, events):
+        """
+        Run one frame of the current scene, then apply a pending switch
+        """
+        # Checked first, a switch drops the events after it and SDL only
+        # sends the close of the window once
+        if any(event.type == pygame.QUIT for event in events):
+            self.stop()
+            return
+        for event in events:
+            self.current.handle_event(event)
+            if self._next is not None:
+                break       # The remaining events belonged to this scene
+        else:
+            self.current.update()
+
+        if self._next is None:
+            self.current.render()
+        else:
+            self._enter_next()
+
+    def _enter_next(self):
+        while self._next is not None:
+            name, self._next = self._next, None
+            if self.current is not None:
+                self.current.exit()
+            self.current = self.scenes[name]
+            self.current_name = name
+            self.transitions += 1
+            self.current.enter()
+
+    def run(self, initial):
+        """
+        Run scenes from initial until stop() is called or the window is closed
+        """
+        self.running = True
+        self.switch(initial)
+        self._enter_next()
+
+        while self.running:
+            self.step(self.loop.events(self.current.timeout()))
+            self.loop.present()
+        self.current.exit()     # Stop what the scene runs in the background
@@ -0,0 +1,283 @@
+"""
+Session server: the game played from browser kiosks over WebSocket.
+
+One asyncio process hosts many sessions. Each WebSocket connection is a
+session with a Game of its own, so the rules are the ones of the pygame
+front end, and the clicks are checked by the server. The client is sent
+the board and the timing of every level, draws them, and sends the clicks
+back; they only count once the flashing squares were hidden.
+
+Messages are JSON text:
+
+    client: {"type": "start", "settings": {"starting_level": 1, "delay": 1000,
+                                           "initial_lives": 3, "allowed_mistakes": 2}}
+    server: {"type": "level", "level": 1, "lives": 3, "grid_size": 3,
+             "flash": [[0, 2], [1, 1], [2, 0]], "show_ms": 1500, "flash_ms": 1000}
+    client: {"type": "click", "x": 0, "y": 2}
+    server: {"type": "click", "x": 0, "y": 2, "state": "found", "result": null}
+    server: {"type": "over", "level": 4}
+    server: {"type": "error", "error": "click before the recall phase"}
+
+A level message means: show the empty grid for show_ms, then the flashing
+squares for flash_ms, then take the clicks. The click deciding a level is
+followed by the next level at once, whose show_ms includes the pause on the
+last click. "start" begins a new game at any time; settings left out take
+their default value.
+
+GET /stats returns the counters of the server as JSON. The server only
+listens on the loopback interface unless --host says otherwise:
+
+    python server.py --port 8765
+"""
+import argparse
+import asyncio
+import collections
+import json
+import statistics
+import sys
+import time
+
+import game_core
+import websocket
+from board import Board, FOUND, MISSED
+from game_core import Game
+
+HOST = "127.0.0.1"
+PORT = 8765
+LATENCY_WINDOW = 100000     # Click handling times kept for the percentiles
+
+STATE_NAMES = {FOUND: "found", MISSED: "missed"}
+
+
+class ClientError(Exception):
+    """
+    Invalid message from a client, answered with an error message
+    """
+
+
+def parse_settings(settings):
+    """
+    Settings of a start message, with the defaults for the missing ones
+    """
+    if not isinstance(settings, dict):
+        raise ClientError("settings must be an object")
+    parsed = {}
+    for name, (default, low, high) in game_core.SETTINGS.items():
+        value = settings.get(name, default)
+        if type(value) is not int or not low <= value <= high:
+            raise ClientError("%s must be an integer from %d to %d" % (name, low, high))
+        parsed[name] = value
+    return parsed
+
+
+class Session:
+    """
+    Game of one client, with the timing of its current level
+    """
+
+    def __init__(self, settings, rng=None, clock=time.monotonic):
+        self.game = Game(settings["starting_level"], settings["initial_lives"],
+                         settings["allowed_mistakes"], rng=rng, board=Board(use_numpy=False))
+        self.delay = settings["delay"]
+        self.clock = clock
+        self.recall_start = None    # When the clicks start to count
+
+    def start_level(self, show_ms=game_core.LEVEL_INTRO_DELAY):
+        """
+        Start the current level of the game and return its level message
+        """
+        game = self.game
+        game.start_level()
+        self.recall_start = self.clock() + (show_ms + self.delay) / 1000
+        return {"type": "level", "level": game.level, "lives": game.lives,
+                "grid_size": game.grid_size, "flash": game.board.flashed_cells(),
+                "show_ms": show_ms, "flash_ms": self.delay}
+
+    def click(self, x, y):
+        """
+        Apply a click of the client, and return the messages answering it
+        """
+        game = self.game
+        if game.over:
+            raise ClientError("the game is over")
+        if self.clock() < self.recall_start:
+            raise ClientError("click before the recall phase")
+        if type(x) is not int or type(y) is not int or not (0 <= x < game.grid_size
+                                                             and 0 <= y < game.grid_size):
+            raise ClientError("no such square")
+
+        state = game.click(x, y)
+        replies = [{"type": "click", "x": x, "y": y,
+                    "state": STATE_NAMES.get(state), "result": game.result}]
+        if game.result is not None:
+            game.end_level()
+            if game.over:
+                replies.append({"type": "over", "level": game.level})
+            else:
+                replies.append(self.start_level(game_core.LEVEL_END_DELAY
+                                                + game_core.LEVEL_INTRO_DELAY))
+        return replies
+
+
+class SessionServer:
+    """
+    Accept the connections and run one session per WebSocket
+    """
+
+    def __init__(self):
+        self.sessions = 0           # Open sessions
+        self.total_sessions = 0
+        self.games = 0
+        self.clicks = 0
+        self.errors = 0
+        self.click_ms = collections.deque(maxlen=LATENCY_WINDOW)    # Time to validate a click
+        self.started = time.monotonic()
+
+    async def handle(self, reader, writer):
+        """
+        asyncio.start_server() callback: route the request of a connection
+        """
+        try:
+            request, headers = await websocket.read_head(reader)
+            method, path, _ = (request.split(" ") + ["", ""])[:3]
+            if method == "GET" and path == "/stats":
+                self._respond(writer, "200 OK", json.dumps(self.stats()), "application/json")
+            elif method == "GET" and path in ("/", "/ws"):
+                try:
+                    response = websocket.server_handshake(headers)
+                except websocket.ProtocolError as error:
+                    self._respond(writer, "400 Bad Request", str(error))
+                else:
+                    writer.write(response)
+                    await self.run_session(websocket.WebSocket(reader, writer))
+            else:
+                self._respond(writer, "404 Not Found", "not found")
+            await writer.drain()
+        except (websocket.ConnectionClosed, websocket.ProtocolError, OSError):
+            pass
+        finally:
+            writer.close()
+
+    @staticmethod
+    def _respond(writer, status, body, content_type="text/plain"):
+        body = body.encode()
+        writer.write(("HTTP/1.1 %s\r\nContent-Type: %s\r\nContent-Length: %d\r\n"
+                      "Connection: close\r\n\r\n" % (status, content_type, len(body))).encode()
+                     + body)
+
+    async def run_session(self, ws):
+        """
+        Answer the messages of a client until it disconnects
+        """
+        self.sessions += 1
+        self.total_sessions += 1
+        session = None
+        try:
+            while True:
+                message = await ws.recv()
+                start = time.perf_counter()
+                kind = None
+                try:
+                    try:
+                        data = json.loads(message)
+                        kind = data["type"]
+                    except (ValueError, TypeError, KeyError):
+                        raise ClientError("invalid message") from None
+
+                    if kind == "start":
+                        session = Session(parse_settings(data.get("settings", {})))
+                        self.games += 1
+                        replies = [session.start_level()]
+                    elif kind == "click":
+                        if session is None:
+                            raise ClientError("no game started")
+                        replies = session.click(data.get("x"), data.get("y"))
+                        self.clicks += 1
+                    else:
+                        raise ClientError("unknown message type")
+                except ClientError as error:
+                    self.errors += 1
+                    replies = [{"type": "error", "error": str(error)}]
+
+                for reply in replies:
+                    ws.send(json.dumps(reply, separators=(",", ":")))
+                if kind == "click":
+                    self.click_ms.append((time.perf_counter() - start) * 1000)
+                await ws.drain()
+        except websocket.ConnectionClosed:
+            pass
+        finally:
+            self.sessions -= 1
+
+    def stats(self):
+        """
+        Counters of the server, with the percentiles of the time taken to
+        validate a click and answer it, and the CPU time used so far
+        """
+        stats = {
+            "sessions": self.sessions,
+            "total_sessions": self.total_sessions,
+            "games": self.games,
+            "clicks": self.clicks,
+            "errors": self.errors,
+            "uptime_s": time.monotonic() - self.started,
+            "cpu_s": time.process_time(),
+        }
+        if len(self.click_ms) > 1:
+            quantiles = statistics.quantiles(self.click_ms, n=100, method="inclusive")
+            stats.update(click_p50_ms=quantiles[49], click_p99_ms=quantiles[98],
+                         click_max_ms=max(self.click_ms))
+        return stats
+
+
+def raise_open_files_limit():
+    """
+    Each session holds a socket: allow as many as the system lets us
+    """
+    try:
+        import resource
+    except ImportError:     # Not on Unix
+        return
+    soft, hard = resource.getrlimit(resource.RLIMIT_NOFILE)
+    if hard == resource.RLIM_INFINITY or soft < hard:
+        try:
+            resource.setrlimit(resource.RLIMIT_NOFILE, (hard, hard))
+        except (ValueError, OSError):
+            pass
+
+
+async def serve(host=HOST, port=PORT, backlog=1024, ready=None):
+    """
+    Run a SessionServer until cancelled. ready(port) is called once it
+    listens.
+    """
+    server = SessionServer()
+    listener = await asyncio.start_server(server.handle, host, port, backlog=backlog)
+    if ready is not None:
+        ready(listener.sockets[0].getsockname()[1])
+    async with listener:
+        await listener.serve_forever()
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--host", default=HOST,
+                        help="interface to listen on (default: loopback only)")
+    parser.add_argument("--port", type=int, default=PORT, help="0 picks a free port")
+    parser.add_argument("--backlog", type=int, default=1024)
+    args = parser.parse_args(argv)
+
+    raise_open_files_limit()
+
+    def ready(port):
+        print("listening on %s:%d" % (args.host, port), flush=True)
+
+    try:
+        asyncio.run(serve(args.host, args.port, args.backlog, ready))
+    except KeyboardInterrupt:
+        pass
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,206 @@
+"""
+Batch simulation of bot players, to evaluate the game settings.
+
+Each simulated player plays whole games with the rules of game_core until
+they run out of lives, and the level they reach is recorded. Players are
+split in fixed-size chunks spread across a process pool. Every chunk has
+its own seed derived from --seed, so the results only depend on the seed
+and not on the number of workers.
+
+Memory model of a player:
+- --capacity k: remembers at most k of the flashed squares (default: all)
+- --encode-rate r: memorizes at most r squares per second of flash, so a
+  shorter --delay means fewer remembered squares (default: no limit)
+- --error-rate p: each remembered square is misclicked with probability p
+Squares that are not remembered are guessed among the unclicked squares.
+
+Example:
+
+    python simulate.py --players 100000 --capacity 7 --error-rate 0.02 --delay 800
+"""
+import argparse
+import collections
+import concurrent.futures
+import json
+import os
+import random
+import statistics
+import sys
+import time
+
+import game_core
+from board import Board, EMPTY, TARGET
+from game_core import Game
+
+MAX_LEVEL = 200
+
+
+class BotPlayer:
+    """
+    Player that recalls the flashed squares according to a memory model
+    """
+
+    def __init__(self, capacity=None, error_rate=0.0, encode_rate=None, delay=game_core.DELAY):
+        self.capacity = capacity
+        self.error_rate = error_rate
+        if encode_rate is not None:
+            encoded = int(encode_rate * delay / 1000)
+            self.capacity = encoded if capacity is None else min(capacity, encoded)
+
+    def play_level(self, game, rng):
+        """
+        Click squares until the level is decided
+        """
+        board = game.board
+        flashed = board.flashed_cells()
+        if self.capacity is not None and self.capacity < len(flashed):
+            remembered = rng.sample(flashed, self.capacity)
+        else:
+            remembered = flashed
+
+        for x, y in remembered:
+            if self.error_rate and rng.random() < self.error_rate:
+                x, y = self.random_unclicked(board, rng, EMPTY)
+            game.click(x, y)
+            if game.result is not None:
+                return
+
+        # Guess the squares that were not remembered
+        while game.result is None:
+            game.click(*self.random_unclicked(board, rng))
+
+    @staticmethod
+    def random_unclicked(board, rng, state=None):
+        """
+        Random square that was not clicked yet, only among squares in state
+        if given
+        """
+        size = board.size
+        cells = board.cells
+        candidates = None
+        if state is not None:
+            candidates = [cell for cell in range(size * size) if cells[cell] == state]
+        if not candidates:
+            candidates = [cell for cell in range(size * size) if cells[cell] in (EMPTY, TARGET)]
+        return divmod(rng.choice(candidates), size)
+
+
+def simulate_chunk(chunk, players, seed, settings, model, max_level):
+    """
+    Simulate players in a worker and return (levels reached, rounds played)
+    """
+    rng = random.Random(f"{seed}/{chunk}")
+    game = Game(settings["starting_level"], settings["initial_lives"],
+                settings["allowed_mistakes"], rng=rng, board=Board(use_numpy=False))
+    player = BotPlayer(delay=settings["delay"], **model)
+
+    levels = collections.Counter()
+    rounds = 0
+    for _ in range(players):
+        game.new_game()
+        while not game.over and game.level < max_level:
+            game.start_level()
+            player.play_level(game, rng)
+            game.end_level()
+            rounds += 1
+        levels[game.level] += 1
+    return levels, rounds
+
+
+def simulate(players, settings, model, seed=0, workers=None, chunk_size=1000,
+             max_level=MAX_LEVEL):
+    """
+    Simulate players across a process pool and return the distribution of
+    the levels reached and the number of rounds played
+    """
+    chunks = [chunk_size] * (players // chunk_size)
+    if players % chunk_size:
+        chunks.append(players % chunk_size)
+
+    levels = collections.Counter()
+    rounds = 0
+    with concurrent.futures.ProcessPoolExecutor(max_workers=workers) as pool:
+        futures = [pool.submit(simulate_chunk, chunk, count, seed, settings, model, max_level)
+                   for chunk, count in enumerate(chunks)]
+        for future in futures:
+            chunk_levels, chunk_rounds = future.result()
+            levels.update(chunk_levels)
+            rounds += chunk_rounds
+    return levels, rounds
+
+
+def summarize(levels):
+    reached = sorted(levels.elements())
+    quartiles = statistics.quantiles(reached, n=4) if len(reached) > 1 else reached * 3
+    return {
+        "players": len(reached),
+        "mean": statistics.fmean(reached),
+        "median": statistics.median(reached),
+        "p25": quartiles[0],
+        "p75": quartiles[2],
+        "max": reached[-1],
+        "distribution": {level: levels[level] for level in sorted(levels)},
+    }
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--players", type=int, default=10000)
+    parser.add_argument("--workers", type=int, default=None,
+                        help="number of processes (default: one per core)")
+    parser.add_argument("--chunk-size", type=int, default=1000)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--max-level", type=int, default=MAX_LEVEL,
+                        help="stop a game once this level is reached")
+
+    parser.add_argument("--delay", type=int, default=game_core.DELAY)
+    parser.add_argument("--starting-level", type=int, default=game_core.STARTING_LEVEL)
+    parser.add_argument("--initial-lives", type=int, default=game_core.INITIAL_LIVES)
+    parser.add_argument("--allowed-mistakes", type=int, default=game_core.ALLOWED_MISTAKES)
+
+    parser.add_argument("--capacity", type=int, default=None)
+    parser.add_argument("--encode-rate", type=float, default=None)
+    parser.add_argument("--error-rate", type=float, default=0.0)
+    parser.add_argument("--json", action="store_true", help="print the results as JSON")
+    args = parser.parse_args(argv)
+
+    settings = {
+        "delay": args.delay,
+        "starting_level": args.starting_level,
+        "initial_lives": args.initial_lives,
+        "allowed_mistakes": args.allowed_mistakes,
+    }
+    model = {
+        "capacity": args.capacity,
+        "encode_rate": args.encode_rate,
+        "error_rate": args.error_rate,
+    }
+
+    start = time.perf_counter()
+    levels, rounds = simulate(args.players, settings, model, args.seed, args.workers,
+                              args.chunk_size, args.max_level)
+    elapsed = time.perf_counter() - start
+
+    result = summarize(levels)
+    result.update(settings=settings, model=model, rounds=rounds, seconds=elapsed,
+                  workers=args.workers or os.cpu_count())
+
+    if args.json:
+        print(json.dumps(result, indent=2))
+        return 0
+
+    print("settings: " + ", ".join(f"{key}={value}" for key, value in settings.items()))
+    print("model:    " + ", ".join(f"{key}={value}" for key, value in model.items()))
+    print(f"players: {result['players']}  mean level: {result['mean']:.2f}  "
+          f"median: {result['median']}  p25-p75: {result['p25']}-{result['p75']}  max: {result['max']}")
+    width = max(result["distribution"].values())
+    for level, count in result["distribution"].items():
+        bar = "#" * max(1, round(40 * count / width))
+        print(f"  level {level:>4}: {count:>8}  {bar}")
+    print(f"{rounds} rounds in {elapsed:.2f} s ({rounds / elapsed * 60:,.0f} rounds/min, "
+          f"{result['workers']} workers)")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
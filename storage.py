@@ -0,0 +1,149 @@
+"""
+Persistent store of the game settings and of the score history of each
+player, kept in a JSON file.
+
+Changes are made in memory and written by a background thread, so the
+render thread never waits for the disk. Writes are coalesced: the file is
+written once changes stop for WRITE_DELAY seconds (holding an arrow key in
+the settings gives a single write), and at the latest MAX_WRITE_DELAY
+seconds after the first unsaved change. Each write goes to a temporary file
+that replaces the store with os.replace(), so a crash leaves either the old
+or the new file, never a partial one.
+"""
+import glob
+import json
+import os
+import sys
+import tempfile
+import threading
+
+from writer import BackgroundWriter
+
+STORE_FILE = "visual_memory_data.json"
+WRITE_DELAY = 0.5
+MAX_WRITE_DELAY = 5.0
+SCORE_HISTORY = 1000    # Scores kept per player
+
+
+class Store:
+    """
+    Settings and score history saved to path by a background writer
+    """
+
+    def __init__(self, path=STORE_FILE, delay=WRITE_DELAY, max_delay=MAX_WRITE_DELAY):
+        self.path = path
+        self.data = {"settings": {}, "scores": {}}
+        self.writes = 0
+
+        self._lock = threading.Lock()
+        self._writer = BackgroundWriter(self._lock, self._snapshot, self._save, delay, max_delay,
+                                        name="store-writer")
+
+        self.remove_temp_files()
+        self.load()
+
+    def remove_temp_files(self):
+        """
+        Delete the temporary files left by a process killed while writing
+        """
+        for path in glob.glob(self._temp_prefix() + "*.tmp"):
+            try:
+                os.unlink(path)
+            except OSError:
+                pass
+
+    def load(self):
+        """
+        Read the store file. A missing file is an empty store, an unreadable
+        one is reported and replaced on the next write.
+        """
+        try:
+            with open(self.path, encoding="utf-8") as file:
+                data = json.load(file)
+            settings = dict(data["settings"])
+            scores = {player: list(history) for player, history in data["scores"].items()}
+        except FileNotFoundError:
+            return
+        except (OSError, ValueError, KeyError, TypeError, AttributeError) as error:
+            print("cannot read %s, starting from an empty store: %s" % (self.path, error),
+                  file=sys.stderr)
+            return
+        with self._lock:
+            self.data = {"settings": settings, "scores": scores}
+
+    def settings(self):
+        with self._lock:
+            return dict(self.data["settings"])
+
+    def update_settings(self, settings):
+        """
+        Save the values of the settings dict, if any of them changed
+        """
+        with self._lock:
+            stored = self.data["settings"]
+            if any(stored.get(name) != value for name, value in settings.items()):
+                stored.update(settings)
+                self._writer.changed()
+
+    def add_score(self, player, score):
+        """
+        Append the score dict of a finished game to the history of player
+        """
+        with self._lock:
+            history = self.data["scores"].setdefault(player, [])
+            history.append(score)
+            del history[:-SCORE_HISTORY]
+            self._writer.changed()
+
+    def scores(self, player):
+        with self._lock:
+            return list(self.data["scores"].get(player, ()))
+
+    def best_level(self, player):
+        """
+        Highest level reached by player, None if they never played
+        """
+        with self._lock:
+            return max((score["level"] for score in self.data["scores"].get(player, ())),
+                       default=None)
+
+    def close(self):
+        """
+        Write the pending changes now and stop the writer
+        """
+        self._writer.close()
+
+    def _snapshot(self):
+        # Called by the writer with the lock held
+        return json.dumps(self.data, indent=1)
+
+    def _save(self, text):
+        try:
+            self._write(text)
+        except OSError as error:
+            # Keep going, the next change writes everything again
+            print("cannot write %s: %s" % (self.path, error), file=sys.stderr)
+
+    def _write(self, text):
+        """
+        Replace the store file atomically with text
+        """
+        directory, prefix = os.path.split(self._temp_prefix())
+        fd, temp_path = tempfile.mkstemp(prefix=prefix, suffix=".tmp", dir=directory)
+        try:
+            with os.fdopen(fd, "w", encoding="utf-8") as file:
+                file.write(text)
+                file.flush()
+                os.fsync(file.fileno())
+            os.replace(temp_path, self.path)
+        except BaseException:
+            try:
+                os.unlink(temp_path)
+            except OSError:
+                pass
+            raise
+        self.writes += 1
+
+    def _temp_prefix(self):
+        directory, name = os.path.split(os.path.abspath(self.path))
+        return os.path.join(directory, "." + name + ".")
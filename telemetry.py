@@ -0,0 +1,298 @@
+"""
+Telemetry of the games played: an append-only binary log of every flashed
+square, click and level outcome, read back as NumPy arrays.
+
+A log file is a 16-byte header followed by fixed-width little-endian
+records of RECORD_SIZE bytes, one per event, with the fields of FIELDS.
+Nothing is parsed to read it back: open_log() maps a file as a NumPy
+structured array, whose columns (log["level"], log["hit"], ...) are views
+of the file, and load() puts the files of a day, or of a directory, in one
+array. read_chunks() reads a file a chunk at a time instead, for the
+logs larger than the memory.
+
+The game appends the records with TelemetryLog: record() packs them in
+memory, and a background thread writes them to the file every
+FLUSH_INTERVAL seconds, or as soon as FLUSH_SIZE bytes are waiting, so the
+render thread never waits for the disk. The file name is a strftime()
+pattern, telemetry/%Y-%m-%d.vmlog gives a file per day of writing. A
+process killed while writing can leave a partial record at the end of a
+file: readers ignore it, and the next writer cuts it off before appending.
+"""
+import glob
+import os
+import struct
+import sys
+import threading
+import time
+
+try:
+    import numpy
+except ImportError:
+    numpy = None
+
+from board import FOUND
+from writer import BackgroundWriter
+
+TELEMETRY_FILE = "telemetry/%Y-%m-%d.vmlog"
+EXTENSION = ".vmlog"
+FLUSH_INTERVAL = 2.0
+FLUSH_SIZE = 64 * 1024
+
+MAGIC = b"VMEMLOG\0"
+VERSION = 2     # 2 added the FLASH records
+
+# Record kinds
+CLICK = 0       # A click on a square of the grid
+LEVEL = 1       # The end of a level, won or lost
+QUIT = 2        # The player left the game with escape
+FLASH = 3       # A square that flashed, recorded when the squares are shown
+
+# Record fields, as struct codes, largest first so that they are aligned
+FIELDS = (
+    ("time", "d"),              # Unix time of the event, in seconds
+    ("game", "Q"),              # Random id of the game
+    ("since_flash_ms", "f"),    # Time since the flashing squares were hidden
+    ("level", "H"),
+    ("starting_level", "H"),
+    ("grid_size", "H"),
+    ("flash_count", "H"),       # Squares that flashed in the level
+    ("delay", "H"),             # Time the squares flashed, in milliseconds
+    ("x", "h"),                 # Clicked or flashed square, -1 in the other records
+    ("y", "h"),
+    ("kind", "B"),              # CLICK, LEVEL, QUIT or FLASH
+    ("hit", "b"),               # Click on a flashed square, level won
+    ("lives", "B"),             # Lives left, after the outcome of a level
+    ("mistakes_left", "b"),     # Mistakes still allowed in the level, -1 once lost
+    ("allowed_mistakes", "B"),
+    ("initial_lives", "B"),
+)
+HEADER = struct.Struct("<8sHH4x")
+RECORD = struct.Struct("<" + "".join(code for _, code in FIELDS))
+RECORD_SIZE = RECORD.size
+
+
+def record_dtype():
+    """
+    NumPy dtype of a record
+    """
+    if numpy is None:
+        raise ImportError("reading telemetry logs needs NumPy")
+    return numpy.dtype([(name, "<" + code) for name, code in FIELDS])
+
+
+class TelemetryLog:
+    """
+    Append the records of the games to a log written by a background thread
+    """
+
+    def __init__(self, path=TELEMETRY_FILE, flush_interval=FLUSH_INTERVAL, flush_size=FLUSH_SIZE):
+        self.path = path    # strftime() pattern of the file name
+        self.flush_size = flush_size
+        self.records = 0    # Records written to the file
+        self.dropped = 0    # Records lost to a disk error
+        self.flushes = 0
+
+        self._game = 0
+        self._delay = 0
+        self._lock = threading.Lock()
+        self._pending = []      # Packed records waiting to be written
+        self._writer = BackgroundWriter(self._lock, self._take, self._write_batch, None,
+                                        flush_interval, name="telemetry-writer")
+        self._file = None
+        self._file_path = None
+
+    def new_game(self, delay):
+        """
+        Give the records of the game that starts an id of their own
+        """
+        self._game = int.from_bytes(os.urandom(8), "little")
+        self._delay = delay
+
+    def flash(self, game):
+        """
+        Record the squares of the board of game, as they start flashing
+        """
+        records = [self._pack(FLASH, game, x, y, False, game.lives, 0.0)
+                   for x, y in game.board.flashed_cells()]
+        self._queue([data for data in records if data is not None])
+
+    def click(self, game, x, y, state, since_flash_ms):
+        """
+        Record a click on square (x, y), whose new state is state
+        """
+        self.record(CLICK, game, x, y, state == FOUND, game.lives, since_flash_ms)
+
+    def level_end(self, game, since_flash_ms):
+        """
+        Record the outcome of the level of game, decided but not applied
+        yet by game.end_level(), with the lives left after it
+        """
+        won = bool(game.result)
+        self.record(LEVEL, game, -1, -1, won, game.lives - (not won), since_flash_ms)
+
+    def quit(self, game, since_flash_ms):
+        self.record(QUIT, game, -1, -1, False, game.lives, since_flash_ms)
+
+    def record(self, kind, game, x, y, hit, lives, since_flash_ms):
+        """
+        Queue a record of the current state of game
+        """
+        data = self._pack(kind, game, x, y, hit, lives, since_flash_ms)
+        if data is not None:
+            self._queue([data])
+
+    def _pack(self, kind, game, x, y, hit, lives, since_flash_ms):
+        try:
+            return RECORD.pack(
+                time.time(), self._game, since_flash_ms, game.level, game.starting_level,
+                game.grid_size, game.num_flash_squares, self._delay, x, y, kind, hit,
+                lives, game.allowed_mistakes - game.mistakes, game.allowed_mistakes,
+                game.initial_lives)
+        except struct.error:    # A setting out of the range of its field
+            self.dropped += 1
+            return None
+
+    def _queue(self, records):
+        if not records:
+            return
+        with self._lock:
+            self._pending.extend(records)
+            self._writer.changed(urgent=len(self._pending) * RECORD_SIZE >= self.flush_size)
+
+    def close(self):
+        """
+        Write the pending records now and stop the writer
+        """
+        self._writer.close()
+        if self._file is not None:
+            self._file.close()
+            self._file = None
+
+    def _take(self):
+        # Called by the writer with the lock held
+        batch = self._pending
+        self._pending = []
+        return batch
+
+    def _write_batch(self, batch):
+        try:
+            self._write(b"".join(batch))
+            self.records += len(batch)
+        except (OSError, ValueError) as error:
+            self.dropped += len(batch)
+            print("cannot write telemetry to %s: %s" % (self._file_path, error),
+                  file=sys.stderr)
+            if self._file is not None:
+                self._file.close()
+                self._file = None   # Opened again on the next batch
+
+    def _write(self, data):
+        path = time.strftime(self.path)
+        if path != self._file_path or self._file is None:
+            if self._file is not None:
+                self._file.close()
+                self._file = None
+            self._file_path = path
+            self._file = open_for_append(path)
+        self._file.write(data)
+        self._file.flush()
+        self.flushes += 1
+
+
+def open_for_append(path):
+    """
+    Open the log file path to append records, writing its header if it is
+    new, and cutting off a partial record left at its end
+    """
+    directory = os.path.dirname(path)
+    if directory:
+        os.makedirs(directory, exist_ok=True)
+    file = open(path, "ab")
+    try:
+        size = file.tell()
+        if size == 0:
+            file.write(HEADER.pack(MAGIC, VERSION, RECORD_SIZE))
+        else:
+            read_header(path)
+            partial = (size - HEADER.size) % RECORD_SIZE
+            if partial:
+                file.truncate(size - partial)
+                file.seek(0, os.SEEK_END)
+    except BaseException:
+        file.close()
+        raise
+    return file
+
+
+def read_header(path):
+    """
+    Check the header of the log file path, raise ValueError if it is not a
+    log this version can read
+    """
+    with open(path, "rb") as file:
+        data = file.read(HEADER.size)
+    if len(data) < HEADER.size:
+        raise ValueError("%s: truncated telemetry header" % path)
+    magic, version, record_size = HEADER.unpack(data)
+    if magic != MAGIC:
+        raise ValueError("%s: not a telemetry log" % path)
+    if version != VERSION or record_size != RECORD_SIZE:
+        raise ValueError("%s: unsupported telemetry log version %d" % (path, version))
+
+
+def open_log(path):
+    """
+    Records of the log file path as a read-only NumPy structured array
+    mapped on the file, without its partial last record if any
+    """
+    dtype = record_dtype()
+    read_header(path)
+    count = (os.path.getsize(path) - HEADER.size) // RECORD_SIZE
+    if count == 0:
+        return numpy.zeros(0, dtype=dtype)     # memmap refuses empty maps
+    return numpy.memmap(path, dtype=dtype, mode="r", offset=HEADER.size, shape=(count,))
+
+
+def read_chunks(path, chunk):
+    """
+    Yield the records of the log file path as NumPy structured arrays of
+    chunk records at most, read one after the other: the memory used does
+    not depend on the size of the file, without its partial last record
+    """
+    dtype = record_dtype()
+    read_header(path)
+    count = (os.path.getsize(path) - HEADER.size) // RECORD_SIZE
+    with open(path, "rb") as file:
+        file.seek(HEADER.size)
+        for start in range(0, count, chunk):
+            yield numpy.fromfile(file, dtype=dtype, count=min(chunk, count - start))
+
+
+def log_files(paths):
+    """
+    Log files of paths, which can be files, directories (their *.vmlog
+    files) or glob patterns, in name order within each
+    """
+    files = []
+    for path in paths:
+        if os.path.isdir(path):
+            files.extend(sorted(glob.glob(os.path.join(path, "*" + EXTENSION))))
+        elif os.path.exists(path):
+            files.append(path)
+        else:
+            matches = sorted(glob.glob(path))
+            if not matches:
+                raise FileNotFoundError("no telemetry log matches %s" % path)
+            files.extend(matches)
+    return files
+
+
+def load(paths):
+    """
+    Records of all the log files of paths in one NumPy structured array,
+    in file order. Use open_log() on each file to map rather than read them.
+    """
+    logs = [open_log(path) for path in log_files(paths)]
+    if not logs:
+        return numpy.zeros(0, dtype=record_dtype())
+    return numpy.concatenate(logs)
@@ -0,0 +1,117 @@
+"""
+Font registry and rendered text cache shared by the screen drawing functions.
+
+Loading a font parses the TTF file and rendering a string rasterises it, so
+both are done once and reused until the text, font or colors change.
+"""
+import collections
+
+import pygame
+
+DEFAULT_FACE = "freesansbold.ttf"
+
+# Font styles. A regular font is loaded straight from its file, any other
+# style goes through pygame.font.SysFont so the bold/italic flags apply.
+REGULAR = "regular"
+BOLD = "bold"
+ITALIC = "italic"
+
+TEXT_CACHE_SIZE = 256
+
+
+class FontRegistry:
+    """
+    Keep a single pygame font object per (face, size, style)
+    """
+
+    def __init__(self):
+        self._fonts = {}
+        self.loads = 0
+
+    def get(self, face, size, style=REGULAR):
+        key = (face, size, style)
+        font = self._fonts.get(key)
+        if font is None:
+            if not pygame.font.get_init():
+                pygame.font.init()      # Initialized on the first font needed
+            if style == REGULAR:
+                font = pygame.font.Font(face, size)
+            else:
+                font = pygame.font.SysFont(face, size, bold=(style == BOLD),
+                                           italic=(style == ITALIC))
+            self._fonts[key] = font
+            self.loads += 1
+        return font
+
+    def clear(self):
+        self._fonts.clear()
+
+
+class TextCache:
+    """
+    Bounded LRU cache of rendered text surfaces keyed by
+    (text, font, foreground color, background color)
+    """
+
+    def __init__(self, fonts, maxsize=TEXT_CACHE_SIZE):
+        self.fonts = fonts
+        self.maxsize = maxsize
+        self._surfaces = collections.OrderedDict()
+        self.hits = 0
+        self.misses = 0
+
+    def render(self, text, font_key, fg_color, bg_color=None):
+        """
+        Return the surface for text rendered with the font identified by
+        font_key = (face, size, style). The surface is shared between callers
+        and must only be blitted, never drawn on.
+        """
+        key = (text, font_key, tuple(fg_color),
+               None if bg_color is None else tuple(bg_color))
+        surface = self._surfaces.get(key)
+        if surface is not None:
+            self._surfaces.move_to_end(key)
+            self.hits += 1
+            return surface
+
+        self.misses += 1
+        font = self.fonts.get(*font_key)
+        surface = font.render(text, True, fg_color, bg_color)
+        self._surfaces[key] = surface
+        if len(self._surfaces) > self.maxsize:
+            self._surfaces.popitem(last=False)     # Drop the least recently used
+        return surface
+
+    def clear(self):
+        self._surfaces.clear()
+
+    def reset_stats(self):
+        self.hits = 0
+        self.misses = 0
+        self.fonts.loads = 0
+
+    def stats(self):
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "font_loads": self.fonts.loads,
+            "cached_surfaces": len(self._surfaces),
+        }
+
+
+fonts = FontRegistry()
+cache = TextCache(fonts)
+
+
+def render_text(text, size, fg_color, bg_color=None, face=DEFAULT_FACE, style=REGULAR):
+    """
+    Render text through the shared cache
+    """
+    return cache.render(text, (face, size, style), fg_color, bg_color)
+
+
+def stats():
+    """
+    Return the hit/miss counters of the shared cache
+    """
+    return cache.stats()
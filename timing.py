@@ -0,0 +1,46 @@
+"""
+Timed phases measured against the monotonic clock.
+
+A scene that has to show something for a given time starts a phase with a
+duration instead of sleeping. The event loop keeps running, waits at most
+until the phase deadline, and the scene moves on once the phase expired.
+"""
+import time
+
+
+class PhaseTimer:
+    """
+    Keep track of the current phase of a scene and of its deadline
+    """
+
+    def __init__(self, clock=time.monotonic):
+        self.clock = clock
+        self.name = None
+        self.started = 0.0
+        self.deadline = None
+
+    def start(self, name, duration_ms=None):
+        """
+        Enter the phase name, lasting duration_ms milliseconds, or until the
+        next start() if duration_ms is None
+        """
+        self.name = name
+        self.started = self.clock()
+        if duration_ms is None:
+            self.deadline = None
+        else:
+            self.deadline = self.started + duration_ms / 1000
+
+    def elapsed_ms(self):
+        return (self.clock() - self.started) * 1000
+
+    def remaining_ms(self):
+        """
+        Milliseconds left before the deadline, None if the phase has none
+        """
+        if self.deadline is None:
+            return None
+        return max(self.deadline - self.clock(), 0) * 1000
+
+    def expired(self):
+        return self.deadline is not None and self.clock() >= self.deadline
@@ -0,0 +1,112 @@
+"""
+Property check of the board operations: play random games on a NumPy board
+and on a bytearray board side by side, and compare what the boards report
+with the state kept by the game.
+
+After every click, on both boards:
+- remaining_targets() is Game.targets_left, and count() of every state
+  adds up to the squares of the grid
+- flashed_mask() is a grid_size x grid_size mask of the flashed_cells()
+- the two boards hold the same squares
+
+Run from the repository root:
+
+    python -m tools.check_board --games 200
+"""
+import argparse
+import random
+import sys
+
+import board as board_module
+from board import Board, EMPTY, FOUND, MISSED, TARGET
+from game_core import Game
+
+
+def board_problems(game):
+    """
+    Why the board of game disagrees with the game, as a list of messages
+    """
+    board = game.board
+    size = game.grid_size
+    problems = []
+    if board.remaining_targets() != game.targets_left:
+        problems.append("remaining_targets() %d, targets_left %d"
+                        % (board.remaining_targets(), game.targets_left))
+    if board.count(FOUND) + board.count(TARGET) != game.num_flash_squares:
+        problems.append("%d found and target squares, %d flashed"
+                        % (board.count(FOUND) + board.count(TARGET), game.num_flash_squares))
+    if board.count(MISSED) != game.mistakes:
+        problems.append("%d missed squares, %d mistakes" % (board.count(MISSED), game.mistakes))
+    if sum(board.count(state) for state in (EMPTY, TARGET, FOUND, MISSED)) != size * size:
+        problems.append("the state counts do not add up to %d squares" % (size * size))
+
+    mask = board.flashed_mask()
+    if len(mask) != size or any(len(column) != size for column in mask):
+        problems.append("flashed_mask() is not %dx%d" % (size, size))
+    else:
+        masked = [(x, y) for x in range(size) for y in range(size) if mask[x][y]]
+        if masked != board.flashed_cells():
+            problems.append("flashed_mask() and flashed_cells() differ")
+    return problems
+
+
+def check_games(games, max_level, seed):
+    """
+    Play games with random clicks, return the failures as (game, level,
+    message) tuples
+    """
+    rng = random.Random(seed)
+    failures = []
+    for number in range(games):
+        game_seed = rng.randrange(2**32)
+        played = [Game(rng=random.Random(game_seed), board=Board(use_numpy=use_numpy))
+                  for use_numpy in (True, False)]
+        starting_level, allowed_mistakes = rng.randint(1, max_level), rng.randint(0, 3)
+        for game in played:
+            game.new_game(starting_level, 3, allowed_mistakes)
+
+        # The same clicks on both games, until the first one is over
+        while not played[0].over:
+            for game in played:
+                game.start_level()      # The same boards, reset in place
+            size = played[0].grid_size
+            while played[0].result is None:
+                # Mostly flashed squares, so that levels are also won
+                if rng.random() < 0.8:
+                    x, y = rng.choice(played[0].board.flashed_cells())
+                else:
+                    x, y = rng.randrange(size), rng.randrange(size)
+                for game in played:
+                    game.click(x, y)
+                for game in played:
+                    for problem in board_problems(game):
+                        failures.append((number, game.level, problem))
+                if bytes(played[0].board.cells[:size*size]) != bytes(played[1].board.cells[:size*size]):
+                    failures.append((number, played[0].level, "the NumPy and bytearray boards differ"))
+                if failures:
+                    return failures
+            for game in played:
+                game.end_level()
+    return failures
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--games", type=int, default=200)
+    parser.add_argument("--max-level", type=int, default=100)
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args(argv)
+
+    if board_module.numpy is None:
+        print("NumPy is not installed, only the bytearray boards are checked")
+    failures = check_games(args.games, args.max_level, args.seed)
+    for number, level, message in failures[:20]:
+        print(f"FAIL game {number}, level {level}: {message}")
+    if failures:
+        return 1
+    print(f"OK: {args.games} games, levels 1-{args.max_level}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,114 @@
+"""
+Property check of difficulty.get_difficulty against the original
+incremental search, for every level from 1 to 10,000.
+
+Run from the repository root:
+
+    python -m tools.check_difficulty --max-level 10000
+"""
+import argparse
+import math
+import random
+import sys
+
+from difficulty import get_difficulty
+
+
+class LegacyDifficulty:
+    """
+    The original get_difficulty(), with its grid_size and lost globals
+    """
+
+    def __init__(self):
+        self.grid_size = 0
+        self.lost = False
+
+    def get_difficulty(self, level):
+        num_flash_squares = level + 2
+
+        if not self.lost:
+            if self.grid_size:
+                if isqrt((num_flash_squares)*3 + 1) or isqrt((num_flash_squares)*3 + 3):
+                    self.grid_size += 1
+
+            else:
+                i = num_flash_squares
+                while i > 0:
+                    if isqrt((i*3) + 1):
+                        self.grid_size = int(math.sqrt((i * 3) + 1))
+                        return num_flash_squares
+                    elif isqrt((i*3) + 3):
+                        self.grid_size = int(math.sqrt((i * 3) + 3))
+                        return num_flash_squares
+                    i -= 1
+
+        return num_flash_squares
+
+
+def isqrt(n):
+    """
+    The original perfect square test
+    """
+    x = n
+    y = (x + 1) // 2
+    while y < x:
+        x = y
+        y = (x + n // x) // 2
+
+    return x**2 == n
+
+
+def check_fresh_games(max_level):
+    """
+    A new game started directly at each level
+    """
+    failures = []
+    for level in range(1, max_level + 1):
+        legacy = LegacyDifficulty()
+        num_flash_squares = legacy.get_difficulty(level)
+        if get_difficulty(level) != (legacy.grid_size, num_flash_squares):
+            failures.append(("fresh", level, legacy.grid_size, get_difficulty(level)))
+    return failures
+
+
+def check_played_games(max_level, games, seed):
+    """
+    Games going up level by level, with lost levels repeated at the same size
+    """
+    rng = random.Random(seed)
+    failures = []
+    for game in range(games):
+        legacy = LegacyDifficulty()
+        level = 1 if game == 0 else rng.randint(1, max_level)
+        loss_rate = rng.random() * 0.5
+        while level <= max_level:
+            num_flash_squares = legacy.get_difficulty(level)
+            if get_difficulty(level) != (legacy.grid_size, num_flash_squares):
+                failures.append(("game %d" % game, level, legacy.grid_size, get_difficulty(level)))
+                break
+            legacy.lost = rng.random() < loss_rate
+            if not legacy.lost:
+                level += 1
+    return failures
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--max-level", type=int, default=10000)
+    parser.add_argument("--games", type=int, default=20)
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args(argv)
+
+    failures = check_fresh_games(args.max_level)
+    failures += check_played_games(args.max_level, args.games, args.seed)
+
+    for kind, level, expected, got in failures[:20]:
+        print(f"FAIL {kind}: level {level}: grid size {expected}, got {got}")
+    if failures:
+        return 1
+    print(f"OK: levels 1-{args.max_level} match, fresh and over {args.games} played games")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
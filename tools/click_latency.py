@@ -0,0 +1,125 @@
+"""
+Check the click-to-photon latency of the grid clicks against a budget, by
+replaying a scripted game.
+
+The script is a recording written for the boards of a fixed seed: the
+player starts a game, then at each level clicks a wrong square followed by
+all the flashed squares, for --levels levels, and closes the window. It is replayed
+through the game with the profile enabled, and the p99 latency from the
+receipt of a click to the display update showing it must stay under
+--budget-frames frames.
+
+Run from the repository root (no window is opened):
+
+    python -m tools.click_latency --levels 15 --budget-frames 1
+"""
+import argparse
+import json
+import os
+import random
+import sys
+import tempfile
+
+os.environ.setdefault("SDL_VIDEODRIVER", "dummy")
+
+import main as visual_memory
+import replay
+from board import Board, MISSED
+from game_core import Game
+
+CLICK_GAP = 40      # Milliseconds between two scripted inputs
+
+
+def write_script(path, seed, levels, settings):
+    """
+    Write the recording of a game where every level is won after one
+    mistake, and return the number of clicks on the grid
+    """
+    visual_memory.set_resolution(settings["width"])
+    game = Game(settings["starting_level"], settings["initial_lives"],
+                settings["allowed_mistakes"], rng=random.Random(seed), board=Board(use_numpy=False))
+    lines = [{"version": replay.VERSION, "seed": seed, "settings": settings}]
+
+    def click(t, pos):
+        lines.append({"t": t, "type": "MOUSEBUTTONDOWN", "pos": list(pos), "button": 1})
+
+    t = 100
+    click(t, (visual_memory.WIDTH // 2, visual_memory.HEIGHT // 2))   # "Play" in the menu
+    clicks = 0
+    for _ in range(levels):
+        game.start_level()
+        geometry = visual_memory.get_grid_geometry(game.grid_size)
+        t += visual_memory.LEVEL_INTRO_DELAY + settings["delay"]     # Start of the recall phase
+
+        targets = game.board.flashed_cells()
+        wrong = next((x, y) for x, y, _ in geometry.cells() if (x, y) not in targets)
+        cells = targets if settings["allowed_mistakes"] < 1 else [wrong] + targets
+        for x, y in cells:
+            t += CLICK_GAP
+            click(t, geometry.cell_rect(x, y).center)
+            state = game.click(x, y)
+            assert state is not None and (state != MISSED or game.result is None)
+            clicks += 1
+        assert game.result
+        game.end_level()
+        t += visual_memory.LEVEL_END_DELAY
+
+    lines.append({"t": t + CLICK_GAP, "type": "QUIT"})
+
+    with open(path, "w", encoding="utf-8") as file:
+        for line in lines:
+            file.write(json.dumps(line) + "\n")
+    return clicks
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--levels", type=int, default=15)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--width", type=int, default=visual_memory.MIN_WIDTH)
+    parser.add_argument("--budget-frames", type=float, default=1.0,
+                        help="p99 latency budget, in frames at the frame rate cap")
+    parser.add_argument("--real-speed", action="store_true",
+                        help="replay at the scripted speed instead of as fast as possible")
+    args = parser.parse_args(argv)
+
+    settings = {
+        "width": args.width,
+        "starting_level": visual_memory.STARTING_LEVEL,
+        "delay": visual_memory.DELAY,
+        "initial_lives": visual_memory.INITIAL_LIVES,
+        "allowed_mistakes": visual_memory.ALLOWED_MISTAKES,
+        "max_fps": visual_memory.MAX_FPS,
+    }
+    budget = args.budget_frames * 1000 / settings["max_fps"]
+
+    with tempfile.TemporaryDirectory() as directory:
+        script = os.path.join(directory, "script.jsonl")
+        clicks = write_script(script, args.seed, args.levels, settings)
+        run_args = ["--replay", script, "--profile",
+                    "--profile-out", os.path.join(directory, "profile.json")]
+        if not args.real_speed:
+            run_args.append("--fast-replay")
+        visual_memory.run(run_args)
+
+    stats = visual_memory.click_latency.stats()
+    reached = visual_memory.game.level
+    print("level reached %d, %d of %d clicks drawn" % (reached, stats["count"], clicks))
+    if stats["count"]:
+        print("click to photon: p50 %.2f ms, p95 %.2f ms, p99 %.2f ms, max %.2f ms"
+              % (stats["p50_ms"], stats["p95_ms"], stats["p99_ms"], stats["max_ms"]))
+        for bucket, count in stats["histogram"].items():
+            print("  %-10s %6d" % (bucket, count))
+
+    if reached != settings["starting_level"] + args.levels or stats["count"] != clicks:
+        print("FAIL: the replay did not play the script")
+        return 1
+    if stats["p99_ms"] >= budget:
+        print("FAIL: p99 latency over the %.1f ms budget" % budget)
+        return 1
+    print("OK: p99 latency under the %.1f ms budget" % budget)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
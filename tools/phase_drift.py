@@ -0,0 +1,84 @@
+"""
+Compare how long a timed phase really lasts against time.sleep() for the
+same duration, both measured with the monotonic clock. The trials of both
+alternate, and the check fails if the median overshoot of the phases is
+larger than the one of time.sleep().
+
+Run from the repository root (no window is opened):
+
+    python -m tools.phase_drift --durations 250 1000 1500 --trials 10
+"""
+import argparse
+import os
+import statistics
+import sys
+import time
+
+os.environ.setdefault("SDL_VIDEODRIVER", "dummy")
+
+import pygame
+
+from frame_loop import FrameLoop
+from timing import PhaseTimer
+
+
+def sleep_overshoot(duration_ms):
+    start = time.monotonic()
+    time.sleep(duration_ms / 1000)
+    return (time.monotonic() - start) * 1000 - duration_ms
+
+
+def phase_overshoot(loop, duration_ms):
+    """
+    Run the event loop like the SceneMachine does, until the update that
+    follows the events of a frame sees the phase expired
+    """
+    phase = PhaseTimer()
+    phase.start("phase", duration_ms)
+    while True:
+        loop.events(phase.remaining_ms())
+        if phase.expired():
+            overshoot = phase.elapsed_ms() - duration_ms
+            loop.present()
+            return overshoot
+        loop.present()
+
+
+def summary(samples):
+    return "median {:6.2f} ms   mean {:6.2f} ms   max {:6.2f} ms".format(
+        statistics.median(samples), statistics.mean(samples), max(samples))
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--durations", type=int, nargs="+", default=[250, 1000, 1500],
+                        help="phase durations in milliseconds")
+    parser.add_argument("--trials", type=int, default=10)
+    parser.add_argument("--fps", type=int, default=60)
+    args = parser.parse_args(argv)
+
+    pygame.init()
+    pygame.display.set_mode((100, 100))
+    loop = FrameLoop(args.fps)
+
+    failed = False
+    for duration in args.durations:
+        # Alternated, so that the noise of a busy machine hits both alike
+        slept = []
+        phased = []
+        for _ in range(args.trials):
+            slept.append(sleep_overshoot(duration))
+            phased.append(phase_overshoot(loop, duration))
+        print(f"{duration} ms")
+        print("  time.sleep  overshoot: " + summary(slept))
+        print("  timed phase overshoot: " + summary(phased))
+        if statistics.median(phased) > statistics.median(slept):
+            print("  FAIL: the timed phases overshoot more than time.sleep()")
+            failed = True
+
+    pygame.quit()
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
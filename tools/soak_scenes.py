@@ -0,0 +1,207 @@
+"""
+Soak test of the game screens: drive the real menu, settings, game and end
+scenes through many screen transitions and check that neither the stack
+depth nor the allocated memory grows.
+
+A scripted player stands in for the pygame event queue: it clicks the
+buttons of the menu and of the end screen, changes settings back and forth,
+and plays games that are either won for a level then left with escape, or
+lost on wrong squares. Its clock jumps to the end of every timed phase, so
+the game runs as fast as it can draw, on SDL's dummy video driver.
+
+pygame and SDL keep a few kilobytes of buffers that fill up over the first
+runs, whatever their length: --max-growth allows for them, while a leak of
+a single small object per transition goes far past it.
+
+Run from the repository root:
+
+    python -m tools.soak_scenes --transitions 10000
+"""
+import argparse
+import gc
+import os
+import sys
+import tracemalloc
+
+os.environ.setdefault("SDL_VIDEODRIVER", "dummy")
+
+import pygame
+
+import main as visual_memory
+from replay import TIMEOUT_SLACK
+from scenes import SceneMachine
+
+# The path of a kiosk session: a few games, then a trip through the settings,
+# and back to the first screen
+CYCLE = ("menu", "play", "end", "play", "end", "menu", "settings")
+
+
+def click(rect):
+    return pygame.event.Event(pygame.MOUSEBUTTONDOWN, button=1, pos=rect.center)
+
+
+def key_down(code):
+    return pygame.event.Event(pygame.KEYDOWN, key=code, mod=0)
+
+
+class ScriptedPlayer:
+    """
+    Event source of the FrameLoop that plays the screens of CYCLE, one
+    event per frame, until the machine made transitions transitions
+    """
+
+    def __init__(self, machine, transitions):
+        self.machine = machine
+        self.transitions = transitions
+        self.time = 0.0
+        self.depths = set()     # Stack depths seen when asked for events
+        self.games = 0
+        self._cursor = 0        # Position of the current scene in CYCLE
+        self._scene = None      # Scene of the last frame
+        self._pending = []      # Events of the next frames, in reverse order
+
+    def clock(self):
+        return self.time
+
+    def events_for(self, loop, timeout):
+        """
+        FrameLoop event source: the next scripted event
+        """
+        pygame.event.clear()    # The events of the window itself, as in replay.Replayer
+        machine = self.machine
+        if machine.transitions > 1:
+            self.depths.add(stack_depth())
+        if machine.transitions >= self.transitions:
+            return [pygame.event.Event(pygame.QUIT)]
+
+        if machine.current is not self._scene:
+            self._scene = machine.current
+            self._pending.clear()
+            if machine.transitions > 1:
+                self._cursor = (self._cursor + 1) % len(CYCLE)
+            if machine.current_name == "play":
+                self.games += 1
+
+        if not self._pending:
+            if timeout is not None:
+                self.time += (timeout + TIMEOUT_SLACK) / 1000   # Skip to the end of the phase
+                return []
+            self._pending = self._script()[::-1]
+        return [self._pending.pop()] if self._pending else []
+
+    def _script(self):
+        """
+        Events of the current scene, until the next one of CYCLE
+        """
+        scene = self.machine.current
+        name = self.machine.current_name
+        target = CYCLE[(self._cursor + 1) % len(CYCLE)]
+        if name == "menu":
+            return [click(scene.play_rect if target == "play" else scene.settings_rect)]
+        if name == "end":
+            return [click(scene.play_again_rect if target == "play" else scene.menu_rect)]
+        if name == "settings":
+            events = []
+            for rect in (scene.level_rect, scene.delay_rect, scene.lives_rect,
+                         scene.mistakes_rect):
+                events += [click(rect), key_down(pygame.K_UP), key_down(pygame.K_DOWN)]
+            return events + [click(scene.menu_rect)]
+
+        # Recall phase of a level: every other game, win the first level and
+        # leave the next one with escape, otherwise click wrong squares until
+        # the game is lost
+        game = visual_memory.game
+        if self.games % 2:
+            if game.level > game.starting_level:
+                return [key_down(pygame.K_ESCAPE)]
+            cells = game.board.flashed_cells()
+        else:
+            flashed = set(game.board.flashed_cells())
+            cells = [(x, y) for x, y, _ in scene.geometry.cells() if (x, y) not in flashed]
+            cells = cells[:game.allowed_mistakes + 1]
+        return [click(scene.geometry.cell_rect(x, y)) for x, y in cells]
+
+
+def stack_depth():
+    frame = sys._getframe()
+    depth = 0
+    while frame is not None:
+        depth += 1
+        frame = frame.f_back
+    return depth
+
+
+def run_machine(screen, transitions):
+    """
+    Play the scenes of the game for transitions transitions, on the same
+    boards every time, and return the transitions, games and stack depths
+    of the run
+    """
+    loop = visual_memory.frame_loop
+    visual_memory.board_rng.seed(0)
+    machine = SceneMachine(loop)
+    player = ScriptedPlayer(machine, transitions)
+    machine.add("menu", visual_memory.MenuScene(screen))
+    machine.add("settings", visual_memory.SettingsScene(screen))
+    machine.add("play", visual_memory.PlayScene(screen, player.clock))
+    machine.add("end", visual_memory.EndScene(screen))
+    loop.source = player
+    try:
+        machine.run(CYCLE[0])
+    finally:
+        loop.source = None
+    return machine.transitions, player.games, sorted(player.depths)
+
+
+def soak(transitions):
+    pygame.display.init()
+    screen = pygame.display.set_mode(visual_memory.SIZE)
+    visual_memory.assets.preload(background=False)
+    visual_memory.frame_loop.fps = 0    # No frame cap
+
+    # Warm up once, then measure a second run of the same length
+    tracemalloc.start()
+    run_machine(screen, transitions)
+
+    gc.collect()    # The scenes and their machine reference each other
+    tracemalloc.reset_peak()
+    start = tracemalloc.get_traced_memory()[0]
+    done, games, depths = run_machine(screen, transitions)
+    gc.collect()
+    current, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    pygame.quit()
+
+    return {
+        "transitions": done,
+        "games": games,
+        "stack_depths": depths,
+        "memory_growth": current - start,
+        "growth_per_transition": round((current - start) / done, 3),
+        "peak_growth": peak - start,
+    }
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--transitions", type=int, default=10000)
+    parser.add_argument("--max-growth", type=int, default=16384,
+                        help="allowed memory growth in bytes (default: 16384)")
+    args = parser.parse_args(argv)
+
+    result = soak(args.transitions)
+    for key, value in result.items():
+        print(f"{key}: {value}")
+
+    if len(result["stack_depths"]) != 1:
+        print("FAIL: the stack grows with the number of transitions")
+        return 1
+    if result["memory_growth"] > args.max_growth:
+        print("FAIL: memory grows with the number of transitions")
+        return 1
+    print("OK")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,109 @@
+"""
+Check the writes of the settings and scores store:
+- holding an arrow key in the settings (one change per key repeat) gives a
+  single write once the key is released
+- killing the process while it keeps writing never leaves a corrupted file
+
+Run from the repository root:
+
+    python -m tools.store_writes --hold 2 --kills 20
+"""
+import argparse
+import json
+import os
+import random
+import signal
+import subprocess
+import sys
+import tempfile
+import time
+
+from storage import Store
+
+KEY_REPEAT = 0.125      # Repeat interval of pygame.key.set_repeat(250, 125)
+
+# Child process that rewrites the store as fast as it can until it is killed
+WRITER = """
+import sys
+from storage import Store
+store = Store(sys.argv[1], delay=0, max_delay=0)
+level = store.best_level("bot") or 0
+print("ready", flush=True)
+while True:
+    level += 1
+    store.add_score("bot", {"level": level, "padding": "x" * 1000})
+"""
+
+
+def held_key_writes(directory, hold):
+    """
+    Change the delay setting on every key repeat for hold seconds, and
+    return the number of writes
+    """
+    store = Store(os.path.join(directory, "held.json"))
+    delay = 1000
+    end = time.monotonic() + hold
+    while time.monotonic() < end:
+        delay += 50
+        store.update_settings({"delay": delay})
+        time.sleep(KEY_REPEAT)
+    store.close()
+
+    saved = Store(store.path).settings()
+    if saved.get("delay") != delay:
+        raise AssertionError("last value not saved: %r instead of %r" % (saved.get("delay"), delay))
+    return store.writes
+
+
+def kill_during_writes(directory, kills, rng):
+    """
+    Kill a process writing the store at random times, and check that the
+    file can always be read back. Return the last level saved before each
+    kill and the number of temporary files left.
+    """
+    path = os.path.join(directory, "killed.json")
+    root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    levels = []
+    leftovers = 0
+    for _ in range(kills):
+        child = subprocess.Popen([sys.executable, "-c", WRITER, path], cwd=root,
+                                 stdout=subprocess.PIPE, text=True)
+        child.stdout.readline()
+        time.sleep(rng.uniform(0.05, 0.3))
+        child.send_signal(signal.SIGKILL)
+        child.wait()
+        child.stdout.close()
+
+        if os.path.exists(path):
+            with open(path, encoding="utf-8") as file:
+                data = json.load(file)      # Raises if the file is corrupted
+            levels.append(data["scores"]["bot"][-1]["level"])
+        leftovers = max(leftovers, len([name for name in os.listdir(directory)
+                                        if name.endswith(".tmp")]))
+    return levels, leftovers
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--hold", type=float, default=2.0, help="seconds the key is held")
+    parser.add_argument("--kills", type=int, default=20)
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args(argv)
+
+    with tempfile.TemporaryDirectory() as directory:
+        changes = int(args.hold / KEY_REPEAT)
+        writes = held_key_writes(directory, args.hold)
+        print("held key: %d changes, %d writes" % (changes, writes))
+
+        levels, leftovers = kill_during_writes(directory, args.kills, random.Random(args.seed))
+        print("killed writer %d times: store always readable, last saved level %s, "
+              "at most %d temporary file left behind" % (args.kills, levels, leftovers))
+
+    if writes != 1:
+        print("FAIL: holding a key should give a single write")
+        return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,153 @@
+"""
+Check the telemetry log of the clicks and level outcomes:
+- the cost of a record on the render thread, and the write throughput
+- the records read back with NumPy are the ones written, clicks and
+  flashed squares
+- killing the process while it keeps writing leaves a log that can be read
+  and appended to, with every record whole
+
+Run from the repository root:
+
+    python -m tools.telemetry_log --records 1000000 --kills 10
+"""
+import argparse
+import os
+import random
+import signal
+import subprocess
+import sys
+import tempfile
+import time
+
+import numpy
+
+import telemetry
+from board import FOUND, MISSED
+from game_core import Game
+from telemetry import TelemetryLog
+
+# Child process that records clicks as fast as it can until it is killed
+WRITER = """
+import sys
+from game_core import Game
+from telemetry import TelemetryLog
+log = TelemetryLog(sys.argv[1], flush_interval=0.01)
+game = Game()
+game.start_level()
+log.new_game(1000)
+print("ready", flush=True)
+while True:
+    log.click(game, 1, 2, 2, 123.0)
+"""
+
+
+def write_records(path, records, rng):
+    """
+    Record the flashed squares, clicks and level outcomes of games played
+    at random, and return the seconds spent in the record calls, the
+    seconds until the last record was written, the clicks recorded as
+    (level, x, y, hit) and the flashed squares as (level, x, y)
+    """
+    log = TelemetryLog(path)
+    game = Game(rng=rng)
+    clicks = []
+    flashes = []
+    spent = 0.0
+    start = time.perf_counter()
+    while len(clicks) < records:
+        game.new_game()
+        log.new_game(rng.choice((500, 1000, 2000)))
+        while not game.over and len(clicks) < records:
+            game.start_level()
+            before = time.perf_counter()
+            log.flash(game)
+            spent += time.perf_counter() - before
+            flashes.extend((game.level, x, y) for x, y in game.board.flashed_cells())
+            while game.result is None:
+                x, y = rng.randrange(game.grid_size), rng.randrange(game.grid_size)
+                state = game.click(x, y)
+                if state in (FOUND, MISSED):
+                    before = time.perf_counter()
+                    log.click(game, x, y, state, 100.0)
+                    spent += time.perf_counter() - before
+                    clicks.append((game.level, x, y, state == FOUND))
+            before = time.perf_counter()
+            log.level_end(game, 1000.0)
+            spent += time.perf_counter() - before
+            game.end_level()
+    log.close()
+    return spent, time.perf_counter() - start, clicks, flashes, log
+
+
+def kill_during_writes(directory, kills, rng):
+    """
+    Kill a process writing the log at random times, and check that the
+    file always reads back as whole records. Return the record counts.
+    """
+    path = os.path.join(directory, "killed.vmlog")
+    root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    counts = []
+    for _ in range(kills):
+        child = subprocess.Popen([sys.executable, "-c", WRITER, path], cwd=root,
+                                 stdout=subprocess.PIPE, text=True)
+        child.stdout.readline()
+        time.sleep(rng.uniform(0.05, 0.3))
+        child.send_signal(signal.SIGKILL)
+        child.wait()
+        child.stdout.close()
+
+        if os.path.exists(path):
+            log = telemetry.open_log(path)
+            if len(log) and not ((log["x"] == 1) & (log["y"] == 2)
+                                 & (log["since_flash_ms"] == 123.0)).all():
+                raise AssertionError("corrupted record after a kill")
+            counts.append(len(log))
+    return counts
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--records", type=int, default=1000000, help="clicks to record")
+    parser.add_argument("--kills", type=int, default=10)
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args(argv)
+    rng = random.Random(args.seed)
+
+    with tempfile.TemporaryDirectory() as directory:
+        path = os.path.join(directory, "clicks.vmlog")
+        spent, elapsed, clicks, flashes, log = write_records(path, args.records, rng)
+        total = log.records
+        print("%d records: %.2f us per record, all written in %.2f s "
+              "(%d flushes, %d dropped)"
+              % (total, spent / total * 1e6, elapsed, log.flushes, log.dropped))
+
+        start = time.perf_counter()
+        records = telemetry.load([directory])
+        loaded = time.perf_counter() - start
+        square = [("level", "u2"), ("x", "i2"), ("y", "i2")]
+        same = len(records) == total
+        for kind, written, dtype in ((telemetry.CLICK, clicks, square + [("hit", "i1")]),
+                                     (telemetry.FLASH, flashes, square)):
+            read = records[records["kind"] == kind]
+            expected = numpy.array(written, dtype=dtype)
+            same = same and len(read) == len(expected) and all(
+                (read[name] == expected[name]).all() for name in expected.dtype.names)
+        print("loaded %d records (%.1f MB) in %.1f ms, %s"
+              % (len(records), os.path.getsize(path) / 1e6, loaded * 1000,
+                 "same as written" if same else "DIFFERENT from the ones written"))
+
+        counts = kill_during_writes(directory, args.kills, rng)
+        print("killed writer %d times: log always readable, records after each kill %s"
+              % (args.kills, counts))
+
+    if not same or log.dropped:
+        print("FAIL: records lost or changed")
+        return 1
+    if counts != sorted(counts):
+        print("FAIL: records lost after a kill")
+        return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
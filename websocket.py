@@ -0,0 +1,274 @@
+"""
+Minimal WebSocket protocol (RFC 6455) over asyncio streams, written with
+the standard library only.
+
+It covers what the session server and its load generator need: the HTTP
+upgrade handshake on both sides, and text, binary and control frames, with
+fragmented messages put back together. Extensions (compression) and
+subprotocols are not negotiated.
+"""
+import asyncio
+import base64
+import hashlib
+import os
+import struct
+
+GUID = "258EAFA5-E914-47DA-95CA-C5AB0DC85B11"
+MAX_HEAD = 8 * 1024         # Bytes of an HTTP request or response head
+MAX_MESSAGE = 64 * 1024     # Bytes of a message, once put back together
+
+# Opcodes
+CONTINUATION = 0x0
+TEXT = 0x1
+BINARY = 0x2
+CLOSE = 0x8
+PING = 0x9
+PONG = 0xA
+
+# Close codes
+NORMAL = 1000
+PROTOCOL_ERROR = 1002
+INVALID_DATA = 1007
+TOO_BIG = 1009
+
+
+class ProtocolError(Exception):
+    """
+    The peer broke the protocol, the connection is closed with code
+    """
+
+    def __init__(self, message, code=PROTOCOL_ERROR):
+        super().__init__(message)
+        self.code = code
+
+
+class ConnectionClosed(Exception):
+    """
+    The connection was closed, by the peer or after an error
+    """
+
+
+def accept_key(key):
+    """
+    Sec-WebSocket-Accept value answering the Sec-WebSocket-Key key
+    """
+    return base64.b64encode(hashlib.sha1((key + GUID).encode()).digest()).decode()
+
+
+def apply_mask(data, mask):
+    """
+    XOR data with the 4-byte mask repeated, which masks and unmasks
+    """
+    if not data:
+        return data
+    length = len(data)
+    repeated = (mask * (length // 4 + 1))[:length]
+    return (int.from_bytes(data, "little")
+            ^ int.from_bytes(repeated, "little")).to_bytes(length, "little")
+
+
+def encode_frame(opcode, payload, mask=False):
+    """
+    Bytes of a single final frame. Clients must mask their frames, servers
+    must not.
+    """
+    length = len(payload)
+    mask_bit = 0x80 if mask else 0
+    if length < 126:
+        head = struct.pack("!BB", 0x80 | opcode, mask_bit | length)
+    elif length < 1 << 16:
+        head = struct.pack("!BBH", 0x80 | opcode, mask_bit | 126, length)
+    else:
+        head = struct.pack("!BBQ", 0x80 | opcode, mask_bit | 127, length)
+    if mask:
+        key = os.urandom(4)
+        return head + key + apply_mask(payload, key)
+    return head + payload
+
+
+async def read_head(reader):
+    """
+    Read an HTTP request or response head, and return its first line and
+    its headers, with lowercase names
+    """
+    try:
+        data = await reader.readuntil(b"\r\n\r\n")
+    except Exception as error:      # EOF, or over the stream limit
+        raise ConnectionClosed("no HTTP head: %s" % error) from None
+    if len(data) > MAX_HEAD:
+        raise ProtocolError("HTTP head too long")
+
+    lines = data.decode("latin-1").split("\r\n")
+    headers = {}
+    for line in lines[1:]:
+        name, sep, value = line.partition(":")
+        if sep:
+            headers[name.strip().lower()] = value.strip()
+    return lines[0], headers
+
+
+def server_handshake(headers):
+    """
+    HTTP response accepting the upgrade request with headers. Raise
+    ProtocolError if they do not ask for a WebSocket.
+    """
+    key = headers.get("sec-websocket-key")
+    if (headers.get("upgrade", "").lower() != "websocket"
+            or "upgrade" not in headers.get("connection", "").lower()
+            or headers.get("sec-websocket-version") != "13" or not key):
+        raise ProtocolError("not a WebSocket upgrade request")
+    return ("HTTP/1.1 101 Switching Protocols\r\n"
+            "Upgrade: websocket\r\n"
+            "Connection: Upgrade\r\n"
+            "Sec-WebSocket-Accept: %s\r\n\r\n" % accept_key(key)).encode()
+
+
+async def connect(host, port, path="/"):
+    """
+    Open a client WebSocket to ws://host:port/path
+    """
+    reader, writer = await asyncio.open_connection(host, port)
+    key = base64.b64encode(os.urandom(16)).decode()
+    writer.write(("GET %s HTTP/1.1\r\n"
+                  "Host: %s:%d\r\n"
+                  "Upgrade: websocket\r\n"
+                  "Connection: Upgrade\r\n"
+                  "Sec-WebSocket-Key: %s\r\n"
+                  "Sec-WebSocket-Version: 13\r\n\r\n" % (path, host, port, key)).encode())
+    try:
+        status, headers = await read_head(reader)
+        if status.split(" ")[1:2] != ["101"] or headers.get("sec-websocket-accept") != accept_key(key):
+            raise ProtocolError("upgrade refused: " + status)
+    except BaseException:
+        writer.close()
+        raise
+    return WebSocket(reader, writer, client=True)
+
+
+class WebSocket:
+    """
+    Message-oriented side of an upgraded connection
+    """
+
+    def __init__(self, reader, writer, client=False):
+        self.reader = reader
+        self.writer = writer
+        self.client = client
+        self.closed = False
+
+    async def recv(self):
+        """
+        Return the next message, str for text and bytes for binary. Pings
+        are answered on the way. Raise ConnectionClosed once the
+        connection is closed.
+        """
+        fragments = []
+        message_opcode = None
+        size = 0
+        while True:
+            try:
+                fin, opcode, payload = await self._read_frame()
+            except ProtocolError as error:
+                await self.close(error.code, str(error))
+                raise ConnectionClosed(str(error)) from None
+            except (OSError, EOFError) as error:    # IncompleteReadError is an EOFError
+                self._abort()
+                raise ConnectionClosed(str(error) or "connection lost") from None
+
+            if opcode >= CLOSE:     # Control frames can come between fragments
+                if opcode == CLOSE:
+                    code = struct.unpack("!H", payload[:2])[0] if len(payload) >= 2 else NORMAL
+                    await self.close(code)
+                    raise ConnectionClosed("closed by the peer (%d)" % code)
+                if opcode == PING:
+                    self.send_frame(PONG, payload)
+                continue
+
+            if (opcode == CONTINUATION) != (message_opcode is not None):
+                await self.close(PROTOCOL_ERROR, "unexpected continuation")
+                raise ConnectionClosed("unexpected continuation")
+            if message_opcode is None:
+                message_opcode = opcode
+            size += len(payload)
+            if size > MAX_MESSAGE:
+                await self.close(TOO_BIG, "message too big")
+                raise ConnectionClosed("message too big")
+            fragments.append(payload)
+
+            if fin:
+                data = b"".join(fragments)
+                if message_opcode == TEXT:
+                    try:
+                        return data.decode("utf-8")
+                    except UnicodeDecodeError:
+                        await self.close(INVALID_DATA, "invalid UTF-8")
+                        raise ConnectionClosed("invalid UTF-8") from None
+                return data
+
+    async def _read_frame(self):
+        reader = self.reader
+        first, second = await reader.readexactly(2)
+        if first & 0x70:
+            raise ProtocolError("reserved bits set")
+        fin = bool(first & 0x80)
+        opcode = first & 0x0F
+        if opcode not in (CONTINUATION, TEXT, BINARY, CLOSE, PING, PONG):
+            raise ProtocolError("unknown opcode %d" % opcode)
+        if bool(second & 0x80) == self.client:
+            raise ProtocolError("frames from clients and only them must be masked")
+
+        length = second & 0x7F
+        if opcode >= CLOSE and (length > 125 or not fin):
+            raise ProtocolError("invalid control frame")
+        if length == 126:
+            length = struct.unpack("!H", await reader.readexactly(2))[0]
+        elif length == 127:
+            length = struct.unpack("!Q", await reader.readexactly(8))[0]
+        if length > MAX_MESSAGE:
+            raise ProtocolError("message too big", TOO_BIG)
+
+        if self.client:
+            payload = await reader.readexactly(length)
+        else:
+            mask = await reader.readexactly(4)
+            payload = apply_mask(await reader.readexactly(length), mask)
+        return fin, opcode, payload
+
+    def send(self, message):
+        """
+        Queue a message, str as text and bytes as binary. drain() waits for
+        the queued data to be sent.
+        """
+        if isinstance(message, str):
+            self.send_frame(TEXT, message.encode("utf-8"))
+        else:
+            self.send_frame(BINARY, message)
+
+    def send_frame(self, opcode, payload):
+        if self.closed:
+            raise ConnectionClosed("send on a closed connection")
+        self.writer.write(encode_frame(opcode, payload, mask=self.client))
+
+    async def drain(self):
+        try:
+            await self.writer.drain()
+        except OSError as error:
+            self._abort()
+            raise ConnectionClosed(str(error)) from None
+
+    async def close(self, code=NORMAL, reason=""):
+        """
+        Send a close frame and close the connection
+        """
+        if self.closed:
+            return
+        try:
+            self.send_frame(CLOSE, struct.pack("!H", code) + reason.encode("utf-8")[:123])
+            await self.writer.drain()
+        except (OSError, ConnectionClosed):
+            pass
+        self._abort()
+
+    def _abort(self):
+        self.closed = True
+        self.writer.close()
@@ -0,0 +1,98 @@
+"""
+Background writer of the data kept in memory by the store and the
+telemetry log.
+
+The owner changes its data under its own lock and calls changed(). A
+thread, started on the first change, waits until the changes are due,
+takes them with the take() function of the owner while holding the lock,
+then writes them with its write() function without the lock, so the thread
+making the changes never waits for the disk.
+
+Changes are coalesced: they are due once no change came for delay seconds,
+and at the latest max_delay seconds after the first change not written
+yet. changed(urgent=True) and close() make them due at once.
+"""
+import threading
+import time
+
+
+class BackgroundWriter:
+    """
+    Thread writing the changes of an owner once they are due
+    """
+
+    def __init__(self, lock, take, write, delay, max_delay, name="writer"):
+        self.delay = delay          # Seconds without changes before a write, None for no wait
+        self.max_delay = max_delay  # Seconds from the first unwritten change to the write
+        self.name = name
+        self._take = take           # Called with the lock held, returns the changes
+        self._write = write         # Called with what take() returned, without the lock
+        self._changed = threading.Condition(lock)
+        self._first_change = None   # Time of the oldest unwritten change, None if written
+        self._last_change = None
+        self._urgent = False
+        self._closed = False
+        self._thread = None
+
+    def changed(self, urgent=False):
+        """
+        Note a change of the data, to call with the lock of the owner held.
+        The thread is only woken up when the write gets due sooner.
+        """
+        if self._thread is None:
+            self._thread = threading.Thread(target=self._run, name=self.name, daemon=True)
+            self._thread.start()
+        if self._first_change is None:
+            self._first_change = self._last_change = time.monotonic()
+            self._urgent = urgent
+            self._changed.notify()
+        else:
+            if self.delay is not None:
+                self._last_change = time.monotonic()
+            if urgent and not self._urgent:
+                self._urgent = True
+                self._changed.notify()
+
+    def close(self):
+        """
+        Write the pending changes now and stop the thread
+        """
+        with self._changed:
+            self._closed = True
+            self._changed.notify()
+            thread = self._thread
+        if thread is not None:
+            thread.join()
+
+    def _run(self):
+        while True:
+            with self._changed:
+                if not self._wait_until_due():
+                    return
+                changes = self._take()
+            self._write(changes)
+
+    def _wait_until_due(self):
+        """
+        Wait until the changes are due to be written, return False once
+        closed with nothing to write
+        """
+        while True:
+            if self._first_change is None:
+                if self._closed:
+                    return False
+                self._changed.wait()
+                continue
+
+            if not (self._closed or self._urgent):
+                due = self._first_change + self.max_delay
+                if self.delay is not None:
+                    due = min(due, self._last_change + self.delay)
+                remaining = due - time.monotonic()
+                if remaining > 0:
+                    self._changed.wait(remaining)
+                    continue
+
+            self._first_change = self._last_change = None
+            self._urgent = False
+            return True